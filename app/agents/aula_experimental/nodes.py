@@ -7,24 +7,46 @@ Estratégia:
   2) fazer merge no TrialState sem apagar dados já coletados
   3) validar regras determinísticas (validators.py)
   4) definir trial.stage e trial.output (a mensagem do turno)
+- Os passos 2-4 ficam em "steps" determinísticos (_step_*), compartilhados
+  entre os nós sync (trial_*) e async (atrial_*, via ainvoke).
+- Avanço em cadeia: se o step avança pra uma etapa cujos campos já vieram na
+  mesma extração ("Sou Lucas, 22, iniciante, terça que vem às 14h"), o step
+  da etapa seguinte roda no mesmo turno com essa extração (sem extrair de
+  novo) e só o plano final passa pela NLG.
 
 Observação:
 - Este arquivo NÃO faz parsing heurístico de texto.
-- Extração sempre vem do LLM via extractor.py (Structured Output).
+- Extração vem do LLM via extractor.py (Structured Output). Em ask_date e
+  awaiting_confirmation, respostas curtas ("18-02 às 15h", "sim") são
+  resolvidas antes pelo pré-extrator por regras (rule_extractor.py), sem LLM
+  (desligar com config["configurable"]["trial_rule_extractor"] = False).
+- Sem orçamento de latência no turno (app/core/budget.py), extractor e NLG
+  degradam: extração vazia e o texto `fallback` fixo de cada resposta.
+- Com config["configurable"]["trial_nlg_mode"] = "cached", a NLG reaproveita
+  templates já gerados pelo LLM para o mesmo (stage, action, error_code,
+  missing_fields), só preenchendo os slots (utils_trial/nlg_cache.py).
 """
 
 from __future__ import annotations
 
+import asyncio
 import os
 from typing import Any, Dict, Optional
 
 from langchain_core.runnables import RunnableConfig
+from app.core.budget import acall_with_budget, call_with_budget
+from app.core.config import get_option
+from app.core.memory import history_max_tokens
 from app.core.state import GlobalState
 
-from app.agents.aula_experimental.utils_trial.extractor import extract_trial_fields
+from app.agents.aula_experimental.utils_trial.extractor import aextract_trial_fields, extract_trial_fields
 from app.agents.aula_experimental.utils_trial.schemas import TrialExtraction
-from app.agents.aula_experimental.utils_trial.nlg import generate_trial_message
+from app.agents.aula_experimental.utils_trial.nlg import agenerate_trial_message, generate_trial_message
+from app.agents.aula_experimental.utils_trial.nlg_cache import NLG_CACHE
+from app.agents.aula_experimental.utils_trial.rule_extractor import RULE_EXTRACT_STATS, RULE_STAGES, rule_extract
 from app.agents.aula_experimental.utils_trial.get_llm import get_llm
+from app.agents.aula_experimental.utils_trial.availability import SLOT_INDEX
+from app.agents.aula_experimental.utils_trial.slot_calendar import get_slot_calendar
 import app.agents.aula_experimental.utils_trial.validators as v
 
 
@@ -121,7 +143,7 @@ def export_trial_output(state: GlobalState) -> dict:
     """
     Retorna dict com trial atualizado + specialists_outputs.
     Usa return {} (padrao LangGraph) em vez de mutar state diretamente.
-    O LangGraph aplica os reducers (operator.or_) automaticamente.
+    O LangGraph aplica os reducers (merge_outputs) automaticamente.
     """
     trial = state.get("trial") or {}
     out = (trial.get("output") or "").strip()
@@ -130,59 +152,113 @@ def export_trial_output(state: GlobalState) -> dict:
         "specialists_outputs": {"trial": out},
     }
 
+# Plano de resposta do turno: o que a NLG deve comunicar (ou texto fixo, sem LLM).
+# Os "steps" abaixo são 100% determinísticos e só devolvem o plano; quem chama a
+# NLG (sync ou async) é o nó. Assim trial_* e atrial_* compartilham toda a lógica.
+def _reply(*, stage: str, action: str, fallback: str, missing_fields: Optional[list[str]] = None,
+           error_code: Optional[str] = None, client_text: Optional[str] = None, use_nlg: bool = True,
+           suggested_slots: Optional[list[str]] = None) -> Dict[str, Any]:
+    return {
+        "stage": stage,
+        "action": action,
+        "missing_fields": missing_fields,
+        "error_code": error_code,
+        "fallback": fallback,
+        "client_text": client_text,
+        "use_nlg": use_nlg,
+        "suggested_slots": suggested_slots,
+    }
+
+
+def _nlg_cached(config: Optional[RunnableConfig]) -> bool:
+    return get_option(config, "trial_nlg_mode", "llm") == "cached"
+
+
 # Função auxiliar para chamar NLG (com fallback caso LLM falhe)
-def _fallback_or_nlg(*, stage: str, action: str, missing_fields: Optional[list[str]], error_code: Optional[str], trial: Dict[str, Any], fallback: str, client_text: Optional[str] = None) -> str:
-    msg = generate_trial_message(
-        get_llm(),
+def _fallback_or_nlg(*, stage: str, action: str, missing_fields: Optional[list[str]], error_code: Optional[str], trial: Dict[str, Any], fallback: str, client_text: Optional[str] = None, suggested_slots: Optional[list[str]] = None, state: Optional[GlobalState] = None, config: Optional[RunnableConfig] = None) -> str:
+    plan = {"stage": stage, "action": action, "missing_fields": missing_fields, "error_code": error_code}
+    cached = _nlg_cached(config)
+    if cached:                                          # Template em cache: só preenche os slots, sem LLM
+        msg = NLG_CACHE.render(trial_snapshot=trial, **plan)
+        if msg:
+            return msg
+    # Sem orcamento de latencia no turno (budget.py): None -> fallback fixo
+    msg = call_with_budget(
+        state,
+        "trial_nlg",
+        generate_trial_message,
+        get_llm("nlg", config),
+        stage=stage,
+        action=action,
+        missing_fields=missing_fields,
+        error_code=error_code,
+        trial_snapshot=trial,
+        client_text=client_text,
+        suggested_slots=suggested_slots,
+    )
+    if cached and msg:
+        NLG_CACHE.learn(msg, trial_snapshot=trial, client_text=client_text, **plan)
+    return msg or fallback
+
+
+async def _afallback_or_nlg(*, stage: str, action: str, missing_fields: Optional[list[str]], error_code: Optional[str], trial: Dict[str, Any], fallback: str, client_text: Optional[str] = None, suggested_slots: Optional[list[str]] = None, state: Optional[GlobalState] = None, config: Optional[RunnableConfig] = None) -> str:
+    plan = {"stage": stage, "action": action, "missing_fields": missing_fields, "error_code": error_code}
+    cached = _nlg_cached(config)
+    if cached:
+        msg = NLG_CACHE.render(trial_snapshot=trial, **plan)
+        if msg:
+            return msg
+    msg = await acall_with_budget(
+        state,
+        "trial_nlg",
+        agenerate_trial_message,
+        get_llm("nlg", config),
         stage=stage,
         action=action,
         missing_fields=missing_fields,
         error_code=error_code,
         trial_snapshot=trial,
         client_text=client_text,
+        suggested_slots=suggested_slots,
     )
+    if cached and msg:
+        NLG_CACHE.learn(msg, trial_snapshot=trial, client_text=client_text, **plan)
     return msg or fallback
 
 
+def _render_reply(trial: Dict[str, Any], reply: Dict[str, Any], state: Optional[GlobalState] = None, config: Optional[RunnableConfig] = None) -> str:
+    """Transforma o plano de resposta em texto (NLG ou fallback fixo)."""
+    if not reply["use_nlg"]:
+        return reply["fallback"]
+    plan = {k: v for k, v in reply.items() if k != "use_nlg"}
+    return _fallback_or_nlg(trial=trial, state=state, config=config, **plan)
+
+
+async def _arender_reply(trial: Dict[str, Any], reply: Dict[str, Any], state: Optional[GlobalState] = None, config: Optional[RunnableConfig] = None) -> str:
+    if not reply["use_nlg"]:
+        return reply["fallback"]
+    plan = {k: v for k, v in reply.items() if k != "use_nlg"}
+    return await _afallback_or_nlg(trial=trial, state=state, config=config, **plan)
+
+
 # Função auxiliar para checar cancelamento (usada em 3 nós)
-def _check_cancellation(trial: Dict[str, Any], state: GlobalState) -> Optional[GlobalState]:
-    """Se wants_to_cancel == True, seta cancelled e retorna state. Senão retorna None."""
+def _check_cancellation(trial: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Se wants_to_cancel == True, seta cancelled e retorna o plano de resposta. Senão retorna None."""
     if not trial.get("wants_to_cancel"):
         return None
     trial["stage"] = "cancelled"
-    trial["output"] = _fallback_or_nlg(
+    return _reply(
         stage="cancelled",
         action="cancel_confirmed",
-        missing_fields=None,
-        error_code=None,
-        trial=trial,
         fallback="Sem problemas! Quando quiser agendar, é só me chamar. Até mais!",
     )
-    return export_trial_output(state)
 
 
 # -------------------------
-# Nó 1: Coletar dados
+# Step 1: Coletar dados
 # -------------------------
 
-def trial_collect_client_info(state: GlobalState, config: RunnableConfig) -> GlobalState:
-    trial = ensure_trial_defaults(state)            # Garante trial no estado global
-    text = state.get("client_input", "") or ""      # Pega input do cliente (texto)
-    llm = get_llm()
-
-    extraction: TrialExtraction = extract_trial_fields( # Chama extractor LLM -> TrialExtraction para extrair dados do texto
-        llm,
-        client_text=text,
-        stage="collect_client_info",
-        trial_snapshot=trial,
-        messages=state.get("messages", []),
-    )
-    merge_trial(trial, extraction)                      # Faz merge seguro dos dados extraídos pro trial atual
-
-    cancelled = _check_cancellation(trial, state)       # Checa se cliente quer cancelar
-    if cancelled:
-        return cancelled
-
+def _step_collect_client_info(trial: Dict[str, Any], text: str) -> Dict[str, Any]:
     missing = [f for f in REQUIRED_CLIENT_FIELDS if not trial.get(f)] # Verifica campos obrigatórios faltantes
     if missing:                                                       # Se tiver campos faltando...
         parts = []                                                    # Constrói lista de campos faltantes para mensagem
@@ -195,30 +271,16 @@ def trial_collect_client_info(state: GlobalState, config: RunnableConfig) -> Glo
                 parts.append("seu nível (iniciante/intermediário/avançado)")
         trial["stage"] = "collect_client_info"
         fallback = "Para agendar sua aula experimental, me diga: " + ", ".join(parts) + "." # Mensagem fallback pra auditoria ou falha da LLM
-        trial["output"] = _fallback_or_nlg(       # Chama NLG ou usa fallback
+        return _reply(                            # Plano: NLG ou fallback
             stage="collect_client_info",          # Passa stage
             action="ask_missing_client_fields",   # Passa action
             missing_fields=missing,               # Passa campos faltantes
-            error_code=None,
-            trial=trial,                          # Passa trial snapshot pro NLG
             fallback=fallback,
             client_text=text,
         )
-        return export_trial_output(state)  # Exporta saída pro estado global "specialists_outputs" e retorna estado atualizado
 
     trial["stage"] = "ask_date"   # Caso não tenha campos faltando, avança para próxima etapa: pedir data/horário
     fallback = "A aula experimental é toda terça. Qual terça (dd-mm) e horário você prefere? Ex: 10-02 às 10:00."
-
-    # trial["output"] = _fallback_or_nlg(  # Chama NLG ou usa fallback pra pedir data/horário
-    #     llm=llm,
-    #     stage="ask_date",
-    #     action="ask_date_time",
-    #     missing_fields=None, 
-    #     error_code=None,
-    #     trial=trial,
-    #     fallback=fallback,
-    # )
-    # return export_trial_output(state)
     """""
     Aqui optei por não chamar o NLG (LLM) na primeira vez que pede data/horário,
     porque o caso é: acabei de perceber que tenho todos os dados do cliente,
@@ -226,36 +288,20 @@ def trial_collect_client_info(state: GlobalState, config: RunnableConfig) -> Glo
     a mesma (pede data/horário), então não se faz necessário LLM (não precisa de interpretação nem criatividade).
     então uso um fallback simples:
     """""
-    trial["output"] = fallback       # Usa fallback simples pra pedir data/horário pela primeira vez (aqui é ok não chamar LLM)
-    return export_trial_output(state) # sempre que eu uso export_trial_output(state), tenho que garantir que o trial.output está setado corretamente antes
+    return _reply(stage="ask_date", action="ask_date_time", fallback=fallback, use_nlg=False)
 
 
 # -------------------------
-# Nó 2: Pedir data/horário (terça)
+# Step 2: Pedir data/horário (terça)
 # -------------------------
 
-def trial_ask_date(state: GlobalState, config: RunnableConfig) -> GlobalState:
-    trial = ensure_trial_defaults(state)
-    text = state.get("client_input", "") or ""
-    llm = get_llm()
-
-    extraction: TrialExtraction = extract_trial_fields(
-        llm,
-        client_text=text,
-        stage="ask_date",
-        trial_snapshot=trial,
-        messages=state.get("messages", []),
-    )
-    merge_trial(trial, extraction)
-
-    cancelled = _check_cancellation(trial, state)
-    if cancelled:
-        return cancelled
-
+def _step_ask_date(trial: Dict[str, Any], text: str) -> Dict[str, Any]:
     # Usa validator do seu módulo (com fallback defensivo de API)
     if hasattr(v, "validate_date_time"): 
         ok, code = _validation_result_to_code(
-            v.validate_date_time(trial.get("desired_date"), trial.get("desired_time"))
+            v.validate_date_time(
+                trial.get("desired_date"), trial.get("desired_time"), SLOT_INDEX.is_full, get_slot_calendar()
+            )
         )
     else:
         ok, code = False, "missing_validator"
@@ -270,6 +316,15 @@ def trial_ask_date(state: GlobalState, config: RunnableConfig) -> GlobalState:
         elif code in ("invalid_time_format", "time_out_of_range"):
             trial.pop("desired_time", None)
 
+        # Horário lotado/fechado/já começou: sugere os livres mais próximos
+        # (calendário do dia + índice em memória, sem query por turno)
+        suggested = None
+        if code in ("slot_full", "closed", "past_time"):
+            suggested = SLOT_INDEX.nearest_free(trial.get("desired_date"), trial.get("desired_time"))
+            trial.pop("desired_time", None)
+            if code == "closed":
+                trial.pop("desired_date", None)
+
         # Mensagens por erro
         if code == "missing_date":
             fallback = "Me diga a data exata da terça (dd-mm) e o horário. Ex: 10-02 às 10:00."
@@ -286,119 +341,200 @@ def trial_ask_date(state: GlobalState, config: RunnableConfig) -> GlobalState:
             fallback = "O horário precisa estar claro (ex: 10:00). Qual horário você prefere?"
         elif code == "time_out_of_range":
             fallback = "Esse horário não está disponível. As aulas são das 07:00 às 10:00 e das 14:00 às 18:00 (duração de uma hora). Qual horário você prefere?"
+        elif code in ("slot_full", "closed", "past_time"):
+            fallback = {
+                "slot_full": "Esse horário já está lotado.",
+                "closed": "Não teremos aula nesse dia/horário.",
+                "past_time": "Esse horário de hoje já passou.",
+            }[code]
+            if suggested:
+                fallback += " Horários livres mais próximos: " + ", ".join(suggested) + ". Qual você prefere?"
+            else:
+                fallback += " Qual outra terça (dd-mm) e horário você prefere?"
         else:
             fallback = "Não consegui validar a data/horário. Pode informar a terça (dd-mm) e o horário novamente?"
 
-        trial["output"] = _fallback_or_nlg(
+        return _reply(
             stage="ask_date",
             action="ask_date_time",
-            missing_fields=None,
             error_code=code,
-            trial=trial,
             fallback=fallback,
             client_text=text,
+            suggested_slots=suggested,
         )
-        return export_trial_output(state)
 
     trial["stage"] = "awaiting_confirmation"
     fallback = f"Confirma sua aula experimental na terça {trial['desired_date']} às {trial['desired_time']}?"
-    trial["output"] = _fallback_or_nlg(
+    return _reply(
         stage="awaiting_confirmation",
         action="ask_confirmation",
-        missing_fields=None,
-        error_code=None,
-        trial=trial,
         fallback=fallback,
         client_text=text,
     )
-    return export_trial_output(state)
 
 
 # -------------------------
-# Nó 3: Confirmação
+# Step 3: Confirmação
 # -------------------------
 
-def trial_awaiting_confirmation(state: GlobalState, config: RunnableConfig) -> GlobalState:
-    trial = ensure_trial_defaults(state)
-    text = state.get("client_input", "") or ""
-    llm = get_llm()
-
-    extraction: TrialExtraction = extract_trial_fields(
-        llm,
-        client_text=text,
-        stage="awaiting_confirmation",
-        trial_snapshot=trial,
-        messages=state.get("messages", []),
-    )
-    merge_trial(trial, extraction)
-
-    cancelled = _check_cancellation(trial, state)
-    if cancelled:
-        return cancelled
-
+def _step_awaiting_confirmation(trial: Dict[str, Any], text: str) -> Dict[str, Any]:
     conf = trial.get("confirmed")
 
     if conf is None:
         trial["stage"] = "awaiting_confirmation"
-        fallback = "Só pra confirmar: sim ou não?"
-        trial["output"] = _fallback_or_nlg(
+        return _reply(
             stage="awaiting_confirmation",
             action="ask_confirmation",
-            missing_fields=None,
-            error_code=None,
-            trial=trial,
-            fallback=fallback,
+            fallback="Só pra confirmar: sim ou não?",
             client_text=text,
         )
-        return export_trial_output(state)
 
     if conf is False:
         trial["stage"] = "ask_date"
-        fallback = "Sem problemas. Qual terça e horário você prefere então?"
-        trial["output"] = _fallback_or_nlg(
+        return _reply(
             stage="ask_date",
             action="ask_date_time",
-            missing_fields=None,
-            error_code=None,
-            trial=trial,
-            fallback=fallback,
+            fallback="Sem problemas. Qual terça e horário você prefere então?",
             client_text=text,
         )
-        return export_trial_output(state)
 
     # conf True
     trial["stage"] = "book"
-    fallback = "Perfeito! Vou registrar seu agendamento agora."
-    trial["output"] = _fallback_or_nlg(
+    return _reply(
         stage="book",
         action="book_start",
-        missing_fields=None,
-        error_code=None,
-        trial=trial,
-        fallback=fallback,
+        fallback="Perfeito! Vou registrar seu agendamento agora.",
         client_text=text,
     )
+
+
+_STAGE_STEPS = {
+    "collect_client_info": _step_collect_client_info,
+    "ask_date": _step_ask_date,
+    "awaiting_confirmation": _step_awaiting_confirmation,
+}
+
+
+# Fluxo comum dos nós 1-3: extractor → merge seguro → cancelamento → step da etapa
+def _extract_kwargs(state: GlobalState, trial: Dict[str, Any], stage: str, config: RunnableConfig) -> Dict[str, Any]:
+    return {
+        "client_text": state.get("client_input", "") or "",
+        "stage": stage,
+        "trial_snapshot": trial,
+        "messages": state.get("messages", []),
+        "summary": state.get("conversation_summary", ""),
+        "max_history_tokens": history_max_tokens(config),
+    }
+
+
+def _rule_extraction(kwargs: Dict[str, Any], config: RunnableConfig) -> Optional[TrialExtraction]:
+    """Pré-extrator por regras (ask_date/awaiting_confirmation). None = chama o extractor LLM."""
+    stage = kwargs["stage"]
+    if stage not in RULE_STAGES or not get_option(config, "trial_rule_extractor", True):
+        return None
+    extraction = rule_extract(kwargs["client_text"], stage)
+    RULE_EXTRACT_STATS.record(stage, extraction is not None)
+    return extraction
+
+
+# Campos da extração que bastam pra rodar o step da etapa no mesmo turno (avanço em cadeia)
+_CHAIN_FIELDS = {
+    "ask_date": ("desired_date", "desired_time"),
+    "awaiting_confirmation": ("confirmed",),
+}
+
+
+def _slot_changed(trial: Dict[str, Any], data: Dict[str, Any]) -> bool:
+    """A extração traz data/horário diferente do que está no trial."""
+    return any(data.get(f) is not None and data[f] != trial.get(f) for f in ("desired_date", "desired_time"))
+
+
+def _apply_extraction(trial: Dict[str, Any], extraction: Any, stage: str, text: str) -> Dict[str, Any]:
+    data = _to_dict_extraction(extraction)
+    if stage == "awaiting_confirmation" and _slot_changed(trial, data):
+        # Trocou o horário na confirmação: valida de novo e pede nova confirmação
+        stage = "ask_date"
+        data["confirmed"] = trial["confirmed"] = None
+    merge_trial(trial, data)                            # Faz merge seguro dos dados extraídos pro trial atual
+    cancelled = _check_cancellation(trial)              # Checa se cliente quer cancelar
+    if cancelled:
+        return cancelled
+    reply = _STAGE_STEPS[stage](trial, text)
+    # Avanço em cadeia: a mesma extração já responde a próxima etapa
+    visited = {stage}
+    while trial["stage"] not in visited and any(data.get(f) is not None for f in _CHAIN_FIELDS.get(trial["stage"], ())):
+        visited.add(trial["stage"])
+        reply = _STAGE_STEPS[trial["stage"]](trial, text)
+    return reply
+
+
+def _run_stage(state: GlobalState, stage: str, config: RunnableConfig) -> GlobalState:
+    trial = ensure_trial_defaults(state)                # Garante trial no estado global
+    kwargs = _extract_kwargs(state, trial, stage, config)
+    extraction = _rule_extraction(kwargs, config)       # Regras resolvem respostas curtas sem LLM
+    if extraction is None:                              # Chama extractor LLM -> TrialExtraction (vazio sem orcamento)
+        extraction = call_with_budget(
+            state, "trial_extractor", extract_trial_fields, get_llm("extractor", config), fallback=TrialExtraction(), **kwargs,
+        )
+    reply = _apply_extraction(trial, extraction, stage, kwargs["client_text"])
+    trial["output"] = _render_reply(trial, reply, state, config)     # Chama NLG ou usa fallback
+    return export_trial_output(state) # sempre que eu uso export_trial_output(state), tenho que garantir que o trial.output está setado corretamente antes
+
+
+async def _arun_stage(state: GlobalState, stage: str, config: RunnableConfig) -> GlobalState:
+    trial = ensure_trial_defaults(state)
+    await SLOT_INDEX.aensure_fresh()   # query de ocupação (se vencida) fora do event loop
+    kwargs = _extract_kwargs(state, trial, stage, config)
+    extraction = _rule_extraction(kwargs, config)
+    if extraction is None:
+        extraction = await acall_with_budget(
+            state, "trial_extractor", aextract_trial_fields, get_llm("extractor", config), fallback=TrialExtraction(), **kwargs,
+        )
+    reply = _apply_extraction(trial, extraction, stage, kwargs["client_text"])
+    trial["output"] = await _arender_reply(trial, reply, state, config)
     return export_trial_output(state)
 
 
 # -------------------------
-# Nó 4: Booking (persistência)
+# Nós 1-3 (sync e async)
 # -------------------------
 
-def trial_book(state: GlobalState, config: RunnableConfig) -> GlobalState:
-    """
-    Nó determinístico de persistência.
-    Grava o agendamento no banco via create_trial_booking().
-    Em modo dev (sem DATABASE_URL), simula o booking.
-    """
-    trial = ensure_trial_defaults(state)
+def trial_collect_client_info(state: GlobalState, config: RunnableConfig) -> GlobalState:
+    return _run_stage(state, "collect_client_info", config)
+
 
+def trial_ask_date(state: GlobalState, config: RunnableConfig) -> GlobalState:
+    return _run_stage(state, "ask_date", config)
+
+
+def trial_awaiting_confirmation(state: GlobalState, config: RunnableConfig) -> GlobalState:
+    return _run_stage(state, "awaiting_confirmation", config)
+
+
+async def atrial_collect_client_info(state: GlobalState, config: RunnableConfig) -> GlobalState:
+    return await _arun_stage(state, "collect_client_info", config)
+
+
+async def atrial_ask_date(state: GlobalState, config: RunnableConfig) -> GlobalState:
+    return await _arun_stage(state, "ask_date", config)
+
+
+async def atrial_awaiting_confirmation(state: GlobalState, config: RunnableConfig) -> GlobalState:
+    return await _arun_stage(state, "awaiting_confirmation", config)
+
+
+# -------------------------
+# Nó 4: Booking (persistência)
+# -------------------------
+
+def _book_without_db(trial: Dict[str, Any]) -> bool:
+    """Resolve os casos que não tocam no banco (já agendado / modo dev). True se resolveu."""
     if trial.get("booking_created"):
         trial["stage"] = "booked"
         trial["output"] = (
             f"Seu agendamento já está registrado ✅ Terça {trial.get('desired_date')} às {trial.get('desired_time')}."
         )
-        return export_trial_output(state)
+        return True
 
     if not os.getenv("DATABASE_URL"):
         # Modo dev: simula o booking sem banco
@@ -408,20 +544,124 @@ def trial_book(state: GlobalState, config: RunnableConfig) -> GlobalState:
         trial["output"] = (
             f"(DEV) Agendado ✅ Te espero na terça {trial.get('desired_date')} às {trial.get('desired_time')}!"
         )
-        return export_trial_output(state)
+        return True
 
-    from app.agents.aula_experimental.utils_trial.booking import create_trial_booking
+    return False
 
-    booking_id = create_trial_booking(
-        customer_id=state.get("client_id"),
-        desired_date=trial.get("desired_date"),
-        desired_time=trial.get("desired_time"),
-    )
 
+def _mark_booked(trial: Dict[str, Any], booking_id: str) -> None:
     trial["booking_id"] = booking_id
     trial["booking_created"] = True
     trial["stage"] = "booked"
     trial["output"] = f"Agendado ✅ Te espero na terça {trial['desired_date']} às {trial['desired_time']}!"
+
+
+def _booking_args(state: GlobalState, trial: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "customer_id": state.get("client_id"),
+        "desired_date": trial.get("desired_date"),
+        "desired_time": trial.get("desired_time"),
+    }
+
+
+def _booking_write_mode(config: RunnableConfig) -> str:
+    """config["configurable"]["booking_write_mode"]: "sync" (default), "async" ou "write_behind"."""
+    return get_option(config, "booking_write_mode", "sync")
+
+
+def _already_booked(args: Dict[str, Any]) -> Optional[str]:
+    """booking_id já gravado neste processo (retry do "sim"): não disputa vaga de novo."""
+    from app.agents.aula_experimental.utils_trial.booking import BOOKING_STATUS, desired_datetime_for
+
+    return BOOKING_STATUS.get(args["customer_id"], desired_datetime_for(args["desired_date"], args["desired_time"]))
+
+
+def _slot_taken(state: GlobalState, trial: Dict[str, Any]) -> GlobalState:
+    """Horário lotou entre a validação e o booking: volta pra ask_date com sugestões."""
+    suggested = SLOT_INDEX.nearest_free(trial.get("desired_date"), trial.get("desired_time"))
+    trial.pop("desired_time", None)
+    trial["confirmed"] = None
+    trial["stage"] = "ask_date"
+    trial["output"] = "Poxa, esse horário acabou de lotar."
+    if suggested:
+        trial["output"] += " Horários livres mais próximos: " + ", ".join(suggested) + ". Qual você prefere?"
+    else:
+        trial["output"] += " Qual outra terça (dd-mm) e horário você prefere?"
     return export_trial_output(state)
 
 
+def trial_book(state: GlobalState, config: RunnableConfig) -> GlobalState:
+    """
+    Nó determinístico de persistência.
+    Grava o agendamento no banco via create_trial_booking() (ou enfileira na
+    fila write-behind, com booking_write_mode="write_behind").
+    Em modo dev (sem DATABASE_URL), simula o booking.
+
+    A vaga é reservada no SLOT_INDEX antes do INSERT (reserve é atômico):
+    confirmações simultâneas não passam da capacidade do horário.
+    """
+    trial = ensure_trial_defaults(state)
+    if _book_without_db(trial):
+        return export_trial_output(state)
+
+    args = _booking_args(state, trial)
+    existing = _already_booked(args)
+    if existing is not None:
+        _mark_booked(trial, existing)
+        return export_trial_output(state)
+    if not SLOT_INDEX.reserve(args["desired_date"], args["desired_time"]):
+        return _slot_taken(state, trial)
+    if _booking_write_mode(config) == "write_behind":
+        from app.agents.aula_experimental.utils_trial.booking_queue import BOOKING_WRITER
+
+        booking_id = BOOKING_WRITER.submit(**args, reserved=True)   # a fila libera a vaga
+    else:
+        from app.agents.aula_experimental.utils_trial.booking import create_trial_booking
+
+        try:
+            booking_id = create_trial_booking(**args)
+        finally:
+            SLOT_INDEX.release(args["desired_date"], args["desired_time"])
+    _mark_booked(trial, booking_id)
+    return export_trial_output(state)
+
+
+async def atrial_book(state: GlobalState, config: RunnableConfig) -> GlobalState:
+    """
+    Versão async. Por booking_write_mode:
+    - "sync": o INSERT (bloqueante) roda numa thread, fora do event loop
+    - "async": INSERT via driver async (acreate_trial_booking)
+    - "write_behind": só enfileira (ack imediato, INSERT em lote depois)
+    """
+    trial = ensure_trial_defaults(state)
+    if _book_without_db(trial):
+        return export_trial_output(state)
+
+    args = _booking_args(state, trial)
+    existing = _already_booked(args)
+    if existing is not None:
+        _mark_booked(trial, existing)
+        return export_trial_output(state)
+    await SLOT_INDEX.aensure_fresh()   # recarga da ocupação numa thread
+    if not SLOT_INDEX.reserve(args["desired_date"], args["desired_time"]):
+        return _slot_taken(state, trial)
+    mode = _booking_write_mode(config)
+    if mode == "write_behind":
+        from app.agents.aula_experimental.utils_trial.booking_queue import BOOKING_WRITER
+
+        booking_id = BOOKING_WRITER.submit(**args, reserved=True)
+        _mark_booked(trial, booking_id)
+        return export_trial_output(state)
+    try:
+        if mode == "async":
+            from app.agents.aula_experimental.utils_trial.booking import acreate_trial_booking
+
+            booking_id = await acreate_trial_booking(**args)
+        else:
+            from app.agents.aula_experimental.utils_trial.booking import create_trial_booking
+
+            booking_id = await asyncio.to_thread(create_trial_booking, **args)
+    finally:
+        SLOT_INDEX.release(args["desired_date"], args["desired_time"])
+    _mark_booked(trial, booking_id)
+    return export_trial_output(state)
@@ -0,0 +1,189 @@
+"""
+availability.py — Índice em memória de ocupação dos horários da aula experimental.
+
+Mapa (dd-mm, HH:MM) -> reservas existentes, carregado de trial_class_booking
+(só reservas futuras e não canceladas) e atualizado a cada
+create_trial_booking. Lookup O(1), sem consultar o banco a cada turno:
+
+- is_full(date, time): o validator usa para devolver "slot_full"
+- nearest_free(date, time): horários livres mais próximos (sugestão na NLG),
+  percorrendo o calendário do dia (slot_calendar.py) a partir do pedido
+- reserve/release: reserva atômica de uma vaga no booking (trial_book). A
+  validação em ask_date não basta: duas confirmações simultâneas passariam
+  pelo mesmo "não lotado". A vaga fica "em voo" (somada à contagem) até o
+  INSERT terminar; só então vira contagem do banco (invalidate). Entre
+  processos diferentes a garantia é a do refresh (melhor esforço)
+
+Capacidade por horário em TRIAL_SLOT_CAPACITY (default 4).
+
+Invalidação: toda escrita invalida o cache — a próxima leitura recarrega do
+banco (uma query agregada por reserva, não por turno). A fila write-behind
+conta a reserva no índice local (record_booking) até o flush gravar a linha. Sem escrita, recarrega a cada `refresh_seconds`
+(default 60) pra ver reservas de outros processos. Sem DATABASE_URL (modo
+dev) o índice fica vazio — o booking simulado não ocupa horário.
+
+A recarga é uma query bloqueante: os nós async chamam aensure_fresh() antes
+(query numa thread, fora do event loop). Erro na query não derruba o turno:
+vai pro log, o índice mantém a última contagem (vazio = "não lotado") e tenta
+de novo em alguns segundos.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import text
+
+from app.agents.aula_experimental.utils_trial.validators import VALID_START_TIMES, parse_ddmm_date
+from app.agents.aula_experimental.utils_trial.slot_calendar import format_slot, get_slot_calendar
+from app.core.datetime_utils import now
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_CAPACITY = 4
+_DEFAULT_REFRESH_SECONDS = 60.0
+_RETRY_SECONDS = 5.0   # recarga que falhou: próxima tentativa
+
+SlotKey = Tuple[str, str]   # (dd-mm, HH:MM)
+
+
+def slot_key(desired_datetime: datetime) -> SlotKey:
+    """Chave do índice para um desired_datetime do banco (timestamptz -> horário local)."""
+    if desired_datetime.tzinfo is not None:
+        desired_datetime = desired_datetime.astimezone().replace(tzinfo=None)
+    return f"{desired_datetime.day:02d}-{desired_datetime.month:02d}", desired_datetime.strftime("%H:%M")
+
+
+class SlotIndex:
+    """Contagem de reservas por horário, thread-safe, com recarga periódica do banco."""
+
+    def __init__(self, capacity: Optional[int] = None, refresh_seconds: float = _DEFAULT_REFRESH_SECONDS):
+        self.capacity = capacity if capacity is not None else int(os.getenv("TRIAL_SLOT_CAPACITY", _DEFAULT_CAPACITY))
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._counts: Dict[SlotKey, int] = {}
+        self._inflight: Dict[SlotKey, int] = {}   # vagas reservadas com INSERT em andamento
+        self._loaded_at: Optional[float] = None
+        self._generation = 0   # muda a cada escrita: recarga que cruzou uma escrita é descartada
+
+    def _load(self) -> Dict[SlotKey, int]:
+        if not os.getenv("DATABASE_URL"):
+            return {}
+        from app.tools.database import get_session
+
+        with get_session() as session:
+            rows = session.execute(text("""
+                SELECT desired_datetime, count(*)
+                FROM trial_class_booking
+                WHERE desired_datetime >= now() AND status <> 'cancelled'
+                GROUP BY desired_datetime
+            """)).all()
+        counts: Dict[SlotKey, int] = {}
+        for desired_datetime, n in rows:
+            key = slot_key(desired_datetime)
+            counts[key] = counts.get(key, 0) + int(n)
+        return counts
+
+    def _stale(self) -> bool:
+        with self._lock:
+            return self._loaded_at is None or time.monotonic() - self._loaded_at >= self.refresh_seconds
+
+    def _ensure_fresh(self) -> None:
+        if not self._stale():
+            return
+        tick = time.monotonic()
+        with self._lock:
+            generation = self._generation
+        try:
+            counts = self._load()   # fora do lock: não segura os outros turnos durante a query
+        except Exception:
+            logger.exception("falha recarregando ocupação dos horários; mantendo a última contagem")
+            with self._lock:
+                self._loaded_at = tick - self.refresh_seconds + _RETRY_SECONDS
+            return
+        with self._lock:
+            if self._generation != generation:   # escrita durante a query: recarrega na próxima leitura
+                return
+            self._counts = counts
+            self._loaded_at = tick
+
+    async def aensure_fresh(self) -> None:
+        """Recarga (se vencida) numa thread: não bloqueia o event loop."""
+        if self._stale():
+            await asyncio.to_thread(self._ensure_fresh)
+
+    def _taken(self, key: SlotKey) -> int:
+        return self._counts.get(key, 0) + self._inflight.get(key, 0)
+
+    def booked(self, desired_date: str, desired_time: str) -> int:
+        self._ensure_fresh()
+        with self._lock:
+            return self._taken((desired_date, desired_time))
+
+    def is_full(self, desired_date: str, desired_time: str) -> bool:
+        return self.booked(desired_date, desired_time) >= self.capacity
+
+    def reserve(self, desired_date: str, desired_time: str) -> bool:
+        """Reserva uma vaga (atômico). False se o horário lotou. Liberar com release()."""
+        self._ensure_fresh()
+        key = (desired_date, desired_time)
+        with self._lock:
+            if self._taken(key) >= self.capacity:
+                return False
+            self._inflight[key] = self._inflight.get(key, 0) + 1
+            return True
+
+    def release(self, desired_date: str, desired_time: str) -> None:
+        """Fim do INSERT da vaga reservada (gravado ou não)."""
+        key = (desired_date, desired_time)
+        with self._lock:
+            n = self._inflight.get(key, 0) - 1
+            if n > 0:
+                self._inflight[key] = n
+            else:
+                self._inflight.pop(key, None)
+
+    def record_booking(self, desired_date: str, desired_time: str, invalidate: bool = True) -> None:
+        """
+        Chamado depois de cada INSERT: conta a reserva e invalida o cache.
+        invalidate=False quando a linha ainda não está no banco (fila write-behind).
+        """
+        with self._lock:
+            key = (desired_date, desired_time)
+            self._counts[key] = self._counts.get(key, 0) + 1
+            if invalidate:
+                self._loaded_at = None
+                self._generation += 1
+
+    def invalidate(self) -> None:
+        """Força recarga do banco na próxima leitura."""
+        with self._lock:
+            self._loaded_at = None
+            self._generation += 1
+
+    def nearest_free(self, desired_date: Optional[str], desired_time: Optional[str], n: int = 3) -> list[str]:
+        """Até n horários livres ("dd-mm às HH:MM") mais próximos do pedido (calendário do dia)."""
+        self._ensure_fresh()
+        calendar = get_slot_calendar()
+        target = _target(desired_date, desired_time) or now()
+        with self._lock:
+            free = calendar.nearest(target, n, accept=lambda key: self._taken(key) < self.capacity)
+        return [format_slot(key) for key in free]
+
+
+def _target(desired_date: Optional[str], desired_time: Optional[str]) -> Optional[datetime]:
+    """Datetime do pedido (horário fora da grade = meio do dia; sem data = None)."""
+    d = parse_ddmm_date(desired_date) if desired_date else None
+    if d is None:
+        return None
+    hhmm = desired_time if desired_time in VALID_START_TIMES else "12:00"
+    hour, minute = hhmm.split(":")
+    return datetime(d.year, d.month, d.day, int(hour), int(minute))
+
+
+SLOT_INDEX = SlotIndex()
@@ -6,7 +6,30 @@ Chamado diretamente pelo nó trial_book (nodes.py).
 O que faz:
 - Combina desired_date (dd-mm) e desired_time (HH:MM) em um único
   datetime para gravar na coluna desired_datetime (timestamptz) do banco.
-- Insere uma linha em trial_class_booking e retorna o booking_id (uuid).
+- Insere uma linha em trial_class_booking e retorna o booking_id. O id é
+  sempre a chave de idempotência booking_key(customer_id, desired_datetime)
+  (uuid5): mesmo cliente + mesmo horário = mesmo id, em qualquer
+  booking_write_mode. O INSERT é um upsert no índice único
+  uq_trial_booking_customer_desired_datetime (mesma regra em todos os
+  caminhos): se o cliente já tem reserva nesse horário (ex: "sim" reenviado
+  por redelivery do webhook), mantém a linha em vez de levantar
+  IntegrityError; reserva cancelada no mesmo horário volta pra 'pending'
+  (cliente remarcou).
+- Guarda (cliente, horário) -> booking_id em BOOKING_STATUS por alguns
+  minutos: retry no mesmo processo nem vai ao banco. cancel_trial_booking
+  tira a entrada do cache; cancelamento feito direto no banco fica visível
+  quando a entrada expira (ttl).
+- Invalida o índice de ocupação (availability.SLOT_INDEX): a próxima leitura
+  recarrega do banco com a linha nova (ou reativada).
+
+Caminhos de escrita (mesmo id, mesmo upsert):
+- create_trial_booking: upsert síncrono (sessão do pool de database.py)
+- acreate_trial_booking: mesmo upsert via driver async (get_async_session)
+- insert_bookings_batch: mesmo upsert em lote (executemany, sem RETURNING),
+  usado pela fila write-behind (booking_queue.py)
+
+Linhas gravadas antes do id virar booking_key podem ter outro id (uuid4): o
+upsert mantém o id existente e RETURNING devolve esse (síncrono/async).
 
 O que NÃO faz:
 - Não valida regras de negócio (isso é responsabilidade do validators.py).
@@ -14,12 +37,130 @@ O que NÃO faz:
 """
 from __future__ import annotations
 
+import threading
+import time
 import uuid
+from collections import OrderedDict
 from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
 
 from sqlalchemy import text
 
-from app.tools.database import get_session
+from app.agents.aula_experimental.utils_trial.availability import SLOT_INDEX
+from app.agents.aula_experimental.utils_trial.slot_calendar import get_slot_calendar
+from app.agents.aula_experimental.utils_trial.validators import parse_ddmm_date
+from app.tools.database import get_async_session, get_session
+
+# Namespace fixo das chaves de idempotência (uuid5)
+_BOOKING_NAMESPACE = uuid.UUID("6f1c3a52-8d0e-4b7a-9a51-2f4f0c8e7d11")
+
+# Conflito no índice único: reativa reserva cancelada (remarcação); senão update
+# no-op, só pra RETURNING devolver o id da linha existente. Mesma regra no
+# caminho síncrono/async e no lote da fila write-behind.
+_UPSERT = """
+    INSERT INTO trial_class_booking (id, customer_id, desired_datetime, status)
+    VALUES (:id, :customer_id, :desired_datetime, 'pending')
+    ON CONFLICT (customer_id, desired_datetime) DO UPDATE SET status = CASE
+        WHEN trial_class_booking.status = 'cancelled' THEN 'pending'
+        ELSE trial_class_booking.status
+    END
+"""
+_UPSERT_SQL = text(_UPSERT + "RETURNING id")
+_INSERT_BATCH_SQL = text(_UPSERT)   # executemany: sem RETURNING
+
+_CANCEL_SQL = text("""
+    UPDATE trial_class_booking SET status = 'cancelled'
+    WHERE customer_id = :customer_id AND desired_datetime = :desired_datetime AND status <> 'cancelled'
+    RETURNING id
+""")
+
+
+def desired_datetime_for(desired_date: str, desired_time: str) -> datetime:
+    """
+    dd-mm + HH:MM -> datetime. Ano do calendário de horários (o mesmo que a
+    validação usou); fora do horizonte, a próxima ocorrência (parse_ddmm_date).
+    """
+    start = get_slot_calendar().start_of(desired_date, desired_time)
+    if start is not None:
+        return start
+    d = parse_ddmm_date(desired_date)
+    if d is None:
+        raise ValueError(f"data inválida: {desired_date!r}")
+    hour, minute = desired_time.split(":")
+    return datetime(d.year, d.month, d.day, int(hour), int(minute))
+
+
+def booking_key(customer_id: str, desired_datetime: datetime) -> str:
+    """Chave de idempotência (uuid5): mesmo cliente + mesmo horário = mesma reserva."""
+    return str(uuid.uuid5(_BOOKING_NAMESPACE, f"{customer_id}|{desired_datetime.isoformat()}"))
+
+
+def booking_row(customer_id: str, desired_date: str, desired_time: str) -> Dict[str, Any]:
+    """Linha da reserva (id = booking_key), igual em todos os caminhos de escrita."""
+    desired_datetime = desired_datetime_for(desired_date, desired_time)
+    return {
+        "id": booking_key(customer_id, desired_datetime),
+        "customer_id": customer_id,
+        "desired_datetime": desired_datetime,
+    }
+
+
+class BookingStatusCache:
+    """
+    LRU thread-safe (customer_id, desired_datetime) -> booking_id das reservas
+    já gravadas, com TTL (cancelamento feito fora deste processo).
+    """
+
+    def __init__(self, max_size: int = 10000, ttl_seconds: float = 600.0):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        # (cliente, horário) -> (booking_id, expira_em)
+        self._entries: "OrderedDict[Tuple[str, datetime], Tuple[str, float]]" = OrderedDict()
+        self.hits = 0
+
+    def get(self, customer_id: str, desired_datetime: datetime) -> Optional[str]:
+        key = (customer_id, desired_datetime)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, customer_id: str, desired_datetime: datetime, booking_id: str) -> None:
+        with self._lock:
+            self._entries[(customer_id, desired_datetime)] = (booking_id, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end((customer_id, desired_datetime))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, customer_id: str, desired_datetime: datetime) -> None:
+        with self._lock:
+            self._entries.pop((customer_id, desired_datetime), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+
+
+BOOKING_STATUS = BookingStatusCache()
+
+
+def _booked(params: Dict[str, Any], booking_id: str) -> str:
+    """
+    Pós-upsert: cacheia o id e invalida o índice de ocupação (o id é o mesmo
+    pra linha nova, retry ou reserva reativada; a recarga conta certo).
+    """
+    booking_id = str(booking_id)
+    BOOKING_STATUS.put(params["customer_id"], params["desired_datetime"], booking_id)
+    SLOT_INDEX.invalidate()
+    return booking_id
 
 
 def create_trial_booking(
@@ -33,29 +174,64 @@ def create_trial_booking(
 
     Args:
         customer_id: ID do cliente (referência customer.id).
-        desired_date: Data no formato dd-mm (dia-mês, ano assumido como atual).
+        desired_date: Data no formato dd-mm (ano: ver desired_datetime_for).
         desired_time: Horário no formato HH:MM.
 
     Returns:
-        booking_id: UUID (string) da reserva criada.
+        booking_id: UUID (string) da reserva criada (ou da já existente
+        para o mesmo cliente e horário).
     """
-    day, month = desired_date.split("-")
-    year = datetime.now().year
-    hour, minute = desired_time.split(":")
-    desired_datetime = datetime(year, int(month), int(day), int(hour), int(minute))
-    booking_id = str(uuid.uuid4())
+    params = booking_row(customer_id, desired_date, desired_time)
+    cached = BOOKING_STATUS.get(customer_id, params["desired_datetime"])
+    if cached is not None:
+        return cached
+    with get_session() as session:
+        booking_id = session.execute(_UPSERT_SQL, params).scalar_one()
+
+    return _booked(params, booking_id)
+
 
+async def acreate_trial_booking(
+    *,
+    customer_id: str,
+    desired_date: str,
+    desired_time: str,
+) -> str:
+    """Versão async de create_trial_booking (driver async, sem thread)."""
+    params = booking_row(customer_id, desired_date, desired_time)
+    cached = BOOKING_STATUS.get(customer_id, params["desired_datetime"])
+    if cached is not None:
+        return cached
+    async with get_async_session() as session:
+        booking_id = (await session.execute(_UPSERT_SQL, params)).scalar_one()
+
+    return _booked(params, booking_id)
+
+
+def insert_bookings_batch(rows: List[Dict[str, Any]]) -> None:
+    """
+    Upsert em lote (executemany numa transação), mesma regra do
+    create_trial_booking: linha já existente não muda, exceto se estava
+    cancelada (volta pra 'pending'). rows = booking_row(...).
+    """
+    if not rows:
+        return
     with get_session() as session:
-        session.execute(
-            text("""
-                INSERT INTO trial_class_booking (id, customer_id, desired_datetime, status)
-                VALUES (:id, :customer_id, :desired_datetime, 'pending')
-            """),
-            {
-                "id": booking_id,
-                "customer_id": customer_id,
-                "desired_datetime": desired_datetime,
-            },
-        )
+        session.execute(_INSERT_BATCH_SQL, rows)
 
-    return booking_id
+
+def cancel_trial_booking(*, customer_id: str, desired_date: str, desired_time: str) -> Optional[str]:
+    """
+    Cancela a reserva do cliente no horário (status 'cancelled'), tira do
+    BOOKING_STATUS e invalida o índice de ocupação. Retorna o booking_id ou
+    None se não havia reserva ativa.
+    """
+    desired_datetime = desired_datetime_for(desired_date, desired_time)
+    with get_session() as session:
+        booking_id = session.execute(
+            _CANCEL_SQL, {"customer_id": customer_id, "desired_datetime": desired_datetime}
+        ).scalar_one_or_none()
+    BOOKING_STATUS.discard(customer_id, desired_datetime)
+    if booking_id is not None:
+        SLOT_INDEX.invalidate()
+    return None if booking_id is None else str(booking_id)
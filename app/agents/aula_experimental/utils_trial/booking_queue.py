@@ -0,0 +1,225 @@
+"""
+booking_queue.py — Fila write-behind das reservas de aula experimental.
+
+Com config["configurable"]["booking_write_mode"] = "write_behind", o nó
+trial_book não espera o INSERT: BOOKING_WRITER.submit() devolve na hora o
+booking_id (chave de idempotência, ver booking.booking_key) e uma thread de
+fundo grava as reservas pendentes em lote (insert_bookings_batch) a cada
+`flush_ms` ou quando a fila chega em `batch_size`.
+
+- Reenvio da mesma reserva (mesmo cliente + horário) antes ou depois do
+  flush devolve o mesmo id e não duplica a linha (mesmo id e mesmo upsert
+  do create_trial_booking: conflito só reativa reserva cancelada)
+- Linha gravada entra no BOOKING_STATUS (igual ao caminho síncrono): o retry
+  do "sim" depois do flush (nodes._already_booked) não disputa vaga de novo
+- Lote que falha é regravado linha a linha (uma transação por linha): uma
+  linha ruim (FK, tipo) não derruba as outras do lote
+- Linha que falha volta pra fila (até `max_attempts` flushes); depois vai pro
+  dead-letter: log de erro + `dead_letters` (em memória) + JSONL em
+  BOOKING_DEAD_LETTER_PATH, se definida. O cliente já recebeu "Agendado",
+  então a linha precisa ser reprocessada à mão, não descartada em silêncio
+- close() grava o que estiver pendente (shutdown do webhook / atexit)
+- submit(reserved=True): o nó já reservou a vaga (SLOT_INDEX.reserve); a
+  vaga fica "em voo" no índice até a linha ser gravada ou ir pro dead-letter
+
+Trade-off: a confirmação ao cliente sai antes da linha existir no banco; um
+crash do processo entre submit e flush perde as reservas pendentes.
+"""
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import os
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.agents.aula_experimental.utils_trial.availability import SLOT_INDEX, slot_key
+from app.agents.aula_experimental.utils_trial.booking import (
+    BOOKING_STATUS,
+    booking_row,
+    insert_bookings_batch,
+)
+
+logger = logging.getLogger(__name__)
+
+BOOKING_WRITE_MODES = ("sync", "async", "write_behind")
+
+
+class BookingWriteBehind:
+    """Fila thread-safe de reservas com flush em lote numa thread de fundo."""
+
+    def __init__(self, batch_size: int = 100, flush_ms: int = 200, max_attempts: int = 3,
+                 dead_letter_path: Optional[str] = None):
+        self.batch_size = batch_size
+        self.flush_ms = flush_ms
+        self.max_attempts = max_attempts
+        self.dead_letter_path = dead_letter_path
+        self.dead_letters: "deque[Dict[str, Any]]" = deque(maxlen=1000)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = False
+        self._thread: Optional[threading.Thread] = None
+        self._atexit = False
+        self._pending: Dict[str, Dict[str, Any]] = {}   # booking_id -> linha
+        self._attempts: Dict[str, int] = {}
+        self._reserved: set = set()   # ids com vaga reservada no SLOT_INDEX
+        self.acked = 0
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0   # linhas mandadas pro dead-letter
+
+    def submit(self, *, customer_id: str, desired_date: str, desired_time: str, reserved: bool = False) -> str:
+        """
+        Enfileira a reserva e devolve o booking_id (ack imediato, idempotente).
+        reserved=True: a vaga já foi reservada no SLOT_INDEX e a fila a libera.
+        """
+        row = booking_row(customer_id, desired_date, desired_time)
+        existing = BOOKING_STATUS.get(customer_id, row["desired_datetime"])   # já gravada
+        booking_id = existing or row["id"]
+        with self._lock:
+            queued = existing is None and booking_id not in self._pending
+            if queued:
+                self._pending[booking_id] = row
+                if reserved:
+                    self._reserved.add(booking_id)
+                self.acked += 1
+                full = len(self._pending) >= self.batch_size
+                self._ensure_thread()
+        if not queued:
+            if reserved:
+                SLOT_INDEX.release(desired_date, desired_time)
+            return booking_id
+        if not reserved:
+            # conta já no índice (sem invalidar: o banco ainda não tem a linha)
+            SLOT_INDEX.record_booking(desired_date, desired_time, invalidate=False)
+        if full:
+            self._wake.set()
+        return booking_id
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stop = False
+            self._thread = threading.Thread(target=self._run, name="smash-booking-writer", daemon=True)
+            self._thread.start()
+            if not self._atexit:
+                atexit.register(self.close)
+                self._atexit = True
+
+    def _run(self) -> None:
+        while not self._stop:
+            self._wake.wait(self.flush_ms / 1000)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> int:
+        """Grava as pendentes em lotes de batch_size. Retorna quantas linhas gravou."""
+        written = 0
+        dead = 0
+        done: list = []   # linhas que saíram da fila (gravadas ou dead-letter)
+        with self._flush_lock:
+            with self._lock:
+                rows = list(self._pending.values())
+            for start in range(0, len(rows), self.batch_size):
+                batch = rows[start:start + self.batch_size]
+                try:
+                    insert_bookings_batch(batch)
+                    ok, failed = batch, []
+                except Exception:
+                    ok, failed = self._insert_rows(batch)   # lote falhou: linha a linha
+                with self._lock:
+                    for row in ok:
+                        self._pending.pop(row["id"], None)
+                        self._attempts.pop(row["id"], None)
+                    self.written += len(ok)
+                    self.batches += 1 if ok else 0
+                for row in ok:
+                    BOOKING_STATUS.put(row["customer_id"], row["desired_datetime"], row["id"])
+                written += len(ok)
+                dead_rows = self._retry_later(failed)
+                dead += len(dead_rows)
+                done += ok + dead_rows
+        if written or dead:
+            SLOT_INDEX.invalidate()   # próxima leitura já vê o que está no banco
+        self._release(done)
+        return written
+
+    def _release(self, rows: list) -> None:
+        """Libera no índice as vagas reservadas das linhas que saíram da fila."""
+        with self._lock:
+            released = [row for row in rows if row["id"] in self._reserved]
+            self._reserved.difference_update(row["id"] for row in released)
+        for row in released:
+            SLOT_INDEX.release(*slot_key(row["desired_datetime"]))
+
+    @staticmethod
+    def _insert_rows(batch: list) -> Tuple[list, List[Tuple[Dict[str, Any], Exception]]]:
+        """Uma transação por linha: (gravadas, [(linha, erro)])."""
+        ok, failed = [], []
+        for row in batch:
+            try:
+                insert_bookings_batch([row])
+                ok.append(row)
+            except Exception as exc:
+                failed.append((row, exc))
+        return ok, failed
+
+    def _retry_later(self, failed: List[Tuple[Dict[str, Any], Exception]]) -> list:
+        """Conta a tentativa; quem passou de max_attempts vai pro dead-letter. Retorna essas linhas."""
+        dead = []
+        with self._lock:
+            for row, exc in failed:
+                attempts = self._attempts.get(row["id"], 0) + 1
+                if attempts >= self.max_attempts:
+                    self._pending.pop(row["id"], None)
+                    self._attempts.pop(row["id"], None)
+                    self.dropped += 1
+                    dead.append((row, exc))
+                else:
+                    self._attempts[row["id"]] = attempts
+        for row, exc in dead:
+            self._dead_letter(row, exc)
+        return [row for row, _ in dead]
+
+    def _dead_letter(self, row: Dict[str, Any], exc: Exception) -> None:
+        entry = {
+            "id": row["id"],
+            "customer_id": str(row["customer_id"]),
+            "desired_datetime": row["desired_datetime"].isoformat(),
+            "error": f"{type(exc).__name__}: {exc}",
+        }
+        self.dead_letters.append(entry)
+        logger.error("reserva %s não gravada após %d tentativas: %s", row["id"], self.max_attempts, entry["error"])
+        if self.dead_letter_path:
+            try:
+                with self._lock, open(self.dead_letter_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            except OSError:
+                logger.exception("falha gravando dead-letter em %s", self.dead_letter_path)
+
+    def close(self) -> None:
+        """Para a thread e grava o que estiver pendente."""
+        self._stop = True
+        self._wake.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        self.flush()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "acked": self.acked,
+                "written": self.written,
+                "batches": self.batches,
+                "dropped": self.dropped,
+            }
+
+
+BOOKING_WRITER = BookingWriteBehind(
+    batch_size=int(os.getenv("BOOKING_BATCH_SIZE", "100")),
+    flush_ms=int(os.getenv("BOOKING_FLUSH_MS", "200")),
+    dead_letter_path=os.getenv("BOOKING_DEAD_LETTER_PATH") or None,
+)
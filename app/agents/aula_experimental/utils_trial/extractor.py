@@ -18,6 +18,10 @@ O que este módulo faz:
   - texto do cliente
   - referência temporal (opcional, se você permitir normalizar "terça que vem")
 - Chama o LLM em modo Structured Output (Pydantic) e retorna TrialExtraction.
+- Schema e system prompt são por etapa (STAGE_FIELDS): collect_client_info pede
+  dados do aluno (+ data/horário opcionais), ask_date só data/horário/desistência,
+  awaiting_confirmation confirmação/desistência (+ data/horário, se o cliente
+  trocar o horário na confirmação). Prompt e saída menores.
 
 O que este módulo NÃO faz:
 - Não valida regra do negócio (ex: "é terça?") -> isso é responsabilidade do validators.py.
@@ -33,68 +37,108 @@ Benefícios:
 from __future__ import annotations
 from typing import Optional, List
 
-from langchain_core.messages import HumanMessage, AIMessage
-
-from app.agents.aula_experimental.utils_trial.schemas import TrialExtraction
-from app.agents.aula_experimental.utils_trial.prompts import TRIAL_EXTRACT_SYSTEM
+from app.agents.aula_experimental.utils_trial.schemas import STAGE_FIELDS, TrialExtraction, schema_for_stage
+from app.agents.aula_experimental.utils_trial.prompts import TRIAL_EXTRACT_SYSTEM, build_extract_system
 from app.core.datetime_utils import get_current_context
+from app.core.memory import DEFAULT_MAX_TOKENS, format_history
 
 
-def _format_recent_messages(messages: list, n: int = 4) -> str:
-    """Formata as últimas n mensagens (Human/AI) como texto para o prompt."""
-    if not messages:
-        return ""
-    recent = messages[-n:]
-    lines = []
-    for msg in recent:
-        if isinstance(msg, HumanMessage):
-            lines.append(f'Cliente: "{msg.content}"')
-        elif isinstance(msg, AIMessage):
-            lines.append(f'Bot: "{msg.content}"')
-    if not lines:
+def _format_recent_messages(messages: list, summary: str = "", n: int = 4,
+                            max_tokens: int = DEFAULT_MAX_TOKENS) -> str:
+    """Formata resumo + últimas n mensagens (Human/AI) como texto para o prompt, até max_tokens."""
+    history = format_history(messages, summary, max_messages=n, max_tokens=max_tokens, exclude_last=False,
+                             bot_label="Bot", quote=True)
+    if not history:
         return ""
-    return "Histórico recente da conversa:\n" + "\n".join(lines)
+    return "Histórico recente da conversa:\n" + history
 
 
 # Função para construir o prompt do usuário informando o contexto atual (stage atual, snapshot do trial, texto do cliente)
+# Ordem do menos pro mais volátil (cache de prefixo, ver app/core/prompts.py):
+# etapa -> terças do dia -> snapshot/histórico da conversa -> hora atual + mensagem
 def build_extract_user_prompt(*, client_text: str, stage: str, trial_snapshot: dict,
                                now_iso: str, weekday: str, next_tuesdays: list[str],
-                               recent_history: str = "") -> str:
+                               recent_history: str = "", with_dates: bool = True) -> str:
     history_block = f"\n{recent_history}\n" if recent_history else ""
-    return f"""
-Data/hora atual (referência): {now_iso} ({weekday})
-Próximas terças-feiras disponíveis: {', '.join(next_tuesdays)}
-
-Etapa do fluxo (stage): {stage}
-
+    # Referência temporal só quando a etapa extrai data/horário
+    tuesdays_block = f"Próximas terças-feiras disponíveis: {', '.join(next_tuesdays)}\n" if with_dates else ""
+    now_block = f"Data/hora atual (referência): {now_iso} ({weekday})\n\n" if with_dates else ""
+    return f"""Etapa do fluxo (stage): {stage}
+{tuesdays_block}
 Estado atual conhecido (trial_snapshot):
 {trial_snapshot}
 {history_block}
-Mensagem do cliente:
+{now_block}Mensagem do cliente:
 {client_text}
 
 Extraia somente o que estiver na mensagem do cliente.
 """
 
-# Função principal de extração usando LLM e schema definido
-def extract_trial_fields(llm, *, client_text: str, stage: str, trial_snapshot: dict,
-                         messages: Optional[List] = None) -> TrialExtraction:
+# System prompt por etapa (montado uma vez); etapas sem schema próprio usam o completo
+_STAGE_SYSTEM = {stage: build_extract_system(fields) for stage, fields in STAGE_FIELDS.items()}
+
+# Campos do trial que entram no snapshot do prompt (o resto — output, stage,
+# booking_id... — não ajuda a extrair e só gasta tokens)
+_SNAPSHOT_KEYS = ("nome", "idade", "nivel", "desired_date", "desired_time", "confirmed")
+
+
+def _snapshot_for_prompt(trial_snapshot: dict) -> dict:
+    return {k: trial_snapshot[k] for k in _SNAPSHOT_KEYS if trial_snapshot.get(k) is not None}
+
+
+def _extract_messages(*, client_text: str, stage: str, trial_snapshot: dict,
+                      messages: Optional[List] = None, summary: str = "",
+                      max_history_tokens: int = DEFAULT_MAX_TOKENS) -> list[dict]:
+    """Monta as mensagens (system/user) do extractor com o contexto temporal atual."""
     ctx = get_current_context()
-    recent_history = _format_recent_messages(messages or [], n=4)
+    recent_history = _format_recent_messages(messages or [], summary, n=4, max_tokens=max_history_tokens)
+    fields = STAGE_FIELDS.get(stage)
 
     user_prompt = build_extract_user_prompt(
         client_text=client_text,
         stage=stage,
-        trial_snapshot=trial_snapshot,
+        trial_snapshot=_snapshot_for_prompt(trial_snapshot or {}),
         now_iso=ctx["now_iso"],
         weekday=ctx["weekday"],
         next_tuesdays=ctx["next_tuesdays"],
         recent_history=recent_history,
+        with_dates=fields is None or "desired_date" in fields,
     )
-
-    # Padrão structured output
-    extractor = llm.with_structured_output(TrialExtraction)
-    return extractor.invoke([
-        {"role": "system", "content": TRIAL_EXTRACT_SYSTEM},
+    return [
+        {"role": "system", "content": _STAGE_SYSTEM.get(stage, TRIAL_EXTRACT_SYSTEM)},
         {"role": "user", "content": user_prompt},
-    ])
+    ]
+
+
+def _to_trial_extraction(result) -> TrialExtraction:
+    """Schema da etapa -> TrialExtraction (campos fora da etapa ficam None)."""
+    if result is None:
+        return TrialExtraction()
+    if isinstance(result, TrialExtraction):
+        return result
+    return TrialExtraction(**result.model_dump())
+
+
+# Função principal de extração usando LLM e schema definido
+def extract_trial_fields(llm, *, client_text: str, stage: str, trial_snapshot: dict,
+                         messages: Optional[List] = None, summary: str = "",
+                         max_history_tokens: int = DEFAULT_MAX_TOKENS) -> TrialExtraction:
+    prompt = _extract_messages(
+        client_text=client_text, stage=stage, trial_snapshot=trial_snapshot, messages=messages,
+        summary=summary, max_history_tokens=max_history_tokens,
+    )
+    # Padrão structured output, com o schema da etapa
+    extractor = llm.with_structured_output(schema_for_stage(stage))
+    return _to_trial_extraction(extractor.invoke(prompt))
+
+
+async def aextract_trial_fields(llm, *, client_text: str, stage: str, trial_snapshot: dict,
+                                messages: Optional[List] = None, summary: str = "",
+                                max_history_tokens: int = DEFAULT_MAX_TOKENS) -> TrialExtraction:
+    """Versão async de extract_trial_fields (ainvoke)."""
+    prompt = _extract_messages(
+        client_text=client_text, stage=stage, trial_snapshot=trial_snapshot, messages=messages,
+        summary=summary, max_history_tokens=max_history_tokens,
+    )
+    extractor = llm.with_structured_output(schema_for_stage(stage))
+    return _to_trial_extraction(await extractor.ainvoke(prompt))
@@ -0,0 +1,173 @@
+"""
+fake_llm.py — Chat model fake (determinístico, sem rede) para rodar o sistema localmente.
+
+Ativado com LLM_BACKEND=fake (ver get_llm.py). Serve para subir o webhook,
+testar concorrência e medir overhead do grafo sem gastar com a OpenAI.
+
+- Texto livre (merge, FAQ, NLG): devolve uma resposta fixa
+- Structured output: devolve o schema com defaults (TrialExtraction vazio,
+  TriageResult = general), ou o dict de um `responder(schema_name, input)`
+  injetado (ex: scripts/load_test.py)
+- Latência simulada opcional, em sleep ou asyncio.sleep: fixa (`latency`) ou
+  sorteada de uma distribuição (`latency_fn`, ver parse_latency)
+- Tokens estimados (~4 caracteres por token) e cache de prefixo simulado
+  (PrefixCacheSim, regras do cache automático da OpenAI): mede nas métricas
+  quanto do prompt seria servido do cache (cached_tokens)
+"""
+from __future__ import annotations
+
+import asyncio
+import math
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+from pydantic import Field
+
+from app.core.metrics import record_llm_call
+
+_DEFAULT_REPLY = "Resposta simulada (LLM fake)."
+
+# Cache automático de prefixo da OpenAI: prompts a partir de 1024 tokens,
+# acerto em incrementos de 128 tokens do início do prompt
+_CACHE_MIN_TOKENS = 1024
+_CACHE_BLOCK_TOKENS = 128
+_CHARS_PER_TOKEN = 4
+
+# Campos obrigatórios dos schemas usados com with_structured_output
+_STRUCTURED_DEFAULTS: Dict[str, Dict[str, Any]] = {
+    "TriageResult": {"intents": ["general"], "general_response": "Olá! Como posso ajudar?"},
+}
+
+
+def parse_latency(spec: str, seed: Optional[int] = None) -> Callable[[], float]:
+    """
+    Converte uma spec de latência (em ms) num sorteador que retorna segundos.
+
+        "300"                 fixa
+        "fixed:300"           fixa
+        "uniform:200,600"     uniforme entre 200 e 600
+        "normal:400,80"       normal (média, desvio), truncada em 0
+        "lognormal:400,0.5"   lognormal (mediana, sigma) — cauda longa, típico de API
+    """
+    rng = random.Random(seed)
+    lock = threading.Lock()
+    kind, _, args = spec.partition(":") if ":" in spec else ("fixed", "", spec)
+    params = [float(x) for x in args.split(",") if x.strip()]
+
+    if kind == "fixed":
+        draw = lambda: params[0]
+    elif kind == "uniform":
+        draw = lambda: rng.uniform(params[0], params[1])
+    elif kind == "normal":
+        draw = lambda: max(rng.gauss(params[0], params[1]), 0.0)
+    elif kind == "lognormal":
+        mu = math.log(max(params[0], 1e-9))
+        draw = lambda: rng.lognormvariate(mu, params[1])
+    else:
+        raise ValueError(f"Distribuicao de latencia desconhecida: {kind!r}")
+
+    def sample() -> float:
+        with lock:
+            return draw() / 1000
+    return sample
+
+
+def prompt_text(prompt: Any) -> str:
+    """Prompt serializado na ordem em que o provedor vê (papel + conteúdo de cada mensagem)."""
+    if not isinstance(prompt, (list, tuple)):
+        return str(prompt)
+    parts = []
+    for msg in prompt:
+        if isinstance(msg, dict):
+            parts.append(f"{msg.get('role')}: {msg.get('content')}")
+        else:
+            parts.append(f"{getattr(msg, 'type', '')}: {getattr(msg, 'content', '')}")
+    return "\n".join(parts)
+
+
+class PrefixCacheSim:
+    """Cache de prefixo simulado: quantos tokens do início do prompt já foram vistos (blocos de 128)."""
+
+    def __init__(self, max_entries: int = 200_000):
+        self.max_entries = max_entries
+        self._seen: set = set()
+        self._lock = threading.Lock()
+
+    def lookup(self, text: str) -> int:
+        """Tokens em cache para este prompt (0 abaixo de 1024) e registra os prefixos dele."""
+        if len(text) < _CACHE_MIN_TOKENS * _CHARS_PER_TOKEN:
+            return 0
+        block = _CACHE_BLOCK_TOKENS * _CHARS_PER_TOKEN
+        keys = [hash(text[:end]) for end in range(block, len(text) + 1, block)]
+        cached = 0
+        with self._lock:
+            for key in keys:
+                if key not in self._seen:
+                    break
+                cached += _CACHE_BLOCK_TOKENS
+            if len(self._seen) + len(keys) > self.max_entries:
+                self._seen.clear()
+            self._seen.update(keys)
+        return cached if cached >= _CACHE_MIN_TOKENS else 0
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model determinístico compatível com invoke/ainvoke/stream/with_structured_output."""
+
+    reply: str = _DEFAULT_REPLY
+    latency: float = 0.0   # segundos por chamada
+    latency_fn: Optional[Callable[[], float]] = None   # sobrescreve `latency` se definido
+    responder: Optional[Callable[[str, Any], Dict[str, Any]]] = None   # structured output
+    prefix_cache: Optional[PrefixCacheSim] = Field(default_factory=PrefixCacheSim)   # None desliga
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "smash-fake"
+
+    def _delay(self, prompt: Any) -> float:
+        # Conta a chamada nas métricas com tokens estimados (~4 caracteres por token)
+        self.calls += 1
+        text = prompt_text(prompt)
+        cached = self.prefix_cache.lookup(text) if self.prefix_cache is not None else 0
+        record_llm_call(len(text) // _CHARS_PER_TOKEN, len(self.reply) // _CHARS_PER_TOKEN, cached)
+        return self.latency_fn() if self.latency_fn else self.latency
+
+    def _result(self) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.reply))])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        if delay := self._delay(messages):
+            time.sleep(delay)
+        return self._result()
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager=None, **kwargs: Any) -> ChatResult:
+        if delay := self._delay(messages):
+            await asyncio.sleep(delay)
+        return self._result()
+
+    def with_structured_output(self, schema, **kwargs: Any):
+        def _build(_input):
+            if self.responder is not None:
+                return schema(**self.responder(schema.__name__, _input))
+            return schema(**_STRUCTURED_DEFAULTS.get(schema.__name__, {}))
+
+        def _invoke(_input):
+            if delay := self._delay(_input):
+                time.sleep(delay)
+            return _build(_input)
+
+        async def _ainvoke(_input):
+            if delay := self._delay(_input):
+                await asyncio.sleep(delay)
+            return _build(_input)
+
+        return RunnableLambda(_invoke, afunc=_ainvoke)
@@ -1,23 +1,93 @@
 """
-get_llm.py — Singleton do LLM usado pelo workflow de Aula Experimental.
+get_llm.py — LLMs do sistema, um cliente por papel (role) do grafo.
 
-Instancia o ChatOpenAI uma única vez e reutiliza nas chamadas seguintes.
+Cada nó pede o LLM do seu papel: get_llm("triage", config). O modelo, timeout
+e max_tokens de cada papel vêm de config["configurable"]["llm_models"], com
+defaults em _ROLE_SETTINGS e modelo base em OPENAI_MODEL (ou
+OPENAI_MODEL_<ROLE>, ex: OPENAI_MODEL_MERGE=gpt-4o):
+
+    {"configurable": {"llm_models": {
+        "triage": "gpt-4o-mini",                              # só o modelo
+        "merge": {"model": "gpt-4o", "timeout": 40},          # modelo + overrides
+    }}}
+
+Clientes são cacheados por (modelo, timeout, max_tokens): papéis com a mesma
+config compartilham a instância (e o pool HTTP).
+
+Com LLM_BACKEND=fake usa o FakeChatModel (fake_llm.py) para todos os papéis:
+sem rede, para testes locais (webhook, carga). LLM_FAKE_LATENCY_MS simula a
+latência do provedor (ms fixos ou distribuição, ex: "lognormal:400,0.5" — ver
+parse_latency).
 """
 
 from __future__ import annotations
 
 import os
+import threading
+from typing import Any, Dict, Optional
 
 from dotenv import load_dotenv
+from langchain_core.runnables import RunnableConfig
 from langchain_openai import ChatOpenAI
 
-_llm = None
+from app.core.config import get_option
+from app.core.metrics import LLM_USAGE_CALLBACK
+
+# Defaults por papel: tarefas curtas (classificação/extração) com timeout e
+# saída menores; composição de texto com mais folga.
+_ROLE_SETTINGS: Dict[str, Dict[str, Any]] = {
+    "triage":    {"timeout": 10, "max_tokens": 300},
+    "extractor": {"timeout": 15, "max_tokens": 300},
+    "nlg":       {"timeout": 15, "max_tokens": 300},
+    "faq":       {"timeout": 30, "max_tokens": 600},
+    "merge":     {"timeout": 30, "max_tokens": 800},
+    "memory":    {"timeout": 30, "max_tokens": 500},
+    "default":   {"timeout": 30, "max_tokens": None},
+}
 
+_llm = None   # FakeChatModel (LLM_BACKEND=fake) ou LLM injetado (ex: scripts/load_test.py)
+_clients: Dict[tuple, ChatOpenAI] = {}
+_lock = threading.Lock()
 
-def get_llm() -> ChatOpenAI:
+
+def _role_settings(role: str, config: Optional[RunnableConfig]) -> Dict[str, Any]:
+    settings = {
+        "model": os.getenv(f"OPENAI_MODEL_{role.upper()}") or os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
+        **_ROLE_SETTINGS.get(role, _ROLE_SETTINGS["default"]),
+    }
+    override = (get_option(config, "llm_models") or {}).get(role)
+    if isinstance(override, str):
+        settings["model"] = override
+    elif isinstance(override, dict):
+        settings.update(override)
+    return settings
+
+
+def get_llm(role: str = "default", config: Optional[RunnableConfig] = None) -> ChatOpenAI:
+    """LLM do papel `role` (triage, extractor, nlg, faq, merge, memory)."""
     global _llm
-    if _llm is None:
-        load_dotenv()
-        model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-        _llm = ChatOpenAI(model=model, temperature=0)
-    return _llm
+    if _llm is not None:
+        return _llm
+    load_dotenv()
+    if os.getenv("LLM_BACKEND", "openai") == "fake":
+        from app.agents.aula_experimental.utils_trial.fake_llm import FakeChatModel, parse_latency
+        _llm = FakeChatModel(latency_fn=parse_latency(os.getenv("LLM_FAKE_LATENCY_MS", "0")))
+        return _llm
+
+    settings = _role_settings(role, config)
+    key = (settings["model"], settings.get("timeout"), settings.get("max_tokens"))
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                # callback de métricas: chamadas/tokens por nó (stream_usage traz tokens no streaming)
+                client = _clients[key] = ChatOpenAI(
+                    model=key[0],
+                    temperature=0,
+                    timeout=key[1],
+                    max_tokens=key[2],
+                    stream_usage=True,
+                    callbacks=[LLM_USAGE_CALLBACK],
+                )
+    return client
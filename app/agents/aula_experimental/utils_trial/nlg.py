@@ -2,16 +2,28 @@
 nlg.py — Geração de mensagens (NLG) para o fluxo de Aula Experimental.
 
 A LLM só redige o texto. Não decide fluxo, regras ou dados.
+
+Layout pra cache de prefixo (ver app/core/prompts.py): o system message é fixo
+(_NLG_SYSTEM) e a mensagem do usuário vai do plano (stage/action/erro) pro
+mais volátil (snapshot, hora atual, mensagem do cliente).
 """
 from __future__ import annotations
 
 from typing import Optional
 
 from app.agents.aula_experimental.utils_trial.prompts import TRIAL_NLG_SYSTEM
-from app.core.prompts import SPECIALIST_BASE_PROMPT
+from app.agents.aula_experimental.utils_trial.slot_calendar import get_slot_calendar
+from app.core.prompts import SPECIALIST_BASE_PROMPT, static_system
 from app.core.datetime_utils import get_current_context
 
 
+_NLG_SYSTEM = static_system(
+    SPECIALIST_BASE_PROMPT,
+    TRIAL_NLG_SYSTEM,
+    "Contexto: CT Smash Beach Tennis (aula experimental as terças feiras).",
+)
+
+
 def _format_snapshot(snapshot: dict) -> str:
     """Converte o snapshot do trial em texto legível para o prompt da NLG."""
     if not snapshot:
@@ -29,9 +41,7 @@ def _format_snapshot(snapshot: dict) -> str:
     return "\n".join(lines) if lines else "(vazio)"
 
 
-# Função principal de geração de mensagens baseada em LLM e no contexto do trial recebido
-def generate_trial_message(
-    llm,
+def _nlg_messages(
     *,
     stage: str,
     action: str,
@@ -39,41 +49,94 @@ def generate_trial_message(
     error_code: Optional[str] = None,
     trial_snapshot: Optional[dict] = None,
     client_text: Optional[str] = None,
-) -> str:
-    """
-    Usa a LLM apenas para redigir a mensagem ao usuário.
-    Retorna texto puro (string), sanitizado.
-    Nunca decide fluxo ou regras.
-    """
+    suggested_slots: Optional[list[str]] = None,
+) -> list[dict]:
+    """Monta as mensagens (system/user) da NLG com o contexto do trial."""
     missing_fields = missing_fields or []
     trial_snapshot = trial_snapshot or {}
 
     client_context = ""
+    if suggested_slots:
+        client_context += f"Horários livres sugeridos: {', '.join(suggested_slots)}\n"
     if client_text:
-        client_context = f"\nMensagem original do cliente: {client_text}\n"
+        client_context += f"Mensagem original do cliente: {client_text}\n"
 
     ctx = get_current_context()
+    # Terças com horário válido (sem feriados/fechamentos), do calendário do dia
+    open_dates = get_slot_calendar().open_dates(4) or ctx["next_tuesdays"]
 
-    user_prompt = f"""
-Contexto: CT Smash Beach Tennis (aula experimental as terças feiras).
-Hoje: {ctx["today_ddmm"]} ({ctx["weekday"]}), {ctx["now_iso"]}
-Próximas terças disponíveis: {', '.join(ctx["next_tuesdays"])}
-
-Stage: {stage}
+    user_prompt = f"""Stage: {stage}
 Action: {action}
 Missing_fields: {missing_fields}
 Error_code: {error_code}
+Próximas terças disponíveis: {', '.join(open_dates)}
 Trial_snapshot:
 {_format_snapshot(trial_snapshot)}
+Hoje: {ctx["today_ddmm"]} ({ctx["weekday"]}), {ctx["now_iso"]}
 {client_context}
 Escreva UMA mensagem curta e direta ao usuário.
 """
+    return [
+        {"role": "system", "content": _NLG_SYSTEM},
+        {"role": "user", "content": user_prompt},
+    ]
+
+
+# Função principal de geração de mensagens baseada em LLM e no contexto do trial recebido
+def generate_trial_message(
+    llm,
+    *,
+    stage: str,
+    action: str,
+    missing_fields: Optional[list[str]] = None,
+    error_code: Optional[str] = None,
+    trial_snapshot: Optional[dict] = None,
+    client_text: Optional[str] = None,
+    suggested_slots: Optional[list[str]] = None,
+) -> str:
+    """
+    Usa a LLM apenas para redigir a mensagem ao usuário.
+    Retorna texto puro (string), sanitizado.
+    Nunca decide fluxo ou regras.
+    """
+    try:
+        result = llm.invoke(_nlg_messages(
+            stage=stage,
+            action=action,
+            missing_fields=missing_fields,
+            error_code=error_code,
+            trial_snapshot=trial_snapshot,
+            client_text=client_text,
+            suggested_slots=suggested_slots,
+        ))
+        content = getattr(result, "content", "")
+        return content.strip()
+    except Exception:
+        return ""
+
 
+async def agenerate_trial_message(
+    llm,
+    *,
+    stage: str,
+    action: str,
+    missing_fields: Optional[list[str]] = None,
+    error_code: Optional[str] = None,
+    trial_snapshot: Optional[dict] = None,
+    client_text: Optional[str] = None,
+    suggested_slots: Optional[list[str]] = None,
+) -> str:
+    """Versão async de generate_trial_message (ainvoke)."""
     try:
-        result = llm.invoke([
-            {"role": "system", "content": SPECIALIST_BASE_PROMPT + "\n\n" + TRIAL_NLG_SYSTEM},
-            {"role": "user", "content": user_prompt},
-        ])
+        result = await llm.ainvoke(_nlg_messages(
+            stage=stage,
+            action=action,
+            missing_fields=missing_fields,
+            error_code=error_code,
+            trial_snapshot=trial_snapshot,
+            client_text=client_text,
+            suggested_slots=suggested_slots,
+        ))
         content = getattr(result, "content", "")
         return content.strip()
     except Exception:
@@ -0,0 +1,245 @@
+"""
+nlg_cache.py — Cache de templates da NLG do trial (modo "cached").
+
+O texto da NLG depende basicamente de (stage, action, error_code,
+missing_fields). No modo cached (config["configurable"]["trial_nlg_mode"] =
+"cached") uma mensagem gerada pelo LLM para uma chave vira template: os
+valores do turno são trocados por placeholders
+
+    {nome}  {idade}  {nivel}  {date}  {time}  {next_tuesday}  {today}
+
+e os próximos turnos com a mesma chave só preenchem os slots, sem LLM.
+
+- Só aprende de texto gerado SEM a mensagem do cliente no prompt
+  (client_text): a NLG ecoa o que o cliente disse ("você comentou que
+  trabalha até as 18h") e isso iria pra todos os clientes seguintes. Na
+  prática os nós sempre mandam client_text, então os templates vêm do
+  pré-aquecimento offline (snapshot sintético, sem client_text)
+- Template que ainda contém algum dado do cliente (ex: "Iniciante" com
+  outra caixa) é descartado: dado de um cliente não vai pra outro
+- Não cacheia o que depende da pergunta do cliente (error_code "missing_date",
+  ver TRIAL_NLG_SYSTEM), dos horários livres sugeridos ("slot_full",
+  "closed", "past_time") nem textos que falam de "hoje" (mudam com o dia)
+- {next_tuesday} é a próxima terça com horário válido (slot_calendar.py)
+- Template com slot sem valor no turno atual = miss (chama o LLM de novo)
+- TTL por entrada (default 6h) + LRU com tamanho máximo
+- Pré-aquecimento offline: scripts/warm_nlg_cache.py gera os templates e grava
+  um JSON; TRIAL_NLG_CACHE_FILE aponta pro arquivo (carregado no primeiro uso,
+  entradas sem TTL)
+
+Contadores (hits/misses/evictions) em NLG_CACHE.snapshot().
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from app.agents.aula_experimental.utils_trial.slot_calendar import get_slot_calendar
+from app.core.datetime_utils import get_current_context
+from app.core.triage_rules import normalize
+
+NLG_MODES = ("llm", "cached")
+_DEFAULT_MAX_SIZE = 256
+_DEFAULT_TTL_SECONDS = 6 * 3600
+
+# Chaves cujo texto depende do turno (pergunta do cliente, horários sugeridos)
+_UNCACHEABLE_ERRORS = {"missing_date", "slot_full", "closed", "past_time"}
+_TODAY_RE = re.compile(r"\bhoje\b", re.IGNORECASE)
+# Dados do cliente que não podem sobrar no template (fora dos placeholders)
+_PERSONAL_FIELDS = ("nome", "idade", "nivel", "desired_date", "desired_time")
+
+
+def nlg_key(*, stage: str, action: str, error_code: Optional[str] = None,
+            missing_fields: Optional[list[str]] = None) -> Optional[str]:
+    """Chave do template (string, pra caber no JSON). None = não cacheável."""
+    if error_code in _UNCACHEABLE_ERRORS:
+        return None
+    return "|".join([stage, action, error_code or "", ",".join(missing_fields or [])])
+
+
+def slot_values(trial_snapshot: Optional[dict]) -> Dict[str, Optional[str]]:
+    """Valores dos placeholders no turno atual."""
+    trial_snapshot = trial_snapshot or {}
+    ctx = get_current_context()
+    open_dates = get_slot_calendar().open_dates(1) or ctx["next_tuesdays"]
+    return {
+        "nome": trial_snapshot.get("nome"),
+        "idade": trial_snapshot.get("idade"),
+        "nivel": trial_snapshot.get("nivel"),
+        "date": trial_snapshot.get("desired_date"),
+        "time": trial_snapshot.get("desired_time"),
+        "next_tuesday": open_dates[0],
+        "today": ctx["today_ddmm"],
+    }
+
+
+def _leaks(template: str, trial_snapshot: Optional[dict]) -> bool:
+    """True se algum dado do cliente sobrou no template (sem caixa nem acento)."""
+    plain = normalize(template)
+    for field in _PERSONAL_FIELDS:
+        value = normalize(str((trial_snapshot or {}).get(field) or ""))
+        if value and re.search(rf"(?<!\w){re.escape(value)}(?!\w)", plain):
+            return True
+    return False
+
+
+def to_template(text: str, values: Dict[str, Optional[str]],
+                trial_snapshot: Optional[dict] = None) -> Optional[str]:
+    """
+    Troca os valores do turno por placeholders. None se o texto não serve de
+    template (fala de "hoje" ou ainda contém dado do snapshot do cliente).
+    """
+    if not text or _TODAY_RE.search(text):
+        return None
+    template = text.replace("{", "{{").replace("}", "}}")
+    # Valores mais longos primeiro; data do cliente ganha da próxima terça se coincidirem
+    seen = set()
+    for slot, value in sorted(values.items(), key=lambda kv: -len(str(kv[1] or ""))):
+        if not value or str(value) in seen:
+            continue
+        seen.add(str(value))
+        template = re.sub(rf"(?<!\w){re.escape(str(value))}(?!\w)", "{" + slot + "}", template)
+    if _leaks(re.sub(r"\{\w+\}", "", template), trial_snapshot):
+        return None
+    return template
+
+
+def fill(template: str, values: Dict[str, Optional[str]]) -> Optional[str]:
+    """Preenche os slots. None se algum placeholder não tem valor neste turno."""
+    try:
+        return template.format_map(_StrictSlots(values))
+    except (KeyError, ValueError, IndexError):
+        return None
+
+
+class _StrictSlots(dict):
+    def __getitem__(self, key):
+        value = super().get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __missing__(self, key):
+        raise KeyError(key)
+
+
+class NLGTemplateCache:
+    """Cache LRU thread-safe de templates da NLG, com TTL por entrada."""
+
+    def __init__(self, max_size: int = _DEFAULT_MAX_SIZE, ttl_seconds: Optional[float] = _DEFAULT_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._file_loaded = False
+        self.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            # chave -> (template, expira_em | None)
+            self._entries: "OrderedDict[str, tuple[str, Optional[float]]]" = OrderedDict()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.expired = 0
+
+    def _load_env_file(self) -> None:
+        if self._file_loaded:
+            return
+        self._file_loaded = True
+        path = os.getenv("TRIAL_NLG_CACHE_FILE")
+        if path and os.path.exists(path):
+            self.load(path)
+
+    def get(self, key: str) -> Optional[str]:
+        self._load_env_file()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] is not None and entry[1] <= time.time():
+                del self._entries[key]
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: str, template: str, ttl_seconds: Optional[float] = -1) -> None:
+        """Grava o template (ttl_seconds=-1 usa o TTL do cache; None = não expira)."""
+        ttl = self.ttl_seconds if ttl_seconds == -1 else ttl_seconds
+        with self._lock:
+            self._entries[key] = (template, time.time() + ttl if ttl else None)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def render(self, *, stage: str, action: str, error_code: Optional[str] = None,
+               missing_fields: Optional[list[str]] = None, trial_snapshot: Optional[dict] = None) -> Optional[str]:
+        """Mensagem pronta a partir do template (sem LLM) ou None (miss)."""
+        key = nlg_key(stage=stage, action=action, error_code=error_code, missing_fields=missing_fields)
+        if key is None:
+            return None
+        template = self.get(key)
+        if template is None:
+            return None
+        text = fill(template, slot_values(trial_snapshot))
+        if text is None:   # template pede slot que este turno não tem
+            with self._lock:
+                self.hits -= 1
+                self.misses += 1
+        return text
+
+    def learn(self, text: str, *, stage: str, action: str, error_code: Optional[str] = None,
+              missing_fields: Optional[list[str]] = None, trial_snapshot: Optional[dict] = None,
+              client_text: Optional[str] = None, ttl_seconds: Optional[float] = -1) -> bool:
+        """
+        Guarda o texto gerado pelo LLM como template. True se cacheou.
+        Texto gerado com client_text no prompt nunca vira template.
+        """
+        if client_text:
+            return False
+        key = nlg_key(stage=stage, action=action, error_code=error_code, missing_fields=missing_fields)
+        template = to_template(text, slot_values(trial_snapshot), trial_snapshot) if key else None
+        if template is None:
+            return False
+        self.put(key, template, ttl_seconds)
+        return True
+
+    # Pré-aquecimento offline
+
+    def dump(self, path: str) -> int:
+        with self._lock:
+            data = {key: template for key, (template, _exp) in self._entries.items()}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        return len(data)
+
+    def load(self, path: str, ttl_seconds: Optional[float] = None) -> int:
+        """Carrega templates de um JSON {chave: template} (default: sem TTL)."""
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        for key, template in data.items():
+            self.put(key, template, ttl_seconds)
+        return len(data)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expired": self.expired,
+            }
+
+
+NLG_CACHE = NLGTemplateCache()
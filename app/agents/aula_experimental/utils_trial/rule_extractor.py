@@ -0,0 +1,222 @@
+"""
+rule_extractor.py — Pré-extrator determinístico (sem LLM) das etapas de data e confirmação.
+
+Em ask_date e awaiting_confirmation a maioria das respostas é curta e regular
+("18-02 às 15h", "terça que vem 9h", "sim", "não quero mais"). Aqui elas viram
+TrialExtraction por regras em português:
+
+- datas dd-mm / dd/mm, "dia 18", "hoje", "amanhã"
+- terça relativa ("terça", "próxima terça", "terça que vem") via _next_tuesdays;
+  "terça da semana que vem" = terça da próxima semana do calendário
+- horários "15h", "15:30", "às 9", "a partir das 18h", "3 da tarde",
+  "meio dia", "12 da noite"/"meia noite" (00:00)
+- confirmação sim/não (só em awaiting_confirmation) e desistência
+
+Confirmação ou desistência junto com data/horário ("sim, pode ser dia 25 às
+10h", "esquece o horário, pode ser 10h") não é resposta curta: vai pro LLM.
+
+Só devolve a extração quando o texto inteiro foi explicado pelas regras (o que
+sobra são palavras de ligação). Qualquer resto ambíguo ("pode ser depois do
+trabalho?") devolve None e o nó chama o extractor LLM com o texto completo.
+
+Contadores (chamadas do LLM evitadas) ficam em RULE_EXTRACT_STATS.
+Não altera estado e não valida regra de negócio (isso é do validators.py).
+"""
+from __future__ import annotations
+
+import re
+import threading
+from datetime import timedelta
+from typing import Dict, Optional
+
+from app.agents.aula_experimental.utils_trial.schemas import TrialExtraction
+from app.core.datetime_utils import _next_tuesdays, today
+from app.core.triage_rules import normalize
+
+# Etapas em que o pré-extrator roda (nas outras o texto é livre demais)
+RULE_STAGES = ("ask_date", "awaiting_confirmation")
+
+_CANCEL_RE = re.compile(
+    r"\b(?:nao quero mais|desisto|deixa pra la|deixa para la|"
+    r"cancela(?:r)?(?: tudo| o agendamento| a aula)?)\b"
+)
+_YES_RE = re.compile(
+    r"^(?:(?:sim|s|claro|isso|pode|confirmo|confirmado|ok|okay|beleza|blz|fechado|"
+    r"certo|perfeito|combinado|bora|com certeza)\b\s*)+"
+)
+_NO_RE = re.compile(r"^(?:nao|n|negativo)\b(?:\s*(?:posso|quero outr[oa] (?:horario|data|dia)))?")
+
+_DDMM_RE = re.compile(r"\b(\d{1,2})\s*[-/]\s*(\d{1,2})\b")
+_DAY_RE = re.compile(r"\bdia (\d{1,2})\b")
+_TUESDAY_RE = re.compile(
+    r"\b(?:(?:na )?proxima terca(?: feira)?|terca(?: feira)?(?: que vem| (?:da|na) (semana que vem))?)\b"
+)
+_TODAY_RE = re.compile(r"\bhoje\b")
+_TOMORROW_RE = re.compile(r"\bamanha\b")
+
+_PERIOD = r"(?:\s*(?:da|de) (manha|tarde|noite))?"
+_AT = r"(?:(?:a partir (?:das|de)|as) )"   # consumido junto com o horário
+_TIME_RES = (
+    re.compile(r"\b" + _AT + r"?(\d{1,2}):(\d{2})\s*(?:h|hs|horas?)?" + _PERIOD + r"\b"),
+    re.compile(r"\b" + _AT + r"?(\d{1,2})\s*(?:h|hs|horas?)(\d{2})?" + _PERIOD + r"\b"),
+    re.compile(r"\b" + _AT + r"(\d{1,2})(?![-/:\d])()" + _PERIOD + r"\b"),
+    re.compile(r"\b(\d{1,2})(?![-/:\d])()" + r"\s*(?:da|de) (manha|tarde|noite)\b"),
+)
+_NOON_RE = re.compile(r"\bmeio dia\b")
+_MIDNIGHT_RE = re.compile(r"\bmeia noite\b")
+
+# Palavras que podem sobrar sem mudar o sentido ("pode ser na terça às 9h então")
+_FILLERS = {
+    "a", "as", "o", "os", "de", "do", "da", "na", "no", "em", "pra", "para", "e", "entao",
+    "pode", "ser", "seria", "fica", "ficaria", "quero", "queria", "prefiro", "melhor",
+    "dia", "data", "horario", "hora", "por", "favor", "pf", "pfv", "vou", "vai",
+    "sim", "ok", "isso", "mesmo", "obrigado", "obrigada", "valeu", "vlw",
+    "marcar", "agendar", "umas", "tipo", "ai", "sabe", "olha",
+}
+
+
+def _ddmm(d) -> str:
+    return f"{d.day:02d}-{d.month:02d}"
+
+
+def _parse_time(norm: str) -> tuple[Optional[str], str, bool]:
+    """(HH:MM, texto sem o horário, ambíguo). Horas 1-6 sem período ficam pro LLM."""
+    if _NOON_RE.search(norm):
+        return "12:00", _NOON_RE.sub(" ", norm, count=1), False
+    if _MIDNIGHT_RE.search(norm):
+        return "00:00", _MIDNIGHT_RE.sub(" ", norm, count=1), False
+    for regex in _TIME_RES:
+        m = regex.search(norm)
+        if not m:
+            continue
+        hour, minute, period = int(m.group(1)), int(m.group(2) or 0), m.group(3)
+        if period == "noite" and hour == 12:   # "12 da noite" = meia-noite
+            hour = 0
+        elif period in ("tarde", "noite") and hour < 12:
+            hour += 12
+        elif period is None and 1 <= hour <= 6:
+            return None, norm, True
+        if hour > 23 or minute > 59:
+            return None, norm, True
+        return f"{hour:02d}:{minute:02d}", norm[:m.start()] + " " + norm[m.end():], False
+    return None, norm, False
+
+
+def _parse_date(norm: str, today) -> tuple[Optional[str], str, bool]:
+    """(dd-mm, texto sem a data, ambíguo)."""
+    m = _DDMM_RE.search(norm)
+    if m:
+        day, month = int(m.group(1)), int(m.group(2))
+        if not (1 <= day <= 31 and 1 <= month <= 12):
+            return None, norm, True
+        rest = _TUESDAY_RE.sub(" ", norm[:m.start()] + " " + norm[m.end():])
+        return f"{day:02d}-{month:02d}", rest, False
+
+    m = _DAY_RE.search(norm)
+    if m:
+        day = int(m.group(1))
+        if not 1 <= day <= 31:
+            return None, norm, True
+        month, year = today.month, today.year
+        if day < today.day:   # "dia 3" no dia 20 = mês que vem
+            month, year = (1, year + 1) if month == 12 else (month + 1, year)
+        rest = _TUESDAY_RE.sub(" ", norm[:m.start()] + " " + norm[m.end():])
+        return f"{day:02d}-{month:02d}", rest, False
+
+    if _TODAY_RE.search(norm):
+        return _ddmm(today), _TUESDAY_RE.sub(" ", _TODAY_RE.sub(" ", norm)), False
+    if _TOMORROW_RE.search(norm):
+        return _ddmm(today + timedelta(days=1)), _TUESDAY_RE.sub(" ", _TOMORROW_RE.sub(" ", norm)), False
+
+    m = _TUESDAY_RE.search(norm)
+    if m:
+        if m.group(1):   # "terça da semana que vem": terça da próxima semana (seg-dom)
+            date = _ddmm(today + timedelta(days=8 - today.weekday()))
+        else:
+            tuesdays = _next_tuesdays(2)
+            # Terça relativa é sempre a próxima depois de hoje (hoje terça = semana que vem)
+            date = tuesdays[1] if tuesdays[0] == _ddmm(today) else tuesdays[0]
+        return date, norm[:m.start()] + " " + norm[m.end():], False
+    return None, norm, False
+
+
+def rule_extract(text: str, stage: str) -> Optional[TrialExtraction]:
+    """
+    Extrai data/horário/confirmação/desistência por regras.
+    Retorna None se a etapa não usa regras, se nada foi extraído ou se sobrou
+    texto ambíguo (o nó chama o extractor LLM).
+    """
+    if stage not in RULE_STAGES:
+        return None
+    norm = normalize(text)
+    if not norm:
+        return None
+
+    fields: Dict[str, object] = {}
+    rest = norm
+
+    if _CANCEL_RE.search(rest):
+        fields["wants_to_cancel"] = True
+        rest = _CANCEL_RE.sub(" ", rest)
+    elif stage == "awaiting_confirmation":
+        m = _NO_RE.match(rest) or _YES_RE.match(rest)
+        if m:
+            fields["confirmed"] = m.re is _YES_RE
+            rest = rest[m.end():]
+
+    time_value, rest, ambiguous_time = _parse_time(rest)
+    date_value, rest, ambiguous_date = _parse_date(rest, today())
+    if ambiguous_time or ambiguous_date:
+        return None
+    # Desistência/confirmação + data ou horário = mensagem composta: LLM decide
+    if (time_value or date_value) and (fields.get("wants_to_cancel") or fields.get("confirmed") is True):
+        return None
+    if time_value:
+        fields["desired_time"] = time_value
+    if date_value:
+        fields["desired_date"] = date_value
+
+    leftover = [w for w in rest.split() if w not in _FILLERS]
+    if not fields or leftover:
+        return None
+    return TrialExtraction(**fields)
+
+
+# ---------------------------------------------------------------------------
+# Contadores
+# ---------------------------------------------------------------------------
+
+class RuleExtractStats:
+    """Contadores thread-safe: quantas extrações das etapas com regras evitaram o LLM."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.calls: Dict[str, int] = {}
+            self.hits: Dict[str, int] = {}
+
+    def record(self, stage: str, hit: bool) -> None:
+        with self._lock:
+            self.calls[stage] = self.calls.get(stage, 0) + 1
+            if hit:
+                self.hits[stage] = self.hits.get(stage, 0) + 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            calls = sum(self.calls.values())
+            hits = sum(self.hits.values())
+            return {
+                "calls": calls,
+                "llm_skipped": hits,
+                "skip_rate": hits / calls if calls else 0.0,
+                "by_stage": {
+                    stage: {"calls": n, "llm_skipped": self.hits.get(stage, 0)}
+                    for stage, n in sorted(self.calls.items())
+                },
+            }
+
+
+RULE_EXTRACT_STATS = RuleExtractStats()
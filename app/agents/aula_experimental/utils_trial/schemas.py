@@ -22,11 +22,15 @@ Princípios:
 
 Este schema é usado pelos nós do subgrafo (collect_client_info, ask_date, confirmation)
 para preencher slots progressivamente e avançar o stage com segurança.
+
+Schemas por etapa (STAGE_FIELDS / schema_for_stage): cada etapa só pede ao LLM
+os campos que usa — schema e prompt menores, menos tokens de entrada e saída.
+O resultado é sempre convertido de volta para TrialExtraction (extractor.py).
 """
 
 from __future__ import annotations
-from pydantic import BaseModel, Field
-from typing import Literal, Optional
+from pydantic import BaseModel, Field, create_model
+from typing import Dict, Literal, Optional, Tuple, Type
 
 Nivel = Literal["iniciante", "intermediario", "avancado"]
 
@@ -46,3 +50,35 @@ class TrialExtraction(BaseModel):
 
     # Cancelamento (desistência do agendamento inteiro)
     wants_to_cancel: Optional[bool] = Field(default=None, description="true se o cliente quer DESISTIR do agendamento inteiro. Não confundir com confirmed=false.")
+
+
+#--- Schemas por etapa (subconjuntos do TrialExtraction, mesmas descriptions) ---
+# collect_client_info também aceita data/horário: quem manda tudo de uma vez
+# ("Sou Lucas, 22, iniciante, terça que vem às 14h") não perde a data.
+# awaiting_confirmation também: "não, prefiro dia 24 às 10h" troca o horário.
+STAGE_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "collect_client_info": ("nome", "idade", "nivel", "desired_date", "desired_time", "wants_to_cancel"),
+    "ask_date": ("desired_date", "desired_time", "wants_to_cancel"),
+    "awaiting_confirmation": ("confirmed", "desired_date", "desired_time", "wants_to_cancel"),
+}
+
+_STAGE_SCHEMA_NAMES = {
+    "collect_client_info": "ClientInfoExtraction",
+    "ask_date": "DateTimeExtraction",
+    "awaiting_confirmation": "ConfirmationExtraction",
+}
+
+
+def _subset_schema(name: str, fields: Tuple[str, ...]) -> Type[BaseModel]:
+    base = TrialExtraction.model_fields
+    return create_model(name, **{f: (base[f].annotation, base[f]) for f in fields})
+
+
+STAGE_SCHEMAS: Dict[str, Type[BaseModel]] = {
+    stage: _subset_schema(_STAGE_SCHEMA_NAMES[stage], fields) for stage, fields in STAGE_FIELDS.items()
+}
+
+
+def schema_for_stage(stage: str) -> Type[BaseModel]:
+    """Schema de extração da etapa (TrialExtraction completo para etapas sem schema próprio)."""
+    return STAGE_SCHEMAS.get(stage, TrialExtraction)
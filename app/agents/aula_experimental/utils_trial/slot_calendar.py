@@ -0,0 +1,188 @@
+"""
+slot_calendar.py — Calendário pré-computado dos horários válidos da aula experimental.
+
+Monta uma vez por dia (relógio do turno, ver datetime_utils.today) todos os
+(dd-mm, HH:MM) válidos das próximas TRIAL_CALENDAR_WEEKS terças (default 8):
+terça × VALID_START_TIMES, menos fechamentos/feriados do arquivo
+TRIAL_CLOSURES_FILE. Consultas sem re-derivar as regras:
+
+- is_valid(date, time): O(1) (dict) + horário ainda não passou
+- next_slots(k): próximos k horários válidos, O(log n) (bisect) + k
+- nearest(date, time): horários válidos mais próximos de um pedido, O(log n)
+  (bisect + expansão pros dois lados)
+- open_dates(k): próximas terças com horário válido (lista da NLG)
+- closure(date): fechamento do dia (motivo / horários afetados)
+
+Arquivo de fechamentos (JSON, lista):
+
+    [
+      {"date": "2026-12-22", "reason": "Recesso de fim de ano"},
+      {"date": "2026-11-17", "times": ["07:00", "08:00"], "reason": "Torneio"},
+      {"date": "25-12", "reason": "Natal"}
+    ]
+
+- "date" YYYY-MM-DD = data única; dd-mm = todo ano
+- sem "times" = dia inteiro fechado
+
+O índice de ocupação (availability.py) continua separado: lotação muda a cada
+reserva, o calendário só com o dia ou com o arquivo (clear_slot_calendar).
+"""
+from __future__ import annotations
+
+import json
+import os
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.agents.aula_experimental.utils_trial.validators import VALID_START_TIMES
+from app.core.datetime_utils import calendar_for, now, today
+
+_DEFAULT_WEEKS = 8
+
+SlotKey = Tuple[str, str]   # (dd-mm, HH:MM)
+
+
+@dataclass(frozen=True)
+class Closure:
+    reason: str
+    times: Optional[frozenset] = None   # None = dia inteiro
+
+    def closes(self, desired_time: Optional[str]) -> bool:
+        return self.times is None or desired_time in self.times
+
+
+def format_slot(key: SlotKey) -> str:
+    """("17-02", "09:00") -> "17-02 às 09:00" (formato das sugestões da NLG)."""
+    return f"{key[0]} às {key[1]}"
+
+
+def load_closures(path: Optional[str]) -> Tuple[Dict[date, Closure], Dict[Tuple[int, int], Closure]]:
+    """Lê o arquivo de fechamentos -> (por data, anuais por (mês, dia)). Sem arquivo = vazio."""
+    if not path or not os.path.exists(path):
+        return {}, {}
+    with open(path, encoding="utf-8") as f:
+        entries = json.load(f)
+    dated: Dict[date, Closure] = {}
+    yearly: Dict[Tuple[int, int], Closure] = {}
+    for entry in entries:
+        raw = str(entry["date"]).strip()
+        times = entry.get("times")
+        closure = Closure(reason=entry.get("reason", ""), times=frozenset(times) if times else None)
+        if len(raw) == 5:   # dd-mm: todo ano
+            day, month = raw.split("-")
+            yearly[(int(month), int(day))] = closure
+        else:
+            dated[date.fromisoformat(raw)] = closure
+    return dated, yearly
+
+
+class SlotCalendar:
+    """Horários válidos das próximas `weeks` terças a partir de `day` (imutável)."""
+
+    def __init__(self, day: date, weeks: int = _DEFAULT_WEEKS,
+                 start_times: Tuple[str, ...] = VALID_START_TIMES,
+                 closures_file: Optional[str] = None):
+        self.day = day
+        self.weeks = weeks
+        self._dated, self._yearly = load_closures(closures_file)
+
+        first = calendar_for(day).next_tuesday_dates[0]
+        self.horizon = first + timedelta(weeks=weeks - 1)
+        self._slots: Dict[SlotKey, datetime] = {}
+        starts: List[Tuple[datetime, SlotKey]] = []
+        date_ends: List[Tuple[datetime, str]] = []
+        for i in range(weeks):
+            d = first + timedelta(weeks=i)
+            ddmm = f"{d.day:02d}-{d.month:02d}"
+            closure = self.closure(d)
+            last = None
+            for hhmm in start_times:
+                if closure is not None and closure.closes(hhmm):
+                    continue
+                hour, minute = hhmm.split(":")
+                start = datetime(d.year, d.month, d.day, int(hour), int(minute))
+                self._slots[(ddmm, hhmm)] = start
+                starts.append((start, (ddmm, hhmm)))
+                last = start
+            if last is not None:
+                date_ends.append((last, ddmm))
+        starts.sort()
+        self._starts = [s for s, _ in starts]
+        self._keys = [k for _, k in starts]
+        self._date_ends = [e for e, _ in date_ends]
+        self._dates = [ddmm for _, ddmm in date_ends]
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def closure(self, d: date) -> Optional[Closure]:
+        """Fechamento cadastrado para a data (qualquer data, não só o horizonte)."""
+        return self._dated.get(d) or self._yearly.get((d.month, d.day))
+
+    def covers(self, d: date) -> bool:
+        """True se a data está dentro do horizonte pré-computado."""
+        return self.day <= d <= self.horizon
+
+    def start_of(self, desired_date: str, desired_time: str) -> Optional[datetime]:
+        return self._slots.get((desired_date, desired_time))
+
+    def is_valid(self, desired_date: str, desired_time: str, after: Optional[datetime] = None) -> bool:
+        """O(1): horário existe no calendário e ainda não começou."""
+        start = self._slots.get((desired_date, desired_time))
+        return start is not None and start > (after or now())
+
+    def next_slots(self, k: int, after: Optional[datetime] = None) -> List[SlotKey]:
+        """Próximos k horários válidos depois de `after` (default: agora do turno)."""
+        i = bisect_right(self._starts, after or now())
+        return self._keys[i:i + k]
+
+    def open_dates(self, k: int, after: Optional[datetime] = None) -> List[str]:
+        """Próximas k terças (dd-mm) com pelo menos um horário válido."""
+        i = bisect_right(self._date_ends, after or now())
+        return self._dates[i:i + k]
+
+    def nearest(self, target: datetime, n: int = 1,
+                accept: Optional[Callable[[SlotKey], bool]] = None,
+                after: Optional[datetime] = None) -> List[SlotKey]:
+        """
+        Até n horários válidos mais próximos de `target` (distância absoluta),
+        só futuros e aceitos por accept(key) (ex: não lotado).
+        """
+        floor = bisect_right(self._starts, after or now())
+        hi = max(bisect_left(self._starts, target), floor)
+        lo = hi - 1
+        found: List[SlotKey] = []
+        while len(found) < n and (lo >= floor or hi < len(self._starts)):
+            take_hi = lo < floor or (
+                hi < len(self._starts) and self._starts[hi] - target <= target - self._starts[lo]
+            )
+            i = hi if take_hi else lo
+            if take_hi:
+                hi += 1
+            else:
+                lo -= 1
+            if accept is None or accept(self._keys[i]):
+                found.append(self._keys[i])
+        return found
+
+
+@lru_cache(maxsize=2)
+def _build(day: date, weeks: int, closures_file: Optional[str]) -> SlotCalendar:
+    return SlotCalendar(day, weeks=weeks, closures_file=closures_file)
+
+
+def get_slot_calendar() -> SlotCalendar:
+    """Calendário do dia do turno (construído uma vez por dia)."""
+    return _build(
+        today(),
+        int(os.getenv("TRIAL_CALENDAR_WEEKS", _DEFAULT_WEEKS)),
+        os.getenv("TRIAL_CLOSURES_FILE") or None,
+    )
+
+
+def clear_slot_calendar() -> None:
+    """Descarta o calendário (ex: arquivo de fechamentos editado)."""
+    _build.cache_clear()
@@ -10,9 +10,13 @@ Importante:
 
 Exemplos de regras típicas aqui:
 - desired_date deve ser uma terça-feira.
-- desired_date deve estar em formato dd-mm (dia-mês, ano assumido como atual).
+- desired_date deve estar em formato dd-mm (dia-mês; ano = próxima ocorrência,
+  ver parse_ddmm_date — "05-01" pedido em dezembro é janeiro do ano que vem).
 - desired_date deve ser uma data futura.
 - desired_time deve estar em formato HH:MM (24h) e ser válido.
+- o horário não pode estar lotado (slot_is_full, ver availability.py).
+- o dia/horário não pode estar fechado (feriado, evento) nem já ter começado
+  (calendar, ver slot_calendar.py).
 - Campos obrigatórios para avançar de etapa:
   - no stage de data/hora: desired_date/desired_time válidos
 
@@ -31,10 +35,15 @@ Resultado:
 
 
 from __future__ import annotations
-from typing import Optional
+from typing import TYPE_CHECKING, Callable, Optional
 from pydantic import BaseModel
 import datetime as dt
 
+from app.core.datetime_utils import now, today
+
+if TYPE_CHECKING:
+    from app.agents.aula_experimental.utils_trial.slot_calendar import SlotCalendar
+
 
 class ValidationResult(BaseModel):
     ok: bool
@@ -46,19 +55,41 @@ class ValidationResult(BaseModel):
 VALID_START_TIMES = ("07:00", "08:00", "09:00", "14:00", "15:00", "16:00", "17:00")
 VALID_TIME_RANGES = "07:00 às 10:00 e 14:00 às 18:00"
 
+# dd-mm que passou há até isso continua no passado (past_date), não vira o ano que vem
+_RECENT_PAST_DAYS = 60
+
 
 def parse_ddmm_date(s: str) -> dt.date | None:
-    """Converte 'dd-mm' em date assumindo o ano atual. Retorna None se inválido."""
+    """
+    Converte 'dd-mm' em date: próxima ocorrência a partir de hoje (relógio do
+    turno), então "05-01" em dezembro é janeiro do ano seguinte. Data que
+    passou há até _RECENT_PAST_DAYS continua no passado (vira past_date).
+    Mesmo ano que o SlotCalendar usa. Retorna None se inválido.
+    """
+    base = today()
     try:
         day, month = s.strip().split("-")
-        return dt.date(dt.date.today().year, int(month), int(day))
+        d = dt.date(base.year, int(month), int(day))
     except (ValueError, AttributeError):
         return None
+    if (base - d).days > _RECENT_PAST_DAYS:
+        return _with_year(d, base.year + 1)
+    previous = _with_year(d, base.year - 1)   # "30-12" em 3 de janeiro: passou há 4 dias
+    if previous is not None and (base - previous).days <= _RECENT_PAST_DAYS:
+        return previous
+    return d
+
+
+def _with_year(d: dt.date, year: int) -> dt.date | None:
+    try:
+        return d.replace(year=year)
+    except ValueError:   # 29-02 sem ano bissexto
+        return None
 
 
 def is_future_date(d: dt.date) -> bool:
-    """Retorna True se a data é hoje ou futura."""
-    return d >= dt.date.today()
+    """Retorna True se a data é hoje ou futura (hoje = relógio do turno)."""
+    return d >= today()
 
 
 def is_iso_time_hhmm(s: str) -> bool:
@@ -69,10 +100,27 @@ def is_iso_time_hhmm(s: str) -> bool:
         return False
 
 
-def validate_date_time(desired_date: Optional[str], desired_time: Optional[str]) -> ValidationResult:
+def validate_date_time(
+    desired_date: Optional[str],
+    desired_time: Optional[str],
+    slot_is_full: Optional[Callable[[str, str], bool]] = None,
+    calendar: Optional["SlotCalendar"] = None,
+) -> ValidationResult:
+    """
+    Valida data/horário. slot_is_full(date, time) (opcional) checa a lotação do horário.
+
+    Com calendar (SlotCalendar do dia), o horário válido sai num lookup O(1);
+    as regras abaixo só rodam pra descobrir o código de erro. Datas além do
+    horizonte do calendário caem nas regras + fechamentos.
+    """
     if desired_date is None:
         return ValidationResult(ok=False, error="missing_date")
 
+    if calendar is not None and desired_time is not None and calendar.is_valid(desired_date, desired_time):
+        if slot_is_full is not None and slot_is_full(desired_date, desired_time):
+            return ValidationResult(ok=False, error="slot_full")
+        return ValidationResult(ok=True)
+
     d = parse_ddmm_date(desired_date)
     if d is None:
         return ValidationResult(ok=False, error="invalid_date_format")
@@ -80,6 +128,10 @@ def validate_date_time(desired_date: Optional[str], desired_time: Optional[str])
         return ValidationResult(ok=False, error="not_tuesday")
     if not is_future_date(d):
         return ValidationResult(ok=False, error="past_date")
+    if calendar is not None:
+        closure = calendar.closure(d)
+        if closure is not None and closure.times is None:
+            return ValidationResult(ok=False, error="closed")
 
     if desired_time is None:
         return ValidationResult(ok=False, error="missing_time")
@@ -87,5 +139,13 @@ def validate_date_time(desired_date: Optional[str], desired_time: Optional[str])
         return ValidationResult(ok=False, error="invalid_time_format")
     if desired_time not in VALID_START_TIMES:
         return ValidationResult(ok=False, error="time_out_of_range")
+    if calendar is not None:
+        if closure is not None and closure.closes(desired_time):
+            return ValidationResult(ok=False, error="closed")
+        start = calendar.start_of(desired_date, desired_time)
+        if start is not None and start <= now():
+            return ValidationResult(ok=False, error="past_time")
+    if slot_is_full is not None and slot_is_full(desired_date, desired_time):
+        return ValidationResult(ok=False, error="slot_full")
 
     return ValidationResult(ok=True)
@@ -8,15 +8,29 @@ Estratégia:
 - nós por etapa
 - roteamento interno baseado em trial.stage
 - cada nó escreve trial.output, e exporta para specialists_outputs["trial"]
+- um nó pode avançar mais de uma etapa no mesmo turno quando a extração já
+  traz os campos da etapa seguinte (ver _apply_extraction em nodes.py); se
+  chegar em "book", o booking roda na sequência (after_stage_route)
+- todo nó roda dentro de with_turn_clock: datas relativas, validação e
+  booking usam o mesmo "agora" (state["turn_now"], ver datetime_utils.py)
 """
 
 from __future__ import annotations
 
+import threading
+
 from langgraph.graph import StateGraph, END
 from langchain_core.runnables import RunnableConfig
 
+from app.core.config import config_cache_key, is_async_graph
+from app.core.datetime_utils import with_turn_clock
+from app.core.metrics import instrument_node
 from app.core.state import GlobalState
 from app.agents.aula_experimental.nodes import (
+    atrial_ask_date,
+    atrial_awaiting_confirmation,
+    atrial_book,
+    atrial_collect_client_info,
     ensure_trial_defaults,
     trial_collect_client_info,
     trial_ask_date,
@@ -46,27 +60,63 @@ def trial_route(state: GlobalState) -> str:
     return stage_to_node.get(stage, "trial_collect_client_info")
 
 
-def after_confirm_route(state: GlobalState) -> str:
+def after_stage_route(state: GlobalState) -> str:
+    """Depois de um nó de etapa: booking no mesmo turno se chegou em "book"."""
     stage = (state.get("trial") or {}).get("stage")
     if stage == "book":
         return "trial_book"
     return "END"
 
 
+# Chaves de config["configurable"] que mudam a estrutura do subgrafo compilado.
+# As demais opções são lidas em runtime pelos nós (não exigem recompilar).
+TRIAL_GRAPH_BUILD_KEYS = ("async_graph",)
+
+_graph_cache: dict = {}
+_graph_cache_lock = threading.Lock()
+
+
 def build_trial_graph(config: RunnableConfig):
     """
     Factory única do subgrafo de Aula Experimental.
 
     Aceita apenas RunnableConfig (padrão LangGraph CLI/Studio).
     Cria o LLM internamente; persistência é feita via import direto em nodes.py.
+
+    Com config["configurable"]["async_graph"] = True, usa as variantes async
+    dos nós (ainvoke) — o grafo deve ser executado com ainvoke/astream.
+
+    O grafo compilado é cacheado por processo (chave = TRIAL_GRAPH_BUILD_KEYS);
+    invalidar com clear_trial_graph_cache().
     """
-    g = StateGraph(GlobalState)
+    key = config_cache_key(config, TRIAL_GRAPH_BUILD_KEYS)
+    with _graph_cache_lock:
+        graph = _graph_cache.get(key)
+        if graph is None:
+            graph = _graph_cache[key] = _compile_trial_graph(config)
+    return graph
 
-    g.add_node("trial_router", trial_router)
-    g.add_node("trial_collect_client_info", trial_collect_client_info)
-    g.add_node("trial_ask_date", trial_ask_date)
-    g.add_node("trial_awaiting_confirmation", trial_awaiting_confirmation)
-    g.add_node("trial_book", trial_book)
+
+def clear_trial_graph_cache() -> None:
+    """Descarta os subgrafos compilados (próximo build recompila)."""
+    with _graph_cache_lock:
+        _graph_cache.clear()
+
+
+def _compile_trial_graph(config: RunnableConfig):
+    g = StateGraph(GlobalState)
+    use_async = is_async_graph(config)
+
+    nodes = {
+        "trial_router": trial_router,
+        "trial_collect_client_info": atrial_collect_client_info if use_async else trial_collect_client_info,
+        "trial_ask_date": atrial_ask_date if use_async else trial_ask_date,
+        "trial_awaiting_confirmation": atrial_awaiting_confirmation if use_async else trial_awaiting_confirmation,
+        "trial_book": atrial_book if use_async else trial_book,
+    }
+    for name, fn in nodes.items():
+        # latência/LLM/tokens em METRICS; relógio do turno (turn_now) fixo no nó
+        g.add_node(name, instrument_node(name, with_turn_clock(fn)))
 
     g.set_entry_point("trial_router")
 
@@ -82,13 +132,8 @@ def build_trial_graph(config: RunnableConfig):
         },
     )
 
-    g.add_edge("trial_collect_client_info", END)
-    g.add_edge("trial_ask_date", END)
-    g.add_conditional_edges(
-        "trial_awaiting_confirmation",
-        after_confirm_route,
-        {"trial_book": "trial_book", "END": END},
-    )
+    for name in ("trial_collect_client_info", "trial_ask_date", "trial_awaiting_confirmation"):
+        g.add_conditional_edges(name, after_stage_route, {"trial_book": "trial_book", "END": END})
     g.add_edge("trial_book", END)
 
     return g.compile()
@@ -0,0 +1,99 @@
+"""
+embeddings.py -- Embeddings locais do FAQ (sem rede).
+
+HashingEmbeddings: TF-IDF sobre n-gramas com hashing trick, no lugar do
+text-embedding-3-small da OpenAI (FAQ_EMBEDDINGS=hashing, ver retriever.py).
+
+- Texto normalizado (minusculas, sem acento — mesmo normalize do triage)
+- Features: palavras, pares de palavras e n-gramas de caracteres (3 a 5)
+  dentro das palavras (pega "planos"/"plano", "aula"/"aulas")
+- Cada feature cai num de `dim` buckets (crc32, deterministico entre processos)
+- Peso: (1 + log tf) * idf, idf ajustado nos chunks do knowledge base (fit)
+- Vetor normalizado (L2): distancia L2 do FAISS ordena igual a cosine
+
+O idf fica salvo junto do indice FAISS (embeddings.json). Embedding de uma
+pergunta curta leva dezenas de microssegundos, sem chamada de API.
+"""
+from __future__ import annotations
+
+import json
+import math
+import zlib
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app.core.triage_rules import normalize
+
+_PARAMS_FILE = "embeddings.json"
+
+
+class HashingEmbeddings(Embeddings):
+    """Vetores TF-IDF de n-gramas com hashing trick (locais, deterministicos)."""
+
+    def __init__(self, dim: int = 4096, char_ngrams: tuple[int, int] = (3, 5),
+                 idf: Optional[Iterable[float]] = None):
+        self.dim = dim
+        self.char_ngrams = tuple(char_ngrams)
+        self.idf = np.asarray(list(idf), dtype=np.float32) if idf is not None else np.ones(dim, dtype=np.float32)
+
+    # -------------------------
+    # Features
+    # -------------------------
+
+    def _buckets(self, text: str) -> Counter:
+        words = normalize(text).split()
+        features = list(words)
+        features += [f"{a} {b}" for a, b in zip(words, words[1:])]
+        low, high = self.char_ngrams
+        for word in words:
+            padded = f" {word} "
+            for n in range(low, high + 1):
+                features += [padded[i:i + n] for i in range(len(padded) - n + 1)]
+        return Counter(zlib.crc32(f.encode("utf-8")) % self.dim for f in features)
+
+    def _vector(self, text: str) -> List[float]:
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for bucket, count in self._buckets(text).items():
+            vec[bucket] = 1.0 + math.log(count)
+        vec *= self.idf
+        norm = float(np.linalg.norm(vec))
+        return (vec / norm if norm else vec).tolist()
+
+    def fit(self, texts: List[str]) -> "HashingEmbeddings":
+        """Ajusta o idf nos documentos do indice (idf suavizado, como no sklearn)."""
+        df = np.zeros(self.dim, dtype=np.float32)
+        for text in texts:
+            df[list(self._buckets(text))] += 1
+        self.idf = (np.log((1 + len(texts)) / (1 + df)) + 1).astype(np.float32)
+        return self
+
+    # -------------------------
+    # Interface Embeddings
+    # -------------------------
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._vector(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        # CPU de microssegundos: roda inline, sem thread do executor
+        return self._vector(text)
+
+    # -------------------------
+    # Persistencia (junto do indice FAISS)
+    # -------------------------
+
+    def save(self, directory: Path) -> None:
+        params = {"dim": self.dim, "char_ngrams": list(self.char_ngrams), "idf": self.idf.tolist()}
+        (Path(directory) / _PARAMS_FILE).write_text(json.dumps(params), encoding="utf-8")
+
+    @classmethod
+    def load(cls, directory: Path) -> "HashingEmbeddings":
+        params = json.loads((Path(directory) / _PARAMS_FILE).read_text(encoding="utf-8"))
+        return cls(dim=params["dim"], char_ngrams=tuple(params["char_ngrams"]), idf=params["idf"])
@@ -9,13 +9,14 @@ Retrieval e deterministico (similarity search).
 """
 from __future__ import annotations
 
-from langchain_core.messages import HumanMessage, AIMessage
 from langchain_core.runnables import RunnableConfig
 
+from app.core.budget import acall_with_budget, call_with_budget
+from app.core.memory import format_history, history_max_tokens
 from app.core.state import GlobalState
-from app.core.prompts import SPECIALIST_BASE_PROMPT
+from app.core.prompts import SPECIALIST_BASE_PROMPT, static_system
 from app.agents.faq.prompt import FAQ_SYSTEM_PROMPT
-from app.agents.faq.retriever import retrieve_faq_context
+from app.agents.faq.retriever import aretrieve_faq_context, retrieve_faq_context
 from app.agents.aula_experimental.utils_trial.get_llm import get_llm
 
 
@@ -26,29 +27,28 @@ _FALLBACK_MESSAGE = (
 
 _MAX_HISTORY_MESSAGES = 6
 
+_FAQ_SYSTEM = static_system(SPECIALIST_BASE_PROMPT, FAQ_SYSTEM_PROMPT)
 
-def _format_history(messages) -> str:
-    """Formata ultimas mensagens (excluindo a atual) como contexto."""
-    msgs = messages[:-1] if messages else []
-    recent = msgs[-_MAX_HISTORY_MESSAGES:] if msgs else []
-    if not recent:
-        return ""
-    lines = []
-    for msg in recent:
-        if isinstance(msg, HumanMessage):
-            role = "Cliente"
-        elif isinstance(msg, AIMessage):
-            role = "Assistente"
-        else:
-            continue
-        content = msg.content
-        if isinstance(content, list):
-            content = " ".join(
-                b.get("text", "") for b in content
-                if isinstance(b, dict) and b.get("type") == "text"
-            )
-        lines.append(f"{role}: {content}")
-    return "\n".join(lines)
+
+def _faq_messages(query: str, history: str, context: str) -> list[dict]:
+    """
+    Monta as mensagens (system/user) da NLG do FAQ.
+
+    Trechos antes do historico: perguntas sobre o mesmo assunto recuperam os
+    mesmos trechos, e system + trechos vira prefixo comum entre clientes
+    (cache de prefixo do provedor, ver app/core/prompts.py).
+    """
+    parts = [f"Trechos relevantes:\n{context if context else '(nenhum trecho encontrado)'}"]
+    if history:
+        parts.append(f"Historico recente da conversa:\n{history}")
+    parts.append(f"Pergunta atual do cliente: {query}")
+    parts.append("Escreva UMA resposta curta e direta para o cliente.")
+
+    user_prompt = "\n\n".join(parts)
+    return [
+        {"role": "system", "content": _FAQ_SYSTEM},
+        {"role": "user", "content": user_prompt},
+    ]
 
 
 def faq_node(state: GlobalState, config: RunnableConfig) -> dict:
@@ -57,26 +57,25 @@ def faq_node(state: GlobalState, config: RunnableConfig) -> dict:
         return {"specialists_outputs": {"faq": _FALLBACK_MESSAGE}}
 
     # 1. Retrieval (similarity search deterministico — só client_input)
-    context = retrieve_faq_context(query)
+    # Falha no indice/embeddings (ex: sem API key) nao derruba o turno
+    # Sem orcamento de latencia do turno (budget.py) tambem cai no fallback
+    try:
+        context = call_with_budget(state, "faq", retrieve_faq_context, query)
+    except Exception:
+        context = None
+    if context is None:
+        return {"specialists_outputs": {"faq": _FALLBACK_MESSAGE}}
 
     # 2. Montar historico de conversa pra contexto da LLM
-    history = _format_history(state.get("messages", []))
+    history = format_history(
+        state.get("messages", []), state.get("conversation_summary", ""), max_messages=_MAX_HISTORY_MESSAGES,
+        max_tokens=history_max_tokens(config),
+    )
 
     # 3. NLG via LLM (com historico + trechos recuperados)
     try:
-        llm = get_llm()
-        parts = []
-        if history:
-            parts.append(f"Historico recente da conversa:\n{history}")
-        parts.append(f"Pergunta atual do cliente: {query}")
-        parts.append(f"Trechos relevantes:\n{context if context else '(nenhum trecho encontrado)'}")
-        parts.append("Escreva UMA resposta curta e direta para o cliente.")
-
-        user_prompt = "\n\n".join(parts)
-        response = llm.invoke([
-            {"role": "system", "content": SPECIALIST_BASE_PROMPT + "\n\n" + FAQ_SYSTEM_PROMPT},
-            {"role": "user", "content": user_prompt},
-        ])
+        llm = get_llm("faq", config)
+        response = call_with_budget(state, "faq", llm.invoke, _faq_messages(query, history, context))
         answer = getattr(response, "content", "").strip()
     except Exception:
         answer = ""
@@ -86,3 +85,33 @@ def faq_node(state: GlobalState, config: RunnableConfig) -> dict:
         answer = _FALLBACK_MESSAGE
 
     return {"specialists_outputs": {"faq": answer}}
+
+
+async def afaq_node(state: GlobalState, config: RunnableConfig) -> dict:
+    """Versao async do faq_node (retrieval e NLG via ainvoke)."""
+    query = state.get("client_input", "")
+    if not query:
+        return {"specialists_outputs": {"faq": _FALLBACK_MESSAGE}}
+
+    try:
+        context = await acall_with_budget(state, "faq", aretrieve_faq_context, query)
+    except Exception:
+        context = None
+    if context is None:
+        return {"specialists_outputs": {"faq": _FALLBACK_MESSAGE}}
+    history = format_history(
+        state.get("messages", []), state.get("conversation_summary", ""), max_messages=_MAX_HISTORY_MESSAGES,
+        max_tokens=history_max_tokens(config),
+    )
+
+    try:
+        llm = get_llm("faq", config)
+        response = await acall_with_budget(state, "faq", llm.ainvoke, _faq_messages(query, history, context))
+        answer = getattr(response, "content", "").strip()
+    except Exception:
+        answer = ""
+
+    if not answer:
+        answer = _FALLBACK_MESSAGE
+
+    return {"specialists_outputs": {"faq": answer}}
@@ -2,19 +2,30 @@
 retriever.py -- Retriever RAG para o FAQ da CT Smash.
 
 Carrega o knowledge base (ct_smash.md), splitta por headers markdown,
-gera embeddings via OpenAI e armazena em FAISS persistido em disco.
+gera embeddings e armazena em FAISS persistido em disco.
 
+Backend de embeddings em FAQ_EMBEDDINGS:
+- "openai" (default): text-embedding-3-small, uma chamada de API por pergunta
+- "hashing": TF-IDF de n-gramas local (embeddings.py), sem rede; o idf e
+  ajustado no build e salvo junto do indice
+
+Cada backend tem sua pasta de indice (vectorstore/, vectorstore_hashing/).
 Usa lazy singleton: na 1a chamada carrega do disco (se existe) ou builda e salva.
 """
 from __future__ import annotations
 
+import asyncio
+import os
 from pathlib import Path
+from typing import Dict, Optional
 
 from dotenv import load_dotenv
 from langchain_community.vectorstores import FAISS
-from langchain_openai import OpenAIEmbeddings
+from langchain_core.embeddings import Embeddings
 from langchain_text_splitters import MarkdownHeaderTextSplitter
 
+from app.agents.faq.embeddings import HashingEmbeddings
+
 _FAQ_DIR = Path(__file__).parent
 _KNOWLEDGE_PATH = _FAQ_DIR / "knowledge" / "ct_smash.md"
 # FAISS no Windows nao lida com Unicode em paths absolutos (ex: "João").
@@ -29,12 +40,28 @@ _HEADERS_TO_SPLIT = [
 
 _TOP_K = 4
 
-_vectorstore: FAISS | None = None
+FAQ_EMBEDDING_BACKENDS = ("openai", "hashing")
+
+_vectorstores: Dict[str, FAISS] = {}
 
 
 # Helpers internos (nao expostos fora deste módulo)
-def _get_embeddings() -> OpenAIEmbeddings:
+def _backend(backend: Optional[str] = None) -> str:
+    backend = backend or os.getenv("FAQ_EMBEDDINGS", "openai")
+    if backend not in FAQ_EMBEDDING_BACKENDS:
+        raise ValueError(f"FAQ_EMBEDDINGS desconhecido: {backend!r} (use {', '.join(FAQ_EMBEDDING_BACKENDS)})")
+    return backend
+
+
+def _vectorstore_dir(backend: str) -> Path:
+    return _VECTORSTORE_DIR if backend == "openai" else _VECTORSTORE_DIR.with_name(f"vectorstore_{backend}")
+
+
+def _get_embeddings(backend: str = "openai") -> Embeddings:
+    if backend == "hashing":
+        return HashingEmbeddings()
     load_dotenv()
+    from langchain_openai import OpenAIEmbeddings
     return OpenAIEmbeddings(model="text-embedding-3-small")
 
 
@@ -48,51 +75,82 @@ def _load_and_split():
     return splitter.split_text(md_text)
 
 
-def build_and_save_vectorstore() -> FAISS:
+def build_vectorstore(backend: Optional[str] = None) -> FAISS:
+    """Builda o FAISS index em memoria (backend hashing: ajusta o idf nos chunks antes)."""
+    backend = _backend(backend)
+    docs = _load_and_split()
+    embeddings = _get_embeddings(backend)
+    if isinstance(embeddings, HashingEmbeddings):
+        embeddings.fit([d.page_content for d in docs])
+    return FAISS.from_documents(docs, embeddings)
+
+
+def build_and_save_vectorstore(backend: Optional[str] = None) -> FAISS:
     """Builda o FAISS index do zero e salva em disco.
 
     Chamar quando ct_smash.md for alterado para recriar os embeddings.
     """
-    docs = _load_and_split()
-    embeddings = _get_embeddings()
-    store = FAISS.from_documents(docs, embeddings)
-    _VECTORSTORE_DIR.mkdir(parents=True, exist_ok=True)
+    backend = _backend(backend)
+    store = build_vectorstore(backend)
+    directory = _vectorstore_dir(backend)
+    directory.mkdir(parents=True, exist_ok=True)
     # FAISS: usar os.path.relpath para evitar bug com Unicode em path absoluto (Windows)
-    import os
-    rel = os.path.relpath(str(_VECTORSTORE_DIR))
+    rel = os.path.relpath(str(directory))
     store.save_local(rel)
+    if isinstance(store.embedding_function, HashingEmbeddings):
+        store.embedding_function.save(directory)
     return store
 
 
-def get_faq_retriever() -> FAISS:
-    """Retorna o FAISS vectorstore (singleton).
+def get_faq_retriever(backend: Optional[str] = None) -> FAISS:
+    """Retorna o FAISS vectorstore do backend (singleton por backend).
 
-    - Se a pasta vectorstore/ existe: carrega do disco (sem API call).
+    - Se a pasta do indice existe: carrega do disco (sem API call).
     - Se nao existe: builda embeddings e salva em disco.
     """
-    global _vectorstore
-    if _vectorstore is None:
-        embeddings = _get_embeddings()
-        if (_VECTORSTORE_DIR / "index.faiss").exists():
-            import os
-            rel = os.path.relpath(str(_VECTORSTORE_DIR))
-            _vectorstore = FAISS.load_local(
+    backend = _backend(backend)
+    store = _vectorstores.get(backend)
+    if store is None:
+        directory = _vectorstore_dir(backend)
+        if (directory / "index.faiss").exists():
+            embeddings = HashingEmbeddings.load(directory) if backend == "hashing" else _get_embeddings(backend)
+            rel = os.path.relpath(str(directory))
+            store = FAISS.load_local(
                 rel,
                 embeddings,
                 allow_dangerous_deserialization=True,
             )
         else:
-            _vectorstore = build_and_save_vectorstore() # builda do zero e salva para futuras chamadas
-    return _vectorstore # retorna o singleton carregado ou criado
+            store = build_and_save_vectorstore(backend) # builda do zero e salva para futuras chamadas
+        _vectorstores[backend] = store
+    return store # retorna o singleton carregado ou criado
 
 
-# Funcao principal: busca os top-K chunks mais relevantes e retorna como string formatada.
-def retrieve_faq_context(query: str, k: int = _TOP_K) -> str:
-    """Busca os top-K chunks mais relevantes e retorna como string formatada."""
-    store = get_faq_retriever()
-    docs = store.similarity_search(query, k=k)
+def _format_docs(docs) -> str:
     if not docs:
         return ""
     return "\n\n".join(
         f"[Trecho {i}]\n{d.page_content}" for i, d in enumerate(docs, 1)
     )
+
+
+# Funcao principal: busca os top-K chunks mais relevantes e retorna como string formatada.
+def retrieve_faq_context(query: str, k: int = _TOP_K, backend: Optional[str] = None) -> str:
+    """Busca os top-K chunks mais relevantes e retorna como string formatada."""
+    store = get_faq_retriever(backend)
+    docs = store.similarity_search(query, k=k)
+    return _format_docs(docs)
+
+
+async def aretrieve_faq_context(query: str, k: int = _TOP_K, backend: Optional[str] = None) -> str:
+    """Versao async: embedding da query via aembed_query (nao bloqueia o event loop)."""
+    backend = _backend(backend)
+    if backend not in _vectorstores:
+        # 1a chamada carrega/builda o indice (I/O de disco) fora do event loop
+        await asyncio.to_thread(get_faq_retriever, backend)
+    store = get_faq_retriever(backend)
+    if backend == "hashing":
+        # embedding local + busca num indice de ~16 vetores: submilissegundo, sem thread
+        return _format_docs(store.similarity_search(query, k=k))
+    docs = await store.asimilarity_search(query, k=k)
+    return _format_docs(docs)
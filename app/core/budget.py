@@ -0,0 +1,179 @@
+"""
+budget.py — Orçamento de latência por turno (deadline) com degradação determinística.
+
+O input_node grava `turn_deadline` (epoch em segundos) no estado a partir de
+config["configurable"]["turn_budget_ms"] (default 12000, 0 desliga). Todo nó
+que chama o LLM passa a chamada por call_with_budget/acall_with_budget: se o
+tempo restante não cobre a chamada (ou ela não termina até o deadline), o nó
+usa o comportamento determinístico que já existe no código:
+
+- triage: regras locais (triage_rules) sem threshold, senão trial/general
+- extractor do trial: extração vazia (o nó pede os campos de novo)
+- NLG do trial: texto `fallback` fixo do nó
+- FAQ: _FALLBACK_MESSAGE
+- merge: junção das saídas dos especialistas (template, sem LLM)
+- memory: não resume neste turno (fica pro próximo)
+
+Cada degradação conta em METRICS (smash_degradations_total{point=...}).
+
+No grafo sync a chamada roda num pool de threads e o nó espera no máximo o
+tempo restante; no async é asyncio.wait_for (cancela a chamada). Thread não
+se cancela: a chamada abandonada é cancelada se ainda estava na fila e, se já
+rodava, termina sozinha (limitada pelo timeout do cliente). Com
+_MAX_ABANDONED chamadas abandonadas ainda ocupando o pool, as novas degradam
+na hora em vez de esperar atrás delas.
+
+Streaming (merge): passar um CommitPoint. O deadline só vale até o primeiro
+chunk sair pro cliente (commit()); depois disso a chamada vai até o fim, pra
+resposta final ser o mesmo texto que o cliente recebeu.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Any, Awaitable, Callable, Optional
+
+from langchain_core.runnables import RunnableConfig
+
+from app.core.config import get_option
+from app.core.metrics import METRICS
+
+_DEFAULT_TURN_BUDGET_MS = 12000
+# Abaixo disso nem vale começar uma chamada de LLM
+_MIN_CALL_SECONDS = 0.3
+
+_MAX_WORKERS = 32
+# Chamadas que estouraram o deadline e ainda ocupam uma thread do pool
+_MAX_ABANDONED = _MAX_WORKERS // 2
+
+_executor = ThreadPoolExecutor(max_workers=_MAX_WORKERS, thread_name_prefix="smash-budget")
+_abandoned_lock = threading.Lock()
+_abandoned = 0
+
+
+def start_turn(config: RunnableConfig) -> Optional[float]:
+    """Deadline do turno (epoch) ou None se o orçamento estiver desligado."""
+    budget_ms = get_option(config, "turn_budget_ms", _DEFAULT_TURN_BUDGET_MS)
+    if not budget_ms:
+        return None
+    return time.time() + budget_ms / 1000
+
+
+def time_left(state: Optional[dict]) -> Optional[float]:
+    """Segundos até o deadline do turno (None = sem orçamento)."""
+    deadline = (state or {}).get("turn_deadline")
+    if deadline is None:
+        return None
+    return deadline - time.time()
+
+
+def expired(state: Optional[dict]) -> bool:
+    left = time_left(state)
+    return left is not None and left <= 0
+
+
+def check_deadline(state: Optional[dict]) -> None:
+    """Levanta TimeoutError se o deadline do turno já passou (usar dentro de loops)."""
+    if expired(state):
+        raise TimeoutError("orcamento do turno esgotado")
+
+
+def degrade(point: str) -> None:
+    """Registra uma degradação (nó `point` respondeu sem o LLM)."""
+    METRICS.record_degradation(point)
+
+
+class CommitPoint:
+    """
+    Ponto sem volta de uma chamada em streaming: ou ela começa a enviar
+    (commit) ou o deadline a abandona (abandon) — o que vier primeiro ganha.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._state: Optional[str] = None
+
+    def commit(self) -> bool:
+        """Antes do primeiro chunk. False = já abandonada (não enviar nada)."""
+        with self._lock:
+            self._state = self._state or "committed"
+            return self._state == "committed"
+
+    def abandon(self) -> bool:
+        """No deadline. False = já começou a enviar (esperar o fim)."""
+        with self._lock:
+            self._state = self._state or "abandoned"
+            return self._state == "abandoned"
+
+
+def _abandoned_done(_future) -> None:
+    global _abandoned
+    with _abandoned_lock:
+        _abandoned -= 1
+
+
+def _abandon(future) -> None:
+    """Desiste da chamada: cancela se ainda estava na fila, senão conta até terminar."""
+    global _abandoned
+    if future.cancel():
+        return
+    with _abandoned_lock:
+        _abandoned += 1
+    future.add_done_callback(_abandoned_done)
+
+
+def _pool_saturated() -> bool:
+    with _abandoned_lock:
+        return _abandoned >= _MAX_ABANDONED
+
+
+def call_with_budget(state: Optional[dict], point: str, fn: Callable[..., Any], /, *args: Any,
+                     fallback: Any = None, commit: Optional[CommitPoint] = None, **kwargs: Any) -> Any:
+    """
+    Roda fn(*args, **kwargs) dentro do tempo restante do turno.
+    Sem tempo (ou estourou o deadline): registra degradação e retorna `fallback`.
+    Com `commit`, depois que fn passou do commit() o deadline não corta mais:
+    espera o fim da chamada. Outras exceções sobem normalmente (cada nó trata as suas).
+    """
+    left = time_left(state)
+    if left is None:
+        return fn(*args, **kwargs)
+    if left < _MIN_CALL_SECONDS or _pool_saturated():
+        degrade(point)
+        return fallback
+    # copy_context: métricas por nó e callbacks do LangGraph seguem pra thread
+    future = _executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+    try:
+        return future.result(timeout=left)
+    except FutureTimeout:
+        if commit is not None and not commit.abandon():
+            return future.result()   # já está enviando: vai até o fim
+        _abandon(future)
+        degrade(point)
+        return fallback
+
+
+async def acall_with_budget(state: Optional[dict], point: str, fn: Callable[..., Awaitable[Any]], /, *args: Any,
+                            fallback: Any = None, commit: Optional[CommitPoint] = None, **kwargs: Any) -> Any:
+    """Versão async de call_with_budget (cancela a chamada no deadline, se não passou do commit)."""
+    left = time_left(state)
+    if left is None:
+        return await fn(*args, **kwargs)
+    if left < _MIN_CALL_SECONDS:
+        degrade(point)
+        return fallback
+    task = asyncio.ensure_future(fn(*args, **kwargs))
+    try:
+        done, _ = await asyncio.wait({task}, timeout=left)
+        if not done and (commit is None or commit.abandon()):
+            task.cancel()
+            degrade(point)
+            return fallback
+        return await task
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
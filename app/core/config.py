@@ -0,0 +1,44 @@
+"""
+config.py — Leitura de opções do RunnableConfig (config["configurable"]).
+
+Centraliza o acesso aos valores configuráveis usados pelos nós e factories
+(ex: merge_mode, triage_backend, async_graph), sem cada módulo repetir o
+`(config or {}).get("configurable") or {}`.
+"""
+from __future__ import annotations
+
+from typing import Any
+
+from langchain_core.runnables import RunnableConfig
+
+
+def get_configurable(config: RunnableConfig | None) -> dict:
+    """Retorna config["configurable"] (dict vazio se ausente)."""
+    return (config or {}).get("configurable") or {}
+
+
+def get_option(config: RunnableConfig | None, key: str, default: Any = None) -> Any:
+    """Retorna config["configurable"][key] ou default."""
+    return get_configurable(config).get(key, default)
+
+
+def is_async_graph(config: RunnableConfig | None) -> bool:
+    """True se o grafo deve ser compilado com as variantes async dos nós."""
+    return bool(get_option(config, "async_graph", False))
+
+
+def config_cache_key(config: RunnableConfig | None, keys: tuple[str, ...]) -> tuple:
+    """
+    Chave hashável com os valores de config["configurable"] em `keys`.
+    Usada pelos caches de grafo compilado (só as chaves que mudam a estrutura).
+    """
+    configurable = get_configurable(config)
+    key = []
+    for k in keys:
+        value = configurable.get(k)
+        try:
+            hash(value)
+        except TypeError:
+            value = repr(value)
+        key.append((k, value))
+    return tuple(key)
@@ -3,17 +3,122 @@ datetime_utils.py — Utilitários de data/hora compartilhados entre agentes.
 
 Fornece contexto temporal (dia da semana, data atual, próximas terças)
 para qualquer módulo que precise: extractor, NLG, validators, etc.
+
+Relógio do turno: o input_node grava `turn_now` (ISO) no estado uma vez por
+turno (config["configurable"]["now"] fixa o relógio — replays
+determinísticos). Os nós do trial rodam dentro de turn_clock(state) e todo
+módulo lê now()/today() daqui: o turno inteiro usa o mesmo "agora". Fora de
+um turno (scripts, nó chamado direto) now() é o relógio do sistema.
+
+O calendário do dia (próximas terças, dia da semana) é memoizado por
+data: recalcula uma vez por dia, não a cada chamada.
 """
 
 from __future__ import annotations
 
-from datetime import datetime, timedelta
+import inspect
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Callable, Iterator, Optional
+
+from langchain_core.runnables import RunnableConfig
+
+from app.core.config import get_option
 
 DIAS_SEMANA = [
     "segunda-feira", "terça-feira", "quarta-feira",
     "quinta-feira", "sexta-feira", "sábado", "domingo",
 ]
 
+_CALENDAR_TUESDAYS = 8
+
+_turn_now: ContextVar[Optional[datetime]] = ContextVar("turn_now", default=None)
+
+
+# ---------------------------------------------------------------------------
+# Relógio do turno
+# ---------------------------------------------------------------------------
+
+def capture_turn_now(config: Optional[RunnableConfig] = None) -> str:
+    """Snapshot do relógio para o turno (ISO). configurable.now sobrescreve (replay)."""
+    fixed = get_option(config, "now")
+    if fixed:
+        return fixed.isoformat(timespec="seconds") if isinstance(fixed, datetime) else str(fixed)
+    return datetime.now().isoformat(timespec="seconds")
+
+
+@contextmanager
+def turn_clock(state: Optional[dict]) -> Iterator[None]:
+    """Fixa now()/today() no turn_now do estado enquanto o bloco roda."""
+    value = (state or {}).get("turn_now")
+    token = _turn_now.set(datetime.fromisoformat(value) if value else None)
+    try:
+        yield
+    finally:
+        _turn_now.reset(token)
+
+
+def with_turn_clock(fn: Callable) -> Callable:
+    """Envolve um nó (state, config) para rodar dentro de turn_clock(state)."""
+    if inspect.iscoroutinefunction(fn):
+        async def _anode(state, config):
+            with turn_clock(state):
+                return await fn(state, config)
+
+        _anode.__name__ = _anode.__qualname__ = fn.__name__
+        return _anode
+
+    def _node(state, config):
+        with turn_clock(state):
+            return fn(state, config)
+
+    _node.__name__ = _node.__qualname__ = fn.__name__
+    return _node
+
+
+def now() -> datetime:
+    """Agora do turno (ou do sistema, fora de turn_clock)."""
+    return _turn_now.get() or datetime.now()
+
+
+def today() -> date:
+    return now().date()
+
+
+# ---------------------------------------------------------------------------
+# Calendário memoizado por dia
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class DayCalendar:
+    day: date
+    weekday: str                       # "terça-feira"
+    today_ddmm: str                    # "11-02"
+    next_tuesdays: tuple[str, ...]     # próximas terças (dd-mm); hoje entra se for terça
+    next_tuesday_dates: tuple[date, ...]
+
+
+def _ddmm(d: date) -> str:
+    return f"{d.day:02d}-{d.month:02d}"
+
+
+@lru_cache(maxsize=4)
+def calendar_for(day: date) -> DayCalendar:
+    """Calendário do dia (memoizado: o mesmo objeto pro dia inteiro)."""
+    days_ahead = (1 - day.weekday()) % 7  # 1 = terça
+    first = day + timedelta(days=days_ahead)
+    dates = tuple(first + timedelta(weeks=i) for i in range(_CALENDAR_TUESDAYS))
+    return DayCalendar(
+        day=day,
+        weekday=DIAS_SEMANA[day.weekday()],
+        today_ddmm=_ddmm(day),
+        next_tuesdays=tuple(_ddmm(d) for d in dates),
+        next_tuesday_dates=dates,
+    )
+
 
 def get_current_context() -> dict:
     """
@@ -23,26 +128,20 @@ def get_current_context() -> dict:
     - today_ddmm: "11-02"
     - next_tuesdays: ["11-02", "18-02", "25-02", "04-03"]
     """
-    now = datetime.now()
+    current = now()
+    cal = calendar_for(current.date())
     return {
-        "now_iso": now.isoformat(timespec="minutes"),
-        "weekday": DIAS_SEMANA[now.weekday()],
-        "today_ddmm": f"{now.day:02d}-{now.month:02d}",
-        "next_tuesdays": _next_tuesdays(4),
+        "now_iso": current.isoformat(timespec="minutes"),
+        "weekday": cal.weekday,
+        "today_ddmm": cal.today_ddmm,
+        "next_tuesdays": list(cal.next_tuesdays[:4]),
     }
 
 
 def _next_tuesdays(n: int = 4) -> list[str]:
     """Retorna as próximas N terças-feiras futuras em formato dd-mm."""
-    today = datetime.now().date()
-    days_ahead = (1 - today.weekday()) % 7  # 1 = terça
-    tuesdays = []
-    if days_ahead == 0:
-        # hoje é terça → incluir hoje na lista
-        tuesdays.append(f"{today.day:02d}-{today.month:02d}")
-        days_ahead = 7  # próximas terças começam daqui a 7 dias
-    d = today + timedelta(days=days_ahead)
-    for _ in range(n):
-        tuesdays.append(f"{d.day:02d}-{d.month:02d}")
-        d += timedelta(weeks=1)
-    return tuesdays
+    cal = calendar_for(today())
+    if n <= len(cal.next_tuesdays):
+        return list(cal.next_tuesdays[:n])
+    first = cal.next_tuesday_dates[0]
+    return [_ddmm(first + timedelta(weeks=i)) for i in range(n)]
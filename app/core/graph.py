@@ -2,54 +2,96 @@
 graph.py — Grafo core (principal) do sistema SMASH.
 
 Fluxo:
-  input_node → triage → [Send] → trial / faq / merge → merge → END
+  input_node → triage → [Send] → trial / faq / merge → merge → memory → END
 
 - input_node: extrai client_input da ultima HumanMessage
-- triage: classifica intencao (LLM), suporta multi-intent e contexto ativo
+- triage: classifica intencao (fast-path local ou LLM), suporta multi-intent e contexto ativo
 - trial: subgrafo de aula experimental (real)
-- faq: stub (placeholder)
+- faq: RAG sobre o knowledge base do CT
 - merge: compoe resposta final a partir de specialists_outputs
+- memory: dobra turnos antigos de messages num resumo incremental (memory.py)
 
 Routing usa Send() pra suportar execucao paralela de especialistas
 (ex: trial + faq ao mesmo tempo).
 """
 from __future__ import annotations
 
+import threading
+
 from langgraph.graph import StateGraph, END
 from langgraph.constants import Send
 from langchain_core.messages import HumanMessage
 from langchain_core.runnables import RunnableConfig
 
+from app.core.budget import start_turn
+from app.core.config import config_cache_key, get_option, is_async_graph
+from app.core.datetime_utils import capture_turn_now
 from app.core.state import GlobalState
-from app.core.merge import merge
-from app.core.triage import triage
-from app.agents.aula_experimental.workflow import build_trial_graph
-from app.agents.faq.node import faq_node
+from app.core.memory import amemory, memory
+from app.core.merge import amerge, merge
+from app.core.metrics import instrument_node
+from app.core.triage import atriage, triage
+from app.agents.aula_experimental.workflow import (
+    TRIAL_GRAPH_BUILD_KEYS,
+    build_trial_graph,
+    clear_trial_graph_cache,
+)
+from app.agents.faq.node import afaq_node, faq_node
+from app.tools.checkpointer import get_checkpointer
 
 
 # Adapter só pra langraph CLI/Studio, Backend com wpp vai mudar depois
 def input_node(state: GlobalState, config: RunnableConfig) -> dict:
     """
-    No de entrada: extrai o texto da ultima mensagem do usuario
+    No de entrada: extrai o texto das mensagens do usuario do turno
     e seta client_input para os nos especialistas consumirem.
 
     O Studio envia a entrada como HumanMessage em messages.
     Os nos do trial leem de client_input (string pura).
     Este no faz a ponte entre os dois.
+
+    Coalescencia: todas as HumanMessage depois da ultima resposta do
+    assistente (rajada "oi" / "quero marcar" / "sou o Joao") viram um unico
+    client_input, entao o pipeline roda uma vez com a entrada completa.
+
+    Cada mensagem so e lida uma vez: o id da mais nova vai em
+    consumed_input_id. Se o turno falhar depois disso (sem resposta do
+    assistente), a mensagem fica no historico mas nao entra de novo no
+    client_input do proximo turno.
+
+    Tambem zera specialists_outputs: com checkpointer o estado do turno
+    anterior e retomado, e o merge so deve ver as saidas do turno atual.
+
+    E inicia o orcamento de latencia do turno (turn_deadline, ver budget.py)
+    e fixa o relogio do turno (turn_now, ver datetime_utils.py): todos os nos
+    do turno usam o mesmo "agora".
     """
-    messages = state.get("messages", [])
-    for msg in reversed(messages):
-        if isinstance(msg, HumanMessage):
-            content = msg.content
-            # Studio pode enviar content como lista de blocos (multimodal)
-            # Ex: [{"type": "text", "text": "..."}]
-            if isinstance(content, list):
-                content = " ".join(
-                    block.get("text", "") for block in content
-                    if isinstance(block, dict) and block.get("type") == "text"
-                )
-            return {"client_input": content}
-    return {}
+    deadline = start_turn(config)
+    turn = {"specialists_outputs": None, "turn_deadline": deadline, "turn_now": capture_turn_now(config)}
+    consumed = state.get("consumed_input_id")
+    pending = []
+    newest_id = None
+    for msg in reversed(state.get("messages", [])):
+        if consumed is not None and msg.id == consumed:
+            break
+        if not isinstance(msg, HumanMessage):
+            if pending:
+                break
+            continue
+        newest_id = newest_id or msg.id
+        content = msg.content
+        # Studio pode enviar content como lista de blocos (multimodal)
+        # Ex: [{"type": "text", "text": "..."}]
+        if isinstance(content, list):
+            content = " ".join(
+                block.get("text", "") for block in content
+                if isinstance(block, dict) and block.get("type") == "text"
+            )
+        if content:
+            pending.append(content)
+    if not pending:
+        return turn
+    return {"client_input": "\n".join(reversed(pending)), "consumed_input_id": newest_id, **turn}
 
 
 def route_after_triage(state: GlobalState):
@@ -65,20 +107,62 @@ def route_after_triage(state: GlobalState):
     return [Send(route, state) for route in routes]
 
 
+# Chaves de config["configurable"] que mudam a estrutura do grafo compilado
+# (inclui as do subgrafo trial). As demais sao lidas em runtime pelos nos.
+CORE_GRAPH_BUILD_KEYS = tuple(dict.fromkeys(("async_graph", "persist_state") + TRIAL_GRAPH_BUILD_KEYS))
+
+_graph_cache: dict = {}
+_graph_cache_lock = threading.Lock()
+
+
 def build_core_graph(config: RunnableConfig):
     """
     Factory do grafo principal.
 
     Aceita apenas RunnableConfig (padrao LangGraph CLI/Studio).
+
+    Com config["configurable"]["async_graph"] = True, compila o grafo com as
+    variantes async dos nos (triage, faq, trial, merge via ainvoke/astream).
+    Executar com ainvoke/astream: um processo multiplexa varias conversas
+    no mesmo event loop enquanto espera o LLM.
+
+    Com config["configurable"]["persist_state"] = True, compila com o
+    checkpointer persistente (app/tools/checkpointer.py): o estado fica salvo
+    por thread_id e o caller so envia a nova mensagem a cada turno. Fica
+    desligado por padrao (o LangGraph CLI/Studio injeta o proprio checkpointer).
+
+    O grafo compilado e cacheado por processo (chave = CORE_GRAPH_BUILD_KEYS):
+    chamadas seguintes com a mesma config nao recompilam. Invalidar com
+    clear_graph_cache().
     """
+    key = config_cache_key(config, CORE_GRAPH_BUILD_KEYS)
+    with _graph_cache_lock:
+        graph = _graph_cache.get(key)
+        if graph is None:
+            graph = _graph_cache[key] = _compile_core_graph(config)
+    return graph
+
+
+def clear_graph_cache() -> None:
+    """Descarta os grafos compilados (core + subgrafo trial)."""
+    with _graph_cache_lock:
+        _graph_cache.clear()
+    clear_trial_graph_cache()
+
+
+def _compile_core_graph(config: RunnableConfig):
     g = StateGraph(GlobalState)
+    use_async = is_async_graph(config)
 
     # --- nos ---
-    g.add_node("input_node", input_node)
-    g.add_node("triage", triage)
+    # (instrument_node: latencia/LLM/tokens por no em METRICS. O subgrafo trial
+    # nao e envolvido pra manter a renderizacao no Studio; seus nos sao.)
+    g.add_node("input_node", instrument_node("input_node", input_node))
+    g.add_node("triage", instrument_node("triage", atriage if use_async else triage))
     g.add_node("trial", build_trial_graph(config))   # subgrafo compilado
-    g.add_node("faq", faq_node)
-    g.add_node("merge", merge)
+    g.add_node("faq", instrument_node("faq", afaq_node if use_async else faq_node))
+    g.add_node("merge", instrument_node("merge", amerge if use_async else merge))
+    g.add_node("memory", instrument_node("memory", amemory if use_async else memory))
 
     # --- fluxo ---
     g.set_entry_point("input_node")
@@ -86,6 +170,8 @@ def build_core_graph(config: RunnableConfig):
     g.add_conditional_edges("triage", route_after_triage)
     g.add_edge("trial", "merge")
     g.add_edge("faq", "merge")
-    g.add_edge("merge", END)
+    g.add_edge("merge", "memory")
+    g.add_edge("memory", END)
 
-    return g.compile()
+    checkpointer = get_checkpointer() if get_option(config, "persist_state", False) else None
+    return g.compile(checkpointer=checkpointer)
@@ -0,0 +1,217 @@
+"""
+memory.py — Memoria de conversa limitada com resumo incremental.
+
+Politica de retencao de GlobalState.messages:
+- Os ultimos N turnos (HumanMessage + respostas) ficam literais
+- Turnos mais antigos sao "dobrados" num resumo (conversation_summary) e
+  removidos de messages (RemoveMessage). O resumo e recalculado de forma
+  incremental: resumo anterior + so os turnos que sairam da janela
+- Ao montar prompts, o historico (resumo + janela literal) respeita o teto
+  memory_max_tokens: o resumo ocupa ate metade (cortado se passar) e a janela
+  literal fica com o resto. Quem renderiza passa history_max_tokens(config)
+
+O no memory (apos o merge) aplica a politica; triage, FAQ, extractor do trial
+e merge leem o historico pelas funcoes de render daqui, entao todos veem a
+mesma janela + resumo.
+
+Configuravel via config["configurable"]:
+- memory_keep_turns (default 4; 0 desliga a compactacao)
+- memory_max_tokens (default 1200): teto do historico nos prompts; o resumo
+  gerado pede no maximo metade disso
+"""
+from __future__ import annotations
+
+from typing import List, Optional
+
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage, RemoveMessage
+from langchain_core.runnables import RunnableConfig
+
+from app.core.budget import acall_with_budget, call_with_budget
+from app.core.config import get_option
+from app.core.state import GlobalState
+from app.agents.aula_experimental.utils_trial.get_llm import get_llm
+
+DEFAULT_KEEP_TURNS = 4
+DEFAULT_MAX_TOKENS = 1200
+# So compacta quando ha FOLD_BATCH turnos excedentes: 1 chamada de LLM a cada
+# FOLD_BATCH turnos em vez de uma por turno.
+_FOLD_BATCH_TURNS = 2
+
+SUMMARY_PROMPT = """Você mantém o resumo de uma conversa de WhatsApp entre um cliente e o assistente da CT Smash Beach Tennis.
+Atualize o resumo anterior incorporando as novas mensagens.
+
+Regras:
+- Mantenha dados concretos: nome, idade, nível, datas, horários, pedidos e dúvidas do cliente
+- Registre o que já foi respondido ou combinado
+- Não invente nada além do que está nas mensagens
+- Escreva em português, em no máximo {max_words} palavras"""
+
+
+# -------------------------
+# Helpers
+# -------------------------
+
+def message_text(msg: AnyMessage) -> str:
+    """Texto da mensagem (Studio pode enviar content como lista de blocos)."""
+    content = msg.content
+    if isinstance(content, list):
+        content = " ".join(
+            b.get("text", "") for b in content
+            if isinstance(b, dict) and b.get("type") == "text"
+        )
+    return content or ""
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimativa barata (~4 caracteres por token em PT-BR), sem tokenizer."""
+    return len(text) // 4 + 1
+
+
+def split_turns(messages: List[AnyMessage]) -> List[List[AnyMessage]]:
+    """
+    Agrupa mensagens em turnos: uma HumanMessage depois de uma resposta abre
+    um turno novo (rajada coalescida de HumanMessage conta como um turno).
+    """
+    turns: List[List[AnyMessage]] = []
+    for msg in messages:
+        if not turns or (isinstance(msg, HumanMessage) and not isinstance(turns[-1][-1], HumanMessage)):
+            turns.append([msg])
+        else:
+            turns[-1].append(msg)
+    return turns
+
+
+def cap_summary(summary: str, max_tokens: int) -> str:
+    """Corta o resumo em ~max_tokens (estimate_tokens), no limite de palavra."""
+    max_chars = max_tokens * 4
+    if len(summary) <= max_chars:
+        return summary
+    return summary[:max_chars].rsplit(" ", 1)[0].rstrip() + "…"
+
+
+def history_window(messages: List[AnyMessage], summary: str = "", *, max_messages: Optional[int] = None,
+                   max_tokens: int = DEFAULT_MAX_TOKENS, exclude_last: bool = False) -> tuple[str, List[AnyMessage]]:
+    """(resumo cortado, janela literal) que juntos cabem em max_tokens."""
+    summary = cap_summary(summary, _summary_tokens(max_tokens)) if summary else ""
+    budget = max_tokens - (estimate_tokens(summary) if summary else 0)
+    return summary, recent_messages(messages, max_messages=max_messages, max_tokens=budget,
+                                    exclude_last=exclude_last)
+
+
+def recent_messages(messages: List[AnyMessage], *, max_messages: Optional[int] = None,
+                    max_tokens: int = DEFAULT_MAX_TOKENS, exclude_last: bool = False) -> List[AnyMessage]:
+    """
+    Janela literal do historico (so Human/AI), das mais novas pras mais antigas,
+    ate max_messages ou ate estourar max_tokens.
+    """
+    msgs = messages[:-1] if exclude_last and messages else (messages or [])
+    window: List[AnyMessage] = []
+    budget = max_tokens
+    for msg in reversed(msgs):
+        if not isinstance(msg, (HumanMessage, AIMessage)):
+            continue
+        if max_messages is not None and len(window) >= max_messages:
+            break
+        budget -= estimate_tokens(message_text(msg))
+        if budget < 0 and window:
+            break
+        window.append(msg)
+    window.reverse()
+    return window
+
+
+def format_history(messages: List[AnyMessage], summary: str = "", *, max_messages: Optional[int] = None,
+                   max_tokens: int = DEFAULT_MAX_TOKENS, exclude_last: bool = True,
+                   bot_label: str = "Assistente", quote: bool = False) -> str:
+    """Historico legivel pra prompts: resumo (se houver) + janela literal, ate max_tokens."""
+    summary, window = history_window(messages, summary, max_messages=max_messages, max_tokens=max_tokens,
+                                     exclude_last=exclude_last)
+    lines = []
+    if summary:
+        lines.append(f"(Resumo da conversa anterior: {summary})")
+    for msg in window:
+        role = "Cliente" if isinstance(msg, HumanMessage) else bot_label
+        text = message_text(msg)
+        lines.append(f'{role}: "{text}"' if quote else f"{role}: {text}")
+    return "\n".join(lines)
+
+
+# -------------------------
+# Compactacao (no memory)
+# -------------------------
+
+def _policy(config: Optional[RunnableConfig]) -> tuple[int, int]:
+    keep = int(get_option(config, "memory_keep_turns", DEFAULT_KEEP_TURNS))
+    max_tokens = int(get_option(config, "memory_max_tokens", DEFAULT_MAX_TOKENS))
+    return keep, max_tokens
+
+
+def history_max_tokens(config: Optional[RunnableConfig]) -> int:
+    """Teto de tokens do historico nos prompts (configurable.memory_max_tokens)."""
+    return _policy(config)[1]
+
+
+def _summary_tokens(max_tokens: int) -> int:
+    """Parte do teto reservada ao resumo."""
+    return max_tokens // 2
+
+
+def _turns_to_fold(state: GlobalState, config: RunnableConfig) -> List[AnyMessage]:
+    """Mensagens que saem da janela neste turno (vazio se ainda nao precisa compactar)."""
+    keep, _ = _policy(config)
+    if keep <= 0:
+        return []
+    turns = split_turns(state.get("messages", []))
+    if len(turns) < keep + _FOLD_BATCH_TURNS:
+        return []
+    return [msg for turn in turns[:-keep] for msg in turn]
+
+
+def _summary_messages(previous: str, folded: List[AnyMessage], max_tokens: int) -> list[dict]:
+    transcript = format_history(folded, exclude_last=False, max_tokens=10 ** 9)
+    return [
+        {"role": "system", "content": SUMMARY_PROMPT.format(max_words=max(_summary_tokens(max_tokens) * 3 // 4, 50))},
+        {"role": "user", "content": f"Resumo anterior:\n{previous or '(vazio)'}\n\nNovas mensagens:\n{transcript}"},
+    ]
+
+
+def _compacted(summary: str, folded: List[AnyMessage], max_tokens: int) -> dict:
+    return {
+        "conversation_summary": cap_summary(summary, _summary_tokens(max_tokens)),
+        "messages": [RemoveMessage(id=msg.id) for msg in folded if msg.id],
+    }
+
+
+def memory(state: GlobalState, config: RunnableConfig) -> dict:
+    """
+    No memory: dobra os turnos antigos no resumo e remove-os de messages.
+    Roda depois do merge (a resposta do turno ja saiu no stream).
+    Se o LLM falhar (ou vier vazio), mantem as mensagens (o render ainda aplica o teto de tokens).
+    Sem orcamento de latencia no turno (budget.py), o resumo fica pro proximo turno.
+    """
+    folded = _turns_to_fold(state, config)
+    if not folded:
+        return {}
+    _, max_tokens = _policy(config)
+    try:
+        messages = _summary_messages(state.get("conversation_summary", ""), folded, max_tokens)
+        result = call_with_budget(state, "memory", get_llm("memory", config).invoke, messages)
+        summary = getattr(result, "content", "").strip()
+    except Exception:
+        summary = ""
+    return _compacted(summary, folded, max_tokens) if summary else {}
+
+
+async def amemory(state: GlobalState, config: RunnableConfig) -> dict:
+    """Versão async do no memory (ainvoke)."""
+    folded = _turns_to_fold(state, config)
+    if not folded:
+        return {}
+    _, max_tokens = _policy(config)
+    try:
+        messages = _summary_messages(state.get("conversation_summary", ""), folded, max_tokens)
+        result = await acall_with_budget(state, "memory", get_llm("memory", config).ainvoke, messages)
+        summary = getattr(result, "content", "").strip()
+    except Exception:
+        summary = ""
+    return _compacted(summary, folded, max_tokens) if summary else {}
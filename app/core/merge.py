@@ -4,15 +4,32 @@ merge.py — Nó do grafo core que unifica as saídas dos especialistas.
 Responsabilidades:
 1. Lê specialists_outputs (dict com saídas de cada especialista)
 2. Se nenhum especialista produziu saída, retorna mensagem fixa
-3. Usa LLM + histórico da conversa (messages) para compor resposta final
-4. Escreve final_answer e adiciona AIMessage em messages
+3. Se só um especialista respondeu (trial, faq ou triage/general), repassa o
+   texto como está (pass-through) — sem chamada de LLM
+4. Usa LLM + histórico da conversa (resumo + janela recente, ver memory.py)
+   para compor resposta final (só em turnos com mais de um especialista)
+5. Escreve final_answer e adiciona AIMessage em messages
+6. Emite a resposta final em chunks no stream "custom" (ver streaming.py),
+   tanto no pass-through quanto na composição via LLM (llm.stream)
+7. Sem orçamento de latência no turno (budget.py), compõe por template: as
+   saídas dos especialistas em sequência, sem LLM. O deadline só corta a
+   composição antes do primeiro delta (CommitPoint): depois que o cliente
+   começou a receber o texto do LLM, ele vai até o fim e é o final_answer
+
+Política configurável via config["configurable"]["merge_mode"]:
+- "passthrough" (default): pass-through quando há uma única saída
+- "llm": sempre compõe via LLM (comportamento antigo)
 """
 from __future__ import annotations
 
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from langchain_core.runnables import RunnableConfig
 
+from app.core.budget import CommitPoint, acall_with_budget, call_with_budget
+from app.core.config import get_option
+from app.core.memory import history_max_tokens, history_window
 from app.core.state import GlobalState
+from app.core.streaming import get_delta_writer
 from app.agents.aula_experimental.utils_trial.get_llm import get_llm
 
 MERGE_SYSTEM_PROMPT = """Você é o assistente da CT Smash Beach Tennis.
@@ -28,31 +45,118 @@ Regras:
 - Responda em português brasileiro
 - Seja conciso — não repita o que já foi dito"""
 
+MERGE_MODES = ("passthrough", "llm")
+_DEFAULT_MERGE_MODE = "passthrough"
 
-def merge(state: GlobalState, config: RunnableConfig) -> dict:
-    outputs = state.get("specialists_outputs") or {}
-    parts = [v for v in outputs.values() if v]
 
+def _merge_mode(config: RunnableConfig) -> str:
+    mode = get_option(config, "merge_mode", _DEFAULT_MERGE_MODE)
+    return mode if mode in MERGE_MODES else _DEFAULT_MERGE_MODE
+
+
+def _final(text: str) -> dict:
+    return {
+        "final_answer": text,
+        "messages": [AIMessage(content=text)],
+    }
+
+
+def _merge_without_llm(parts: list[str], config: RunnableConfig, write_delta) -> dict | None:
+    """Casos resolvidos sem LLM (nenhuma saída / pass-through). None se precisa compor."""
     # Nenhum especialista produziu saída
     if not parts:
         msg = "Especialistas não produziram nada."
-        return {
-            "final_answer": msg,
-            "messages": [AIMessage(content=msg)],
-        }
+        write_delta(msg)
+        return _final(msg)
+
+    # Um único especialista já entrega texto final pronto pro cliente
+    if len(parts) == 1 and _merge_mode(config) == "passthrough":
+        write_delta(parts[0])
+        return _final(parts[0])
+
+    return None
+
+
+def _merge_template(parts: list[str], write_delta) -> dict:
+    """Composição determinística (sem LLM): saídas dos especialistas em sequência."""
+    text = "\n\n".join(parts)
+    write_delta(text)
+    return _final(text)
 
-    # LLM compõe resposta final com contexto do histórico
-    llm = get_llm()
-    history = state.get("messages", [])
 
-    response = llm.invoke([
+def _send(text: str, chunks: list[str], commit: CommitPoint, write_delta) -> None:
+    """Envia um chunk do LLM. Antes do primeiro, passa pelo commit (deadline ainda vale)."""
+    if not text:
+        return
+    if not chunks and not commit.commit():
+        raise TimeoutError("orcamento do turno esgotado antes do primeiro chunk")
+    write_delta(text)
+    chunks.append(text)
+
+
+def _merge_messages(state: GlobalState, parts: list[str], config: RunnableConfig | None = None) -> list:
+    """Mensagens da composição: system + histórico (resumo + janela com teto de tokens) + saídas."""
+    summary, window = history_window(
+        state.get("messages", []), state.get("conversation_summary", ""), max_tokens=history_max_tokens(config),
+    )
+    return [
         SystemMessage(content=MERGE_SYSTEM_PROMPT),
-        *history,
+        *([SystemMessage(content=f"Resumo da conversa anterior: {summary}")] if summary else []),
+        *window,
         HumanMessage(content="Respostas dos especialistas:\n" + "\n---\n".join(parts)),
-    ])
+    ]
 
-    final = response.content
-    return {
-        "final_answer": final,
-        "messages": [AIMessage(content=final)],
-    }
+
+def _chunk_text(chunk) -> str:
+    return chunk.content if isinstance(chunk.content, str) else ""
+
+
+def merge(state: GlobalState, config: RunnableConfig) -> dict:
+    outputs = state.get("specialists_outputs") or {}
+    parts = [v for v in outputs.values() if v]
+    write_delta = get_delta_writer()
+
+    done = _merge_without_llm(parts, config, write_delta)
+    if done is not None:
+        return done
+
+    # LLM compõe resposta final com contexto do histórico.
+    # Streaming: cada chunk do LLM já sai pro stream "custom" do grafo
+    llm = get_llm("merge", config)
+    chunks = []
+    commit = CommitPoint()
+
+    def _compose() -> str:
+        for chunk in llm.stream(_merge_messages(state, parts, config)):
+            _send(_chunk_text(chunk), chunks, commit, write_delta)
+        return "".join(chunks)
+
+    text = call_with_budget(state, "merge", _compose, commit=commit)
+    if text is None:
+        return _merge_template(parts, write_delta)
+    return _final(text)
+
+
+async def amerge(state: GlobalState, config: RunnableConfig) -> dict:
+    """Versão async do merge (LLM via astream)."""
+    outputs = state.get("specialists_outputs") or {}
+    parts = [v for v in outputs.values() if v]
+    write_delta = get_delta_writer()
+
+    done = _merge_without_llm(parts, config, write_delta)
+    if done is not None:
+        return done
+
+    llm = get_llm("merge", config)
+    chunks = []
+    commit = CommitPoint()
+
+    async def _acompose() -> str:
+        async for chunk in llm.astream(_merge_messages(state, parts, config)):
+            _send(_chunk_text(chunk), chunks, commit, write_delta)
+        return "".join(chunks)
+
+    text = await acall_with_budget(state, "merge", _acompose, commit=commit)
+    if text is None:
+        return _merge_template(parts, write_delta)
+    return _final(text)
@@ -0,0 +1,323 @@
+"""
+metrics.py — Instrumentação leve por nó e por turno (latência, chamadas de LLM, tokens).
+
+- instrument_node(name, fn): envolve um nó do grafo (sync ou async) e registra
+  tempo de parede, chamadas de LLM e tokens prompt/completion do nó, além dos
+  tokens de prompt servidos do cache de prefixo do provedor (cached)
+- LLM_USAGE_CALLBACK: callback anexado ao LLM (get_llm.py) que atribui cada
+  chamada ao nó em execução (contextvar). Nós aninhados (subgrafo trial)
+  somam no nó mais interno
+- track_turn(): context manager usado pelos pontos de entrada (webhook,
+  TurnStream, load_test) para agregar o turno inteiro
+- METRICS.record_degradation(point): nó que respondeu sem LLM por falta de
+  orçamento de latência (ver budget.py)
+- METRICS.prometheus() / METRICS.snapshot(): texto Prometheus e dump JSON
+
+Histogramas com buckets fixos (estilo Prometheus) em memória do processo:
+custo por nó = 2 perf_counter + um lock curto, pode ficar ligado em produção.
+"""
+from __future__ import annotations
+
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+_DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+_COUNT_BUCKETS = (0, 1, 2, 3, 4, 5, 6, 8, 10, 15, 20)
+_TOKEN_BUCKETS = (0, 100, 250, 500, 1000, 2000, 4000, 8000, 16000)
+
+
+# -------------------------
+# Primitivas
+# -------------------------
+
+class Histogram:
+    """Histograma com buckets fixos (cumulativos na exposição Prometheus)."""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)   # último = +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Estimativa pelo limite superior do bucket (como histogram_quantile)."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= target:
+                return self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+        return self.buckets[-1]
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "avg": round(self.sum / self.count, 6) if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+_usage_lock = threading.Lock()   # nós paralelos (trial + faq) somam no mesmo turno
+
+
+@dataclass
+class Usage:
+    """Acumulador de um nó ou turno em execução."""
+    llm_calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0   # parte de prompt_tokens lida do cache de prefixo do provedor
+    parent: Optional["Usage"] = None
+
+    def add(self, llm_calls: int, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> None:
+        with _usage_lock:
+            self.llm_calls += llm_calls
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.cached_tokens += cached_tokens
+
+
+_current_node: ContextVar[Optional[Usage]] = ContextVar("smash_current_node", default=None)
+_current_turn: ContextVar[Optional[Usage]] = ContextVar("smash_current_turn", default=None)
+
+
+# -------------------------
+# Registro
+# -------------------------
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.node_duration: Dict[str, Histogram] = {}
+            self.node_counters: Dict[str, Dict[str, int]] = {}
+            self.turn_duration = Histogram(_DURATION_BUCKETS)
+            self.turn_llm_calls = Histogram(_COUNT_BUCKETS)
+            self.turn_prompt_tokens = Histogram(_TOKEN_BUCKETS)
+            self.turn_completion_tokens = Histogram(_TOKEN_BUCKETS)
+            self.turn_cached_tokens = Histogram(_TOKEN_BUCKETS)
+            self.degradations: Dict[str, int] = {}
+
+    def record_node(self, node: str, duration: float, usage: Usage, error: bool) -> None:
+        with self._lock:
+            hist = self.node_duration.get(node)
+            if hist is None:
+                hist = self.node_duration[node] = Histogram(_DURATION_BUCKETS)
+                self.node_counters[node] = {
+                    "llm_calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0, "errors": 0,
+                }
+            hist.observe(duration)
+            counters = self.node_counters[node]
+            counters["llm_calls"] += usage.llm_calls
+            counters["prompt_tokens"] += usage.prompt_tokens
+            counters["completion_tokens"] += usage.completion_tokens
+            counters["cached_tokens"] += usage.cached_tokens
+            counters["errors"] += int(error)
+
+    def record_turn(self, duration: float, usage: Usage) -> None:
+        with self._lock:
+            self.turn_duration.observe(duration)
+            self.turn_llm_calls.observe(usage.llm_calls)
+            self.turn_prompt_tokens.observe(usage.prompt_tokens)
+            self.turn_completion_tokens.observe(usage.completion_tokens)
+            self.turn_cached_tokens.observe(usage.cached_tokens)
+
+    def record_degradation(self, point: str) -> None:
+        with self._lock:
+            self.degradations[point] = self.degradations.get(point, 0) + 1
+
+    def snapshot(self) -> dict:
+        """Dump JSON: por nó (latência + contadores) e por turno."""
+        with self._lock:
+            return {
+                "nodes": {
+                    node: {"duration_seconds": hist.summary(), **self.node_counters[node]}
+                    for node, hist in sorted(self.node_duration.items())
+                },
+                "turns": {
+                    "duration_seconds": self.turn_duration.summary(),
+                    "llm_calls": self.turn_llm_calls.summary(),
+                    "prompt_tokens": self.turn_prompt_tokens.summary(),
+                    "completion_tokens": self.turn_completion_tokens.summary(),
+                    "cached_tokens": self.turn_cached_tokens.summary(),
+                },
+                "degradations": dict(sorted(self.degradations.items())),
+            }
+
+    def prometheus(self) -> str:
+        """Exposição em texto Prometheus (text/plain; version=0.0.4)."""
+        lines: list[str] = []
+
+        def _hist(name: str, help_: str, items: list[tuple[str, Histogram]]) -> None:
+            lines.append(f"# HELP {name} {help_}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, h in items:
+                sep = "," if labels else ""
+                cumulative = 0
+                for bound, c in zip(h.buckets, h.counts):
+                    cumulative += c
+                    lines.append(f'{name}_bucket{{{labels}{sep}le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{{labels}{sep}le="+Inf"}} {h.count}')
+                suffix = f"{{{labels}}}" if labels else ""
+                lines.append(f"{name}_sum{suffix} {h.sum}")
+                lines.append(f"{name}_count{suffix} {h.count}")
+
+        with self._lock:
+            _hist("smash_node_duration_seconds", "Tempo de parede por no do grafo",
+                  [(f'node="{n}"', h) for n, h in sorted(self.node_duration.items())])
+            for key, help_ in (
+                ("llm_calls", "Chamadas de LLM por no"),
+                ("prompt_tokens", "Tokens de prompt por no"),
+                ("completion_tokens", "Tokens de completion por no"),
+                ("cached_tokens", "Tokens de prompt lidos do cache de prefixo do provedor por no"),
+                ("errors", "Excecoes por no"),
+            ):
+                name = f"smash_node_{key}_total"
+                lines.append(f"# HELP {name} {help_}")
+                lines.append(f"# TYPE {name} counter")
+                for node, counters in sorted(self.node_counters.items()):
+                    lines.append(f'{name}{{node="{node}"}} {counters[key]}')
+            _hist("smash_turn_duration_seconds", "Tempo de parede por turno", [("", self.turn_duration)])
+            _hist("smash_turn_llm_calls", "Chamadas de LLM por turno", [("", self.turn_llm_calls)])
+            _hist("smash_turn_prompt_tokens", "Tokens de prompt por turno", [("", self.turn_prompt_tokens)])
+            _hist("smash_turn_completion_tokens", "Tokens de completion por turno", [("", self.turn_completion_tokens)])
+            _hist("smash_turn_cached_tokens", "Tokens de prompt do cache de prefixo por turno", [("", self.turn_cached_tokens)])
+            lines.append("# HELP smash_degradations_total Respostas deterministicas por falta de orcamento do turno")
+            lines.append("# TYPE smash_degradations_total counter")
+            for point, count in sorted(self.degradations.items()):
+                lines.append(f'smash_degradations_total{{point="{point}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+
+
+# -------------------------
+# Contabilização de LLM
+# -------------------------
+
+def record_llm_call(prompt_tokens: int = 0, completion_tokens: int = 0, cached_tokens: int = 0) -> None:
+    """Atribui uma chamada de LLM ao nó (mais interno) e ao turno em execução."""
+    node = _current_node.get()
+    if node is not None:
+        node.add(1, prompt_tokens, completion_tokens, cached_tokens)
+    turn = _current_turn.get()
+    if turn is not None:
+        turn.add(1, prompt_tokens, completion_tokens, cached_tokens)
+
+
+def _usage_from_result(response: Any) -> Tuple[int, int, int]:
+    """(prompt, completion, cached) da resposta (OpenAI: prompt_tokens_details.cached_tokens)."""
+    usage = (getattr(response, "llm_output", None) or {}).get("token_usage") or {}
+    if usage:
+        cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0) or 0
+        return usage.get("prompt_tokens", 0) or 0, usage.get("completion_tokens", 0) or 0, cached
+    # Streaming: usage_metadata vem na mensagem agregada (stream_usage=True)
+    for generations in getattr(response, "generations", None) or []:
+        for gen in generations:
+            meta = getattr(getattr(gen, "message", None), "usage_metadata", None)
+            if meta:
+                cached = (meta.get("input_token_details") or {}).get("cache_read", 0) or 0
+                return meta.get("input_tokens", 0), meta.get("output_tokens", 0), cached
+    return 0, 0, 0
+
+
+class LLMUsageCallback(BaseCallbackHandler):
+    """Callback do LLM: conta chamada + tokens no nó/turno atual (roda inline, sem thread)."""
+
+    run_inline = True
+
+    def on_llm_end(self, response, **kwargs: Any) -> None:
+        record_llm_call(*_usage_from_result(response))
+
+
+LLM_USAGE_CALLBACK = LLMUsageCallback()
+
+
+# -------------------------
+# Wrappers
+# -------------------------
+
+def _accepts_config(fn: Callable) -> bool:
+    return "config" in inspect.signature(fn).parameters
+
+
+def _finish_node(name: str, start: float, usage: Usage, error: bool) -> None:
+    METRICS.record_node(name, time.perf_counter() - start, usage, error)
+    if usage.parent is not None:   # nó aninhado: soma no pai também
+        usage.parent.add(usage.llm_calls, usage.prompt_tokens, usage.completion_tokens, usage.cached_tokens)
+
+
+def instrument_node(name: str, fn: Callable) -> Callable:
+    """
+    Envolve um nó do grafo registrando latência/LLM/tokens em METRICS.
+    Mantém o parâmetro `config` (o LangGraph inspeciona a assinatura pra injetar).
+    """
+    pass_config = _accepts_config(fn)
+
+    if inspect.iscoroutinefunction(fn):
+        async def _anode(state, config):
+            usage = Usage(parent=_current_node.get())
+            token = _current_node.set(usage)
+            start = time.perf_counter()
+            error = True
+            try:
+                result = await (fn(state, config) if pass_config else fn(state))
+                error = False
+                return result
+            finally:
+                _current_node.reset(token)
+                _finish_node(name, start, usage, error)
+
+        _anode.__name__ = _anode.__qualname__ = getattr(fn, "__name__", name)
+        return _anode
+
+    def _node(state, config):
+        usage = Usage(parent=_current_node.get())
+        token = _current_node.set(usage)
+        start = time.perf_counter()
+        error = True
+        try:
+            result = fn(state, config) if pass_config else fn(state)
+            error = False
+            return result
+        finally:
+            _current_node.reset(token)
+            _finish_node(name, start, usage, error)
+
+    _node.__name__ = _node.__qualname__ = getattr(fn, "__name__", name)
+    return _node
+
+
+@contextmanager
+def track_turn() -> Iterator[Usage]:
+    """Agrega um turno (todas as chamadas de LLM de todos os nós) e registra ao sair."""
+    usage = Usage()
+    token = _current_turn.set(usage)
+    start = time.perf_counter()
+    try:
+        yield usage
+    finally:
+        _current_turn.reset(token)
+        METRICS.record_turn(time.perf_counter() - start, usage)
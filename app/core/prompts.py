@@ -3,6 +3,14 @@ prompts.py — Prompt base compartilhado entre todos os agentes especialistas.
 
 Cada especialista (trial, faq, etc.) prepende este prompt ao seu system message
 para garantir que só responda sobre seu domínio, ignorando o resto.
+
+Layout das chamadas de LLM (cache de prefixo do provedor — a OpenAI reaproveita
+o início do prompt a partir de 1024 tokens, em blocos de 128):
+- system message = só partes estáticas, montado uma vez no import
+  (static_system) e byte-idêntico entre chamadas
+- mensagem do usuário = dados do turno, do menos para o mais volátil
+  (etapa/plano -> contexto do dia -> conversa -> agora + mensagem do cliente)
+Tokens servidos do cache aparecem em cached_tokens (app/core/metrics.py).
 """
 
 SPECIALIST_BASE_PROMPT = """
@@ -15,3 +23,8 @@ SUA REGRA PRINCIPAL:
 - Se a mensagem do cliente contiver perguntas ou pedidos que NÃO são da sua área, IGNORE completamente essas partes.
 - Outro especialista já está cuidando dessas outras partes. Não tente ajudar fora do seu escopo.simplesmente ignore e responda só o que é seu.
 """.strip()
+
+
+def static_system(*parts: str) -> str:
+    """System message estático: junta as partes uma vez (chamar no import, não por turno)."""
+    return "\n\n".join(part.strip() for part in parts if part)
@@ -1,8 +1,7 @@
 """Estado global compartilhado pelo grafo."""
 from __future__ import annotations
 
-import operator
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 from typing_extensions import Annotated, TypedDict
 
@@ -11,6 +10,17 @@ from langgraph.graph.message import AnyMessage, add_messages
 from app.agents.aula_experimental.state import TrialState
 
 
+def merge_outputs(left: Dict[str, str], right: Optional[Dict[str, str]]) -> Dict[str, str]:
+    """
+    Reducer de specialists_outputs: une as saídas dos especialistas do turno.
+    right=None zera o dict (input_node faz isso no início de cada turno, senão
+    com checkpointer as saídas do turno anterior vazariam para o merge).
+    """
+    if right is None:
+        return {}
+    return {**(left or {}), **right}
+
+
 class GlobalState(TypedDict, total=False):
     # entrada
     client_input: str
@@ -18,11 +28,15 @@ class GlobalState(TypedDict, total=False):
 
     # (opcional) histórico do turno
     messages: Annotated[List[AnyMessage], add_messages]
+    consumed_input_id: Optional[str]  # id da última HumanMessage já lida pelo input_node
+    conversation_summary: str    # resumo incremental dos turnos que sairam de messages (ver memory.py)
 
     # roteamento / coordenação
     router_input: str            # entrada para o roteador
     active_routes: List[str]     # rotas ativas (triage decide só pro turno atual (com contexto))
-    specialists_outputs: Annotated[Dict[str, str], operator.or_] # saídas dos especialistas
+    specialists_outputs: Annotated[Dict[str, str], merge_outputs] # saídas dos especialistas
+    turn_deadline: Optional[float]  # deadline do turno (epoch), setado pelo input_node (ver budget.py)
+    turn_now: Optional[str]         # relógio do turno (ISO), setado pelo input_node (ver datetime_utils.py)
 
     # sub-estados
     trial: TrialState          # estado do agente de aula experimental
@@ -0,0 +1,122 @@
+"""
+streaming.py — Streaming da resposta final (final_answer) em chunks.
+
+O merge escreve cada pedaço da resposta final no stream "custom" do LangGraph:
+    {"final_answer_delta": "<texto>"}
+
+Um adapter de canal (WhatsApp, HTTP, etc) consome via TurnStream e já pode
+enviar texto parcial antes do merge terminar. Time-to-first-token (TTFT) é
+medido por turno e acumulado em STREAM_STATS.
+
+Uso:
+    stream = TurnStream(graph, state, config)
+    for delta in stream:             # ou: async for delta in stream
+        send(delta)
+    stream.final_state               # estado final do turno
+    stream.time_to_first_token       # segundos até o primeiro chunk
+"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from langgraph.config import get_stream_writer
+
+from app.core.metrics import track_turn
+
+FINAL_ANSWER_DELTA = "final_answer_delta"
+
+
+def get_delta_writer() -> Callable[[str], None]:
+    """
+    Retorna função que escreve um chunk da resposta final no stream "custom".
+    Fora de uma execução do grafo (ex: nó chamado direto) vira no-op.
+    """
+    try:
+        writer = get_stream_writer()
+    except (RuntimeError, KeyError):
+        return lambda _text: None
+    return lambda text: writer({FINAL_ANSWER_DELTA: text}) if text else None
+
+
+class StreamStats:
+    """Contadores thread-safe de TTFT e duração total dos turnos em streaming."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.turns = 0
+            self.ttft_turns = 0   # turnos que chegaram a emitir um chunk
+            self.ttft_total = 0.0
+            self.ttft_max = 0.0
+            self.duration_total = 0.0
+
+    def record(self, ttft: Optional[float], duration: float) -> None:
+        with self._lock:
+            self.turns += 1
+            self.duration_total += duration
+            if ttft is not None:
+                self.ttft_turns += 1
+                self.ttft_total += ttft
+                self.ttft_max = max(self.ttft_max, ttft)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "turns": self.turns,
+                "ttft_turns": self.ttft_turns,
+                "ttft_avg_ms": 1000 * self.ttft_total / self.ttft_turns if self.ttft_turns else 0.0,
+                "ttft_max_ms": 1000 * self.ttft_max,
+                "duration_avg_ms": 1000 * self.duration_total / self.turns if self.turns else 0.0,
+            }
+
+
+STREAM_STATS = StreamStats()
+
+
+class TurnStream:
+    """Roda um turno do grafo em modo streaming e expõe só os deltas da resposta final."""
+
+    def __init__(self, graph, state: dict, config: Optional[dict] = None):
+        self.graph = graph
+        self.state = state
+        self.config = config
+        self.final_state: Optional[dict] = None
+        self.time_to_first_token: Optional[float] = None
+        self.duration: Optional[float] = None
+
+    def _handle(self, mode: str, payload: Any, start: float) -> Optional[str]:
+        if mode == "values":
+            self.final_state = payload
+            return None
+        if isinstance(payload, dict) and payload.get(FINAL_ANSWER_DELTA):
+            if self.time_to_first_token is None:
+                self.time_to_first_token = time.perf_counter() - start
+            return payload[FINAL_ANSWER_DELTA]
+        return None
+
+    def _finish(self, start: float) -> None:
+        self.duration = time.perf_counter() - start
+        STREAM_STATS.record(self.time_to_first_token, self.duration)
+
+    def __iter__(self):
+        start = time.perf_counter()
+        with track_turn():
+            for mode, payload in self.graph.stream(self.state, self.config, stream_mode=["custom", "values"]):
+                delta = self._handle(mode, payload, start)
+                if delta:
+                    yield delta
+        self._finish(start)
+
+    async def __aiter__(self):
+        start = time.perf_counter()
+        with track_turn():
+            async for mode, payload in self.graph.astream(self.state, self.config, stream_mode=["custom", "values"]):
+                delta = self._handle(mode, payload, start)
+                if delta:
+                    yield delta
+        self._finish(start)
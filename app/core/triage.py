@@ -2,10 +2,13 @@
 triage.py — No de triagem do grafo core.
 
 Responsabilidades:
-1. Classifica a intencao do usuario via LLM (structured output) — sempre
-2. Passa contexto de conversa ativa pro LLM (se houver) pra desambiguar
-3. Suporta multi-intent: pode rotear pra trial + faq em paralelo
-4. Para inputs genericos (saudacoes, etc), responde direto sem chamar especialista
+1. Tenta classificar via fast-path local (triage_rules.py) — sem LLM
+2. Opcional: backend de modelo local treinado (triage_model.py) — sem LLM
+3. Se a confianca nao bater o threshold, classifica via LLM (structured output)
+   — sem orcamento de latencia pro LLM (budget.py), usa as regras sem threshold
+4. Passa contexto de conversa ativa pro LLM (se houver) pra desambiguar
+5. Suporta multi-intent: pode rotear pra trial + faq em paralelo
+6. Para inputs genericos (saudacoes, etc), responde direto sem chamar especialista
 
 Categorias:
 - trial: aula experimental / agendamento de aula
@@ -14,42 +17,33 @@ Categorias:
 """
 from __future__ import annotations
 
+import time
 from typing import Optional, Literal, List
 
 from pydantic import BaseModel, Field
 from langchain_core.runnables import RunnableConfig
 
-from langchain_core.messages import HumanMessage, AIMessage
-
+from app.core.budget import acall_with_budget, call_with_budget
+from app.core.config import get_configurable
+from app.core.memory import format_history, history_max_tokens
 from app.core.state import GlobalState
+from app.core.triage_rules import FASTPATH_STATS, canned_general_response, classify_by_rules, general_response_for
+from app.core.triage_model import get_triage_model, log_labelled_turn
 from app.agents.aula_experimental.utils_trial.get_llm import get_llm
 
 
 _MAX_HISTORY_MESSAGES = 6  # ultimas 3 trocas (cliente+assistente)
 
+# Confianca minima pra aceitar o fast-path sem chamar o LLM.
+# Sobrescrever via config["configurable"]["triage_fastpath_threshold"]
+# (ou desligar com config["configurable"]["triage_fastpath"] = False).
+_FASTPATH_THRESHOLD = 0.9
 
-def _format_history(messages, exclude_last: bool = True) -> str:
-    """Formata ultimas mensagens como contexto de conversa legivel."""
-    msgs = messages[:-1] if exclude_last and messages else messages
-    recent = msgs[-_MAX_HISTORY_MESSAGES:] if msgs else []
-    if not recent:
-        return ""
-    lines = []
-    for msg in recent:
-        if isinstance(msg, HumanMessage):
-            role = "Cliente"
-        elif isinstance(msg, AIMessage):
-            role = "Assistente"
-        else:
-            continue
-        content = msg.content
-        if isinstance(content, list):
-            content = " ".join(
-                b.get("text", "") for b in content
-                if isinstance(b, dict) and b.get("type") == "text"
-            )
-        lines.append(f"{role}: {content}")
-    return "\n".join(lines)
+# Backend de classificacao depois do fast-path: "llm" (default) ou "model"
+# (modelo local treinado, com fallback pro LLM abaixo do threshold).
+# Sobrescrever via config["configurable"]["triage_backend"] / ["triage_model_threshold"].
+_DEFAULT_BACKEND = "llm"
+_MODEL_THRESHOLD = 0.8
 
 
 # ---------------------------------------------------------------------------
@@ -104,19 +98,116 @@ Se "general" NAO estiver nas intencoes, deixe general_response como null."""
 # Classificacao
 # ---------------------------------------------------------------------------
 
-def _classify_intent(text: str, active_context: str | None = None) -> TriageResult: 
-    """Classifica a intencao do cliente usando LLM com structured output."""
-    llm = get_llm()
-    classifier = llm.with_structured_output(TriageResult)
+def _classify_fast(text: str, stage: str | None, config: RunnableConfig) -> TriageResult | None:
+    """
+    Fast-path local: retorna TriageResult se alguma regra bater com confianca
+    >= threshold. Senao retorna None (cai pro LLM).
+    """
+    configurable = get_configurable(config)
+    if not configurable.get("triage_fastpath", True):
+        return None
+    threshold = configurable.get("triage_fastpath_threshold", _FASTPATH_THRESHOLD)
+
+    start = time.perf_counter()
+    match = classify_by_rules(text, stage)
+    used = match is not None and match.confidence >= threshold
+    FASTPATH_STATS.record_rules(match, time.perf_counter() - start, used)
 
+    if not used:
+        return None
+    return TriageResult(intents=match.intents, general_response=match.general_response)
+
+
+def _classify_model(text: str, stage: str | None, config: RunnableConfig) -> TriageResult | None:
+    """
+    Backend de modelo local: retorna TriageResult se o modelo treinado existir
+    e a confianca bater o threshold. Senao retorna None (cai pro LLM).
+
+    O modelo so classifica, nao escreve texto: "general" so fica com ele quando
+    ha resposta pronta (saudacao/agradecimento/despedida). O resto ("tudo bem?",
+    "kkk", pergunta fora do escopo) vai pro LLM, que gera a general_response.
+    """
+    configurable = get_configurable(config)
+    if configurable.get("triage_backend", _DEFAULT_BACKEND) != "model":
+        return None
+    model = get_triage_model()
+    if model is None:
+        return None
+    threshold = configurable.get("triage_model_threshold", _MODEL_THRESHOLD)
+
+    start = time.perf_counter()
+    intents, confidence = model.predict(text, stage)
+    general = canned_general_response(text) if intents == ["general"] else None
+    used = confidence >= threshold and (intents != ["general"] or general is not None)
+    FASTPATH_STATS.record_model(time.perf_counter() - start, used)
+
+    if not used:
+        return None
+    return TriageResult(intents=intents, general_response=general)
+
+
+def _triage_messages(text: str, active_context: str | None) -> list[dict]:
+    """Monta as mensagens (system/user) do classificador LLM."""
     user_content = text
     if active_context:
         user_content = f"[CONTEXTO: {active_context}]\n\nùltima mensagem do cliente: {text}"
-
-    return classifier.invoke([
+    return [
         {"role": "system", "content": TRIAGE_SYSTEM_PROMPT},
         {"role": "user", "content": user_content},
-    ])
+    ]
+
+
+def _classify_intent(text: str, active_context: str | None = None, config: RunnableConfig | None = None) -> TriageResult:
+    """Classifica a intencao do cliente usando LLM com structured output."""
+    llm = get_llm("triage", config)
+    classifier = llm.with_structured_output(TriageResult)
+
+    start = time.perf_counter()
+    result = classifier.invoke(_triage_messages(text, active_context))
+    FASTPATH_STATS.record_llm(time.perf_counter() - start)
+    return result
+
+
+async def _aclassify_intent(text: str, active_context: str | None = None, config: RunnableConfig | None = None) -> TriageResult:
+    """Versao async de _classify_intent (ainvoke)."""
+    llm = get_llm("triage", config)
+    classifier = llm.with_structured_output(TriageResult)
+
+    start = time.perf_counter()
+    result = await classifier.ainvoke(_triage_messages(text, active_context))
+    FASTPATH_STATS.record_llm(time.perf_counter() - start)
+    return result
+
+
+def _classify_degraded(text: str, stage: str | None) -> TriageResult:
+    """
+    Sem orcamento pro LLM: melhor palpite das regras (ignora o threshold),
+    senao segue o agendamento ativo ou responde como general.
+    """
+    match = classify_by_rules(text, stage)
+    if match is not None:
+        return TriageResult(intents=match.intents, general_response=match.general_response)
+    if stage and stage not in ("booked", "cancelled"):
+        return TriageResult(intents=["trial"])
+    return TriageResult(intents=["general"], general_response=general_response_for(text))
+
+
+def _build_active_context(state: GlobalState, config: RunnableConfig | None = None) -> str | None:
+    """Contexto pro LLM: historico de conversa + estado de agendamento ativo."""
+    stage = (state.get("trial") or {}).get("stage")
+    context_parts = []
+
+    history = format_history(
+        state.get("messages", []), state.get("conversation_summary", ""), max_messages=_MAX_HISTORY_MESSAGES,
+        max_tokens=history_max_tokens(config),
+    )
+    if history:
+        context_parts.append(f"Historico recente da conversa:\n{history}")
+
+    if stage and stage not in ("booked", "cancelled"):
+        context_parts.append(f"Cliente esta no meio de um agendamento de aula experimental (etapa: {stage})")
+
+    return "\n\n".join(context_parts) if context_parts else None
 
 
 # ---------------------------------------------------------------------------
@@ -127,29 +218,43 @@ def triage(state: GlobalState, config: RunnableConfig) -> dict:
     """
     Nó de triagem: classifica intencao e decide roteamento.
 
-    Sempre chama o LLM — mesmo com conversa ativa.
+    Primeiro tenta o fast-path local (saudacoes, "sim"/"14h" no meio do
+    agendamento, etc). So chama o LLM quando o texto e ambiguo.
     O contexto da conversa ativa e passado no prompt pra
     desambiguar mensagens como "sim" ou "19:00".
     """
     text = state.get("client_input", "")
-    trial = state.get("trial", {})
-    stage = trial.get("stage")
-    messages = state.get("messages", [])
+    stage = (state.get("trial") or {}).get("stage")
 
-    # Montar contexto: historico de conversa + estado de agendamento ativo
-    context_parts = []
+    result = _classify_fast(text, stage, config) or _classify_model(text, stage, config)
+    if result is not None:
+        return _result_to_update(result)
 
-    history = _format_history(messages)
-    if history:
-        context_parts.append(f"Historico recente da conversa:\n{history}")
+    result = call_with_budget(state, "triage", _classify_intent, text, _build_active_context(state, config), config)
+    if result is None:
+        return _result_to_update(_classify_degraded(text, stage))
+    log_labelled_turn(text, stage, result.intents)  # dataset pro modelo local (se TRIAGE_LOG_PATH)
+    return _result_to_update(result)
 
-    if stage and stage not in ("booked", "cancelled"):
-        context_parts.append(f"Cliente esta no meio de um agendamento de aula experimental (etapa: {stage})")
 
-    active_context = "\n\n".join(context_parts) if context_parts else None
+async def atriage(state: GlobalState, config: RunnableConfig) -> dict:
+    """Versao async do triage (mesma logica, LLM via ainvoke)."""
+    text = state.get("client_input", "")
+    stage = (state.get("trial") or {}).get("stage")
+
+    result = _classify_fast(text, stage, config) or _classify_model(text, stage, config)
+    if result is not None:
+        return _result_to_update(result)
+
+    result = await acall_with_budget(state, "triage", _aclassify_intent, text, _build_active_context(state, config), config)
+    if result is None:
+        return _result_to_update(_classify_degraded(text, stage))
+    log_labelled_turn(text, stage, result.intents)
+    return _result_to_update(result)
 
-    result = _classify_intent(text, active_context)
 
+def _result_to_update(result: TriageResult) -> dict:
+    """Converte TriageResult no update de estado (active_routes / specialists_outputs)."""
     if "general" in result.intents:
         response = result.general_response or "Ola! Sou o assistente da CT Smash. Como posso te ajudar?"
         return {
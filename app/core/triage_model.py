@@ -0,0 +1,214 @@
+"""
+triage_model.py — Backend local (offline) de classificacao de intencao.
+
+Modelo pequeno treinado a partir de turnos logados e rotulados:
+- Features: TF-IDF de unigramas/bigramas de palavras + trigramas de caracteres
+  (texto normalizado como em triage_rules.py) + token da etapa do trial
+- Classificador: regressao logistica one-vs-rest (trial / faq / general)
+- Artefato: JSON gzip compacto (vocabulario + idf + pesos), sem dependencias extras
+
+Uso no triage: config["configurable"]["triage_backend"] = "model".
+Treino: scripts/train_triage_model.py
+
+Logging de turnos (pra gerar dataset): com TRIAGE_LOG_PATH definida, cada
+classificacao feita pelo LLM e gravada em JSONL ({"text", "stage", "intents"}).
+"""
+from __future__ import annotations
+
+import gzip
+import json
+import math
+import os
+import random
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.core.triage_rules import normalize
+
+LABELS = ("trial", "faq", "general")
+
+DEFAULT_MODEL_PATH = Path(__file__).parent / "models" / "triage_intent.json.gz"
+
+
+# ---------------------------------------------------------------------------
+# Features
+# ---------------------------------------------------------------------------
+
+def _tokens(text: str, stage: Optional[str] = None) -> List[str]:
+    """Tokens de features: palavras, bigramas, trigramas de caracteres e etapa."""
+    words = normalize(text).split()
+    feats = list(words)
+    feats += [f"{a}_{b}" for a, b in zip(words, words[1:])]
+    for w in words:
+        padded = f"<{w}>"
+        feats += [f"#{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+    if "?" in (text or ""):
+        feats.append("__question")
+    feats.append(f"__stage_{stage or 'none'}")
+    return feats
+
+
+class TriageModel:
+    """TF-IDF + regressao logistica one-vs-rest. Predicao em microssegundos."""
+
+    def __init__(self, vocab: Dict[str, int], idf: List[float],
+                 weights: Dict[str, List[float]], bias: Dict[str, float]):
+        self.vocab = vocab
+        self.idf = idf
+        self.weights = weights
+        self.bias = bias
+
+    # --- vetorizacao ---
+    def _vectorize(self, text: str, stage: Optional[str]) -> Dict[int, float]:
+        counts = Counter(t for t in _tokens(text, stage) if t in self.vocab)
+        vec = {self.vocab[t]: (1.0 + math.log(c)) * self.idf[self.vocab[t]] for t, c in counts.items()}
+        norm = math.sqrt(sum(v * v for v in vec.values())) or 1.0
+        return {i: v / norm for i, v in vec.items()}
+
+    # --- predicao ---
+    def predict_proba(self, text: str, stage: Optional[str] = None) -> Dict[str, float]:
+        vec = self._vectorize(text, stage)
+        probs = {}
+        for label in LABELS:
+            w = self.weights[label]
+            z = self.bias[label] + sum(w[i] * v for i, v in vec.items())
+            probs[label] = 1.0 / (1.0 + math.exp(-max(min(z, 30.0), -30.0)))
+        return probs
+
+    def predict(self, text: str, stage: Optional[str] = None) -> Tuple[List[str], float]:
+        """
+        Retorna (intents, confianca).
+
+        intents segue a mesma regra do LLM: "general" sempre sozinho.
+        Confianca = pior decisao tomada (p dos rotulos escolhidos, 1-p dos demais).
+        """
+        probs = self.predict_proba(text, stage)
+        specialists = [l for l in ("trial", "faq") if probs[l] >= 0.5]
+        if specialists and probs["general"] < max(probs[l] for l in specialists):
+            intents = specialists
+        else:
+            intents = ["general"]
+        confidence = min(p if l in intents else 1.0 - p for l, p in probs.items())
+        return intents, confidence
+
+    # --- persistencia ---
+    def save(self, path: Path | str = DEFAULT_MODEL_PATH) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Pesos esparsos e arredondados → artefato pequeno
+        payload = {
+            "labels": list(LABELS),
+            "vocab": sorted(self.vocab, key=self.vocab.get),
+            "idf": [round(x, 4) for x in self.idf],
+            "weights": {l: {str(i): round(w, 4) for i, w in enumerate(ws) if abs(w) >= 1e-4}
+                        for l, ws in self.weights.items()},
+            "bias": self.bias,
+        }
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+        return path
+
+    @classmethod
+    def load(cls, path: Path | str = DEFAULT_MODEL_PATH) -> "TriageModel":
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            payload = json.load(f)
+        vocab = {t: i for i, t in enumerate(payload["vocab"])}
+        weights = {}
+        for label, sparse in payload["weights"].items():
+            dense = [0.0] * len(vocab)
+            for i, w in sparse.items():
+                dense[int(i)] = w
+            weights[label] = dense
+        return cls(vocab, payload["idf"], weights, payload["bias"])
+
+
+# ---------------------------------------------------------------------------
+# Treino
+# ---------------------------------------------------------------------------
+
+def train(examples: Iterable[dict], *, min_df: int = 1, epochs: int = 40,
+          lr: float = 0.5, l2: float = 1e-4, seed: int = 13) -> TriageModel:
+    """
+    Treina o modelo a partir de exemplos {"text", "intents", "stage"?}.
+
+    SGD simples (sem dependencias) — suficiente pra alguns milhares de turnos.
+    """
+    examples = [e for e in examples if e.get("text") and e.get("intents")]
+    if not examples:
+        raise ValueError("Dataset vazio: nenhum exemplo com 'text' e 'intents'.")
+
+    docs = [_tokens(e["text"], e.get("stage")) for e in examples]
+    df = Counter(t for d in docs for t in set(d))
+    vocab_terms = sorted(t for t, c in df.items() if c >= min_df)
+    vocab = {t: i for i, t in enumerate(vocab_terms)}
+    n = len(docs)
+    idf = [math.log((1 + n) / (1 + df[t])) + 1.0 for t in vocab_terms]
+
+    model = TriageModel(vocab, idf, {l: [0.0] * len(vocab) for l in LABELS}, {l: 0.0 for l in LABELS})
+    vectors = [model._vectorize(e["text"], e.get("stage")) for e in examples]
+    targets = [set(e["intents"]) for e in examples]
+
+    rng = random.Random(seed)
+    order = list(range(n))
+    for epoch in range(epochs):
+        rng.shuffle(order)
+        step = lr / (1.0 + 0.1 * epoch)
+        for idx in order:
+            vec = vectors[idx]
+            for label in LABELS:
+                w = model.weights[label]
+                z = model.bias[label] + sum(w[i] * v for i, v in vec.items())
+                p = 1.0 / (1.0 + math.exp(-max(min(z, 30.0), -30.0)))
+                grad = p - (1.0 if label in targets[idx] else 0.0)
+                model.bias[label] -= step * grad
+                for i, v in vec.items():
+                    w[i] -= step * (grad * v + l2 * w[i])
+    return model
+
+
+def load_examples(path: Path | str) -> List[dict]:
+    """Le dataset JSONL ({"text", "intents", "stage"?} por linha)."""
+    examples = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                examples.append(json.loads(line))
+    return examples
+
+
+# ---------------------------------------------------------------------------
+# Singleton + logging de turnos
+# ---------------------------------------------------------------------------
+
+_model: TriageModel | None = None
+_model_loaded = False
+_log_lock = threading.Lock()
+
+
+def get_triage_model() -> TriageModel | None:
+    """Carrega o artefato uma vez (TRIAGE_MODEL_PATH ou default). None se nao existir."""
+    global _model, _model_loaded
+    if not _model_loaded:
+        path = Path(os.getenv("TRIAGE_MODEL_PATH", str(DEFAULT_MODEL_PATH)))
+        _model = TriageModel.load(path) if path.exists() else None
+        _model_loaded = True
+    return _model
+
+
+def reset_triage_model() -> None:
+    """Forca recarregar o artefato na proxima chamada (ex: apos retreino)."""
+    global _model, _model_loaded
+    _model, _model_loaded = None, False
+
+
+def log_labelled_turn(text: str, stage: Optional[str], intents: List[str]) -> None:
+    """Grava um turno rotulado em TRIAGE_LOG_PATH (JSONL). No-op se nao definida."""
+    path = os.getenv("TRIAGE_LOG_PATH")
+    if not path or not text:
+        return
+    line = json.dumps({"text": text, "stage": stage, "intents": list(intents)}, ensure_ascii=False)
+    with _log_lock, open(path, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
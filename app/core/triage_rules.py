@@ -0,0 +1,274 @@
+"""
+triage_rules.py — Classificador local (fast-path) na frente do LLM do triage.
+
+Responsabilidades:
+1. Normaliza o texto (minusculas, sem acento, sem pontuacao)
+2. Aplica lexico + regras de padrao (saudacao, agradecimento, despedida,
+   respostas curtas no meio de um agendamento, pedido explicito de aula)
+3. Usa a etapa do trial pra desambiguar respostas curtas ("sim", "14h", "18-02")
+4. Devolve um RuleMatch com confianca — o triage decide se usa ou cai pro LLM
+
+Nao chama LLM e nao altera estado. Tudo deterministico.
+
+Contadores (hit-rate e latencia) ficam em FASTPATH_STATS pra ajustar o threshold.
+"""
+from __future__ import annotations
+
+import re
+import threading
+import unicodedata
+from typing import Dict, List, Literal, Optional
+
+from pydantic import BaseModel
+
+
+# Etapas do trial em que o cliente esta "no meio" de um agendamento
+ACTIVE_TRIAL_STAGES = ("collect_client_info", "ask_date", "awaiting_confirmation")
+
+
+class RuleMatch(BaseModel):
+    intents: List[Literal["trial", "faq", "general"]]
+    general_response: Optional[str] = None
+    confidence: float
+    rule: str
+
+
+# ---------------------------------------------------------------------------
+# Lexico
+# ---------------------------------------------------------------------------
+
+_GREETINGS = {
+    "oi", "oii", "oiii", "ola", "opa", "eae", "eai", "e ai", "hey", "hello",
+    "bom dia", "boa tarde", "boa noite", "tudo bem", "tudo bom", "td bem",
+}
+_THANKS = {
+    "obrigado", "obrigada", "obg", "brigado", "brigada", "valeu", "vlw",
+    "muito obrigado", "muito obrigada", "agradeco",
+}
+_GOODBYES = {
+    "tchau", "tchauzinho", "ate mais", "ate logo", "ate breve", "flw", "falou",
+    "ate amanha",
+}
+# Palavras de preenchimento que nao mudam a intencao ("oi, tudo bem?")
+_FILLERS = {"", "pessoal", "gente", "amigo", "amiga", "tudo", "bem", "e", "ai"}
+
+_YES_NO = {
+    "sim", "s", "claro", "isso", "isso mesmo", "pode", "pode ser", "pode marcar",
+    "confirmo", "confirmado", "ok", "okay", "beleza", "blz", "fechado", "certo",
+    "nao", "n", "nao quero", "negativo", "outro horario", "outra data",
+}
+_LEVELS = {
+    "iniciante", "intermediario", "intermediaria", "avancado", "avancada",
+    "nunca joguei", "sou iniciante", "sou intermediario", "sou avancado",
+}
+
+_DATE_RE = re.compile(r"\b\d{1,2}\s*[-/]\s*\d{1,2}\b|\bdia \d{1,2}\b")
+_TIME_RE = re.compile(r"\b\d{1,2}\s*(?:h|hs|horas?)\b|\b\d{1,2}:\d{2}\b|\bas \d{1,2}\b")
+_TUESDAY_RE = re.compile(r"\bterca(?: feira)?\b|\bsemana que vem\b")
+_NUMBER_RE = re.compile(r"^\d{1,2}(?: anos)?$")
+
+_BOOKING_VERBS = ("agendar", "marcar", "fazer uma aula", "fazer aula", "quero uma aula", "reservar")
+_BOOKING_OBJECTS = ("aula experimental", "aula teste", "aula gratis", "primeira aula", "experimentar", "uma aula")
+_FAQ_KEYWORDS = (
+    "onde fica", "endereco", "localizacao", "quanto custa", "preco", "valor",
+    "plano", "mensalidade", "horario de funcionamento", "estacionamento",
+    "como funciona", "regra", "estrutura", "vestiario",
+)
+# Palavra inteira (com plural): "valor" casa "valores", mas nao "valoriza"
+_FAQ_RE = re.compile(r"\b(?:" + "|".join(re.escape(k) for k in _FAQ_KEYWORDS) + r")(?:es|s)?\b")
+
+_RESPONSES = {
+    "greeting": "Ola! Sou o assistente da CT Smash. Como posso te ajudar?",
+    "thanks": "Por nada! Se precisar de algo mais, e so chamar.",
+    "goodbye": "Ate mais! Bom treino!",
+}
+
+
+def normalize(text: str) -> str:
+    """Minusculas, sem acento, pontuacao vira espaco, espacos colapsados."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    text = re.sub(r"[^\w:/\-\s]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _strip_lexicon(text: str, lexicon: set[str]) -> str:
+    """Remove do inicio do texto todas as expressoes do lexico (mais longas primeiro)."""
+    changed = True
+    while changed and text:
+        changed = False
+        for expr in sorted(lexicon, key=len, reverse=True):
+            if text == expr or text.startswith(expr + " "):
+                text = text[len(expr):].strip()
+                changed = True
+                break
+    return text
+
+
+def _only(text: str, lexicon: set[str]) -> bool:
+    """True se o texto contem so expressoes do lexico (+ palavras de preenchimento)."""
+    rest = _strip_lexicon(text, lexicon)
+    return all(w in _FILLERS for w in rest.split(" ")) and rest != text
+
+
+# ---------------------------------------------------------------------------
+# Regras
+# ---------------------------------------------------------------------------
+
+def classify_by_rules(text: str, trial_stage: Optional[str] = None) -> Optional[RuleMatch]:
+    """
+    Classifica a mensagem com regras locais.
+
+    Retorna None quando nenhuma regra se aplica (texto ambiguo → LLM).
+    """
+    norm = normalize(text)
+    if not norm:
+        return None
+    in_booking = trial_stage in ACTIVE_TRIAL_STAGES
+
+    # 1. Mensagens puramente sociais (saudacao / agradecimento / despedida)
+    for kind, lexicon in (("thanks", _THANKS), ("goodbye", _GOODBYES), ("greeting", _GREETINGS)):
+        if _only(norm, lexicon):
+            return RuleMatch(
+                intents=["general"],
+                general_response=_RESPONSES[kind],
+                confidence=0.98,
+                rule=kind,
+            )
+
+    # Saudacao no inicio nao muda a intencao do resto ("oi, quero marcar aula")
+    body = _strip_lexicon(norm, _GREETINGS) or norm
+    has_question = "?" in (text or "")
+    has_faq = bool(_FAQ_RE.search(body))
+
+    # 2. Respostas curtas no meio de um agendamento (sim/nao, data, horario, idade, nivel)
+    if in_booking and not has_faq and len(body.split(" ")) <= 8:
+        if body in _YES_NO or body in _LEVELS:
+            return RuleMatch(intents=["trial"], confidence=0.96, rule="booking_short_reply")
+        if _DATE_RE.search(body) or _TIME_RE.search(body) or _TUESDAY_RE.search(body):
+            return RuleMatch(intents=["trial"], confidence=0.95, rule="booking_date_time")
+        if _NUMBER_RE.match(body):
+            return RuleMatch(intents=["trial"], confidence=0.92, rule="booking_number")
+
+    # 3. Pedido explicito de agendamento, sem pergunta sobre outro assunto
+    mentions_booking = any(v in body for v in _BOOKING_VERBS)
+    wants_booking = mentions_booking and any(o in body for o in _BOOKING_OBJECTS)
+    if wants_booking and not has_faq and not has_question:
+        return RuleMatch(intents=["trial"], confidence=0.9, rule="booking_request")
+
+    # 4. Pergunta sobre o CT, sem mencao a agendamento. So passa do threshold
+    # quando e pergunta e nao cita aula/data/horario (senao pode ser trial + faq);
+    # o resto fica abaixo (vai pro LLM, ou vale como palpite sem orcamento)
+    if has_faq and not mentions_booking and not in_booking:
+        mentions_slot = (
+            any(o in body for o in _BOOKING_OBJECTS)
+            or _DATE_RE.search(body) or _TIME_RE.search(body) or _TUESDAY_RE.search(body)
+        )
+        if has_question and not mentions_slot:
+            return RuleMatch(intents=["faq"], confidence=0.92, rule="faq_question")
+        return RuleMatch(intents=["faq"], confidence=0.85, rule="faq_keyword")
+
+    return None
+
+
+def canned_general_response(text: str) -> Optional[str]:
+    """
+    Resposta pronta pra mensagem que comeca com agradecimento/despedida ou e so
+    saudacao. None se nao ha (ex: "oi, voces abrem domingo?" precisa de texto).
+    """
+    norm = normalize(text)
+    for kind, lexicon in (("thanks", _THANKS), ("goodbye", _GOODBYES)):
+        if any(norm == expr or norm.startswith(expr + " ") for expr in lexicon):
+            return _RESPONSES[kind]
+    if _only(norm, _GREETINGS):
+        return _RESPONSES["greeting"]
+    return None
+
+
+def general_response_for(text: str) -> str:
+    """Resposta curta pra intencao general quando quem classificou nao gera texto."""
+    return canned_general_response(text) or _RESPONSES["greeting"]
+
+
+# ---------------------------------------------------------------------------
+# Contadores
+# ---------------------------------------------------------------------------
+
+class FastPathStats:
+    """Contadores thread-safe de hit-rate e latencia do fast-path, do modelo local e do LLM."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.calls = 0
+            self.hits = 0
+            self.rule_hits: Dict[str, int] = {}
+            self.rules_seconds = 0.0
+            self.model_calls = 0
+            self.model_hits = 0
+            self.model_seconds = 0.0
+            self.llm_calls = 0
+            self.llm_seconds = 0.0
+
+    def record_rules(self, match: Optional[RuleMatch], seconds: float, used: bool) -> None:
+        with self._lock:
+            self.calls += 1
+            self.rules_seconds += seconds
+            if used and match is not None:
+                self.hits += 1
+                self.rule_hits[match.rule] = self.rule_hits.get(match.rule, 0) + 1
+
+    def record_model(self, seconds: float, used: bool) -> None:
+        with self._lock:
+            self.model_calls += 1
+            self.model_seconds += seconds
+            if used:
+                self.model_hits += 1
+
+    def record_llm(self, seconds: float) -> None:
+        with self._lock:
+            self.llm_calls += 1
+            self.llm_seconds += seconds
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "hits": self.hits,
+                "hit_rate": self.hits / self.calls if self.calls else 0.0,
+                "rule_hits": dict(self.rule_hits),
+                "rules_avg_ms": 1000 * self.rules_seconds / self.calls if self.calls else 0.0,
+                "model_calls": self.model_calls,
+                "model_hits": self.model_hits,
+                "model_avg_ms": 1000 * self.model_seconds / self.model_calls if self.model_calls else 0.0,
+                "llm_calls": self.llm_calls,
+                "llm_avg_ms": 1000 * self.llm_seconds / self.llm_calls if self.llm_calls else 0.0,
+            }
+
+    def prometheus(self) -> str:
+        """Contadores em texto Prometheus (anexado ao /metrics do webhook)."""
+        with self._lock:
+            counters = (
+                ("smash_triage_rules_calls_total", "Turnos avaliados pelas regras do fast-path", self.calls),
+                ("smash_triage_rules_seconds_total", "Tempo gasto nas regras do fast-path", self.rules_seconds),
+                ("smash_triage_model_calls_total", "Turnos avaliados pelo modelo local", self.model_calls),
+                ("smash_triage_model_hits_total", "Turnos classificados pelo modelo local", self.model_hits),
+                ("smash_triage_model_seconds_total", "Tempo gasto no modelo local", self.model_seconds),
+                ("smash_triage_llm_calls_total", "Turnos classificados pelo LLM", self.llm_calls),
+                ("smash_triage_llm_seconds_total", "Tempo gasto no LLM de triagem", self.llm_seconds),
+            )
+            rule_hits = sorted(self.rule_hits.items())
+        lines: list[str] = []
+        for name, help_, value in counters:
+            lines += [f"# HELP {name} {help_}", f"# TYPE {name} counter", f"{name} {value}"]
+        lines.append("# HELP smash_triage_rules_hits_total Turnos resolvidos pelo fast-path, por regra")
+        lines.append("# TYPE smash_triage_rules_hits_total counter")
+        for rule, count in rule_hits:
+            lines.append(f'smash_triage_rules_hits_total{{rule="{rule}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+FASTPATH_STATS = FastPathStats()
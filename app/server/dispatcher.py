@@ -0,0 +1,188 @@
+"""
+dispatcher.py — Fila de turnos com ordem FIFO por thread e backpressure global.
+
+- Cada thread (conversa) tem sua fila FIFO: dois turnos da mesma conversa
+  nunca rodam ao mesmo tempo (sem corrida no estado `trial`)
+- Threads diferentes rodam em paralelo, limitadas a `workers` tasks
+- O total de turnos pendentes é limitado a `max_pending`: acima disso submit()
+  levanta QueueFullError (o webhook responde 429)
+- Janela de coalescência (`coalesce_window`): mensagens da mesma thread que
+  chegam em rajada ("oi" / "quero marcar" / "sou o João") viram um único turno.
+  A thread só é liberada pros workers depois de `coalesce_window` sem mensagem
+  nova (debounce), limitado a `coalesce_max_wait` desde a primeira. O handler
+  recebe a lista de payloads do lote; o future da última mensagem recebe o
+  resultado, os anteriores recebem None (coalescidas)
+
+Tudo roda no event loop do servidor (asyncio puro, sem locks).
+"""
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+TurnHandler = Callable[[str, list], Awaitable[Any]]
+
+
+class QueueFullError(Exception):
+    """Fila global cheia: o cliente deve tentar de novo mais tarde."""
+
+
+@dataclass
+class DispatcherStats:
+    processed: int = 0
+    failed: int = 0
+    rejected: int = 0
+    coalesced: int = 0
+    active: int = 0
+
+
+class ThreadDispatcher:
+    """Executa turnos via `handler(thread_id, payloads)` com FIFO por thread."""
+
+    def __init__(self, handler: TurnHandler, *, workers: int = 8, max_pending: int = 256,
+                 coalesce_window: float = 0.0, coalesce_max_wait: Optional[float] = None):
+        if workers < 1 or max_pending < 1:
+            raise ValueError("workers e max_pending devem ser >= 1")
+        self.handler = handler
+        self.workers = workers
+        self.max_pending = max_pending
+        self.coalesce_window = max(coalesce_window, 0.0)
+        self.coalesce_max_wait = coalesce_max_wait if coalesce_max_wait is not None else 4 * self.coalesce_window
+        self.stats = DispatcherStats()
+        # thread_id -> turnos pendentes. Thread presente = aguardando janela, na fila _ready ou rodando
+        self._threads: Dict[str, Deque[Tuple[Any, asyncio.Future]]] = {}
+        self._ready: Optional[asyncio.Queue] = None
+        self._pending = 0
+        self._tasks: list[asyncio.Task] = []
+        # Coalescência: timer de liberação e instante da 1a/última mensagem do lote em espera
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._first_arrival: Dict[str, float] = {}
+        self._last_arrival: Dict[str, float] = {}
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def start(self) -> None:
+        self._ready = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for queue in self._threads.values():
+            for _, future in queue:
+                if not future.done():
+                    future.cancel()
+        self._threads.clear()
+        self._pending = 0
+
+    def submit(self, thread_id: str, payload: Any) -> asyncio.Future:
+        """Enfileira um turno. Retorna future com o resultado do handler."""
+        if self._ready is None:
+            raise RuntimeError("Dispatcher nao iniciado (chame start()).")
+        if self._pending >= self.max_pending:
+            self.stats.rejected += 1
+            raise QueueFullError(f"{self._pending} turnos pendentes (limite {self.max_pending})")
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        queue = self._threads.get(thread_id)
+        is_new = queue is None
+        if is_new:
+            queue = self._threads[thread_id] = deque()
+        queue.append((payload, future))
+        self._pending += 1
+
+        now = loop.time()
+        self._first_arrival.setdefault(thread_id, now)
+        self._last_arrival[thread_id] = now
+        # Rodando: o lote novo é agendado quando o turno atual terminar
+        if is_new or thread_id in self._timers:
+            self._schedule(thread_id)
+        return future
+
+    def _schedule(self, thread_id: str) -> None:
+        """Libera a thread pros workers já ou ao fim da janela de coalescência."""
+        timer = self._timers.pop(thread_id, None)
+        if timer is not None:
+            timer.cancel()
+        if not self.coalesce_window:
+            self._release(thread_id)
+            return
+        loop = asyncio.get_running_loop()
+        deadline = min(
+            self._last_arrival[thread_id] + self.coalesce_window,
+            self._first_arrival[thread_id] + self.coalesce_max_wait,
+        )
+        self._timers[thread_id] = loop.call_later(max(deadline - loop.time(), 0.0), self._release, thread_id)
+
+    def _release(self, thread_id: str) -> None:
+        self._timers.pop(thread_id, None)
+        self._ready.put_nowait(thread_id)
+
+    def _take_batch(self, thread_id: str) -> list[Tuple[Any, asyncio.Future]]:
+        queue = self._threads[thread_id]
+        if self.coalesce_window:
+            batch = list(queue)
+            queue.clear()
+        else:
+            batch = [queue.popleft()]
+        self._first_arrival.pop(thread_id, None)
+        self._pending -= len(batch)
+        return batch
+
+    async def _worker(self) -> None:
+        while True:
+            thread_id = await self._ready.get()
+            batch = self._take_batch(thread_id)
+            payloads = [payload for payload, _ in batch]
+            *coalesced, (_, future) = batch
+            self.stats.coalesced += len(coalesced)
+            self.stats.active += 1
+            try:
+                result = await self.handler(thread_id, payloads)
+            except asyncio.CancelledError:
+                for _, f in batch:
+                    f.cancel()
+                raise
+            except Exception as exc:  # erro de um turno nao derruba o worker
+                self.stats.failed += 1
+                for _, f in batch:
+                    if not f.done():
+                        f.set_exception(exc)
+            else:
+                self.stats.processed += 1
+                for _, f in coalesced:
+                    if not f.done():
+                        f.set_result(None)
+                if not future.done():
+                    future.set_result(result)
+            finally:
+                self.stats.active -= 1
+                # Próximo lote da mesma thread volta pro fim da fila (justiça entre threads)
+                if self._threads.get(thread_id):
+                    self._schedule(thread_id)
+                else:
+                    self._threads.pop(thread_id, None)
+                    self._last_arrival.pop(thread_id, None)
+
+    def snapshot(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self._pending,
+            "threads": len(self._threads),
+            "active": self.stats.active,
+            "processed": self.stats.processed,
+            "failed": self.stats.failed,
+            "rejected": self.stats.rejected,
+            "coalesced": self.stats.coalesced,
+        }
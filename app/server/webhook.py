@@ -0,0 +1,206 @@
+"""
+webhook.py — Ingress HTTP de produção (stand-in do webhook do WhatsApp).
+
+Recebe mensagens, enfileira no ThreadDispatcher (FIFO por conversa +
+backpressure + coalescência de rajadas) e roda o grafo core async com
+checkpointer persistente: cada turno envia só as novas mensagens, o estado
+vem do thread_id. Com DATABASE_URL, o remetente vira uma linha de customer
+(app/tools/customer.py) e o client_id do grafo é o customer.id (uuid) que a
+reserva referencia; sem banco (modo dev) o client_id é o próprio remetente.
+
+Endpoints:
+- POST /webhook   {"from": "<telefone/thread_id>", "text": "<mensagem>"}
+    202 -> turno enfileirado; a resposta vai pro ReplySender
+    200 -> com ?wait=true, devolve {"reply": ...} (útil pra teste local);
+           mensagem absorvida por outra da mesma rajada: {"reply": null, "coalesced": true}
+    400 -> corpo não é um objeto JSON ou falta from/text
+    429 -> fila global cheia (header Retry-After)
+- GET  /health    estado da fila
+- GET  /metrics   latência/LLM/tokens por nó e por turno + fast-path do
+                  triage (FASTPATH_STATS) em texto Prometheus
+- GET  /metrics.json  o mesmo em JSON (METRICS.snapshot() + "triage_fastpath")
+
+Variáveis de ambiente:
+- WEBHOOK_WORKERS      (default 8)   turnos simultâneos
+- WEBHOOK_MAX_PENDING  (default 256) turnos pendentes antes de responder 429
+- WEBHOOK_COALESCE_MS  (default 1000) janela de coalescência (0 desliga)
+- WEBHOOK_COALESCE_MAX_MS (default 4x a janela) espera máxima de um lote
+- BOOKING_WRITE_MODE   (default sync) gravação das reservas: sync | async | write_behind
+
+Rodar local sem OpenAI:
+    LLM_BACKEND=fake uvicorn app.server.webhook:app --port 8000
+    curl -X POST 'localhost:8000/webhook?wait=true' -d '{"from": "5521999999999", "text": "quero agendar"}'
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Optional
+
+from langchain_core.messages import HumanMessage
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Route
+
+from app.agents.aula_experimental.utils_trial.booking_queue import BOOKING_WRITER
+from app.core.graph import build_core_graph
+from app.core.metrics import METRICS, track_turn
+from app.core.triage_rules import FASTPATH_STATS
+from app.server.dispatcher import QueueFullError, ThreadDispatcher
+from app.tools.customer import cached_customer_id, resolve_customer_id
+
+logger = logging.getLogger(__name__)
+
+# Config do grafo usado pelo servidor: variantes async + estado persistido por thread_id
+GRAPH_CONFIGURABLE = {
+    "async_graph": True,
+    "persist_state": True,
+    "booking_write_mode": os.getenv("BOOKING_WRITE_MODE", "sync"),
+}
+
+_RETRY_AFTER_SECONDS = 2
+
+ReplySender = Callable[[str, str], Awaitable[None]]
+
+
+async def customer_id_for(thread_id: str) -> str:
+    """customer.id do remetente (upsert numa thread na 1a vez); sem DATABASE_URL, o próprio thread_id."""
+    if not os.getenv("DATABASE_URL"):
+        return thread_id
+    return cached_customer_id(thread_id) or await asyncio.to_thread(resolve_customer_id, thread_id)
+
+
+async def run_turn(thread_id: str, texts: list[str]) -> str:
+    """
+    Roda um turno do grafo core para a conversa `thread_id`. Retorna final_answer.
+    Uma rajada coalescida entra como várias HumanMessage; o input_node junta
+    todas num único client_input.
+    """
+    config = {"configurable": {**GRAPH_CONFIGURABLE, "thread_id": thread_id}}
+    graph = build_core_graph(config)
+    client_id = await customer_id_for(thread_id)
+    with track_turn():
+        result = await graph.ainvoke(
+            {"messages": [HumanMessage(content=text) for text in texts], "client_id": client_id},
+            config,
+        )
+    return result.get("final_answer", "")
+
+
+async def _discard_reply(thread_id: str, text: str) -> None:
+    """ReplySender padrão: WhatsApp inativo, a resposta só fica no retorno do turno."""
+    return None
+
+
+def create_app(
+    *,
+    handler: Callable[[str, list[str]], Awaitable[str]] = run_turn,
+    send_reply: ReplySender = _discard_reply,
+    workers: Optional[int] = None,
+    max_pending: Optional[int] = None,
+    coalesce_ms: Optional[int] = None,
+) -> Starlette:
+    """Factory do app (handler/send_reply injetáveis para testes e para o adapter real)."""
+    if coalesce_ms is None:
+        coalesce_ms = int(os.getenv("WEBHOOK_COALESCE_MS", "1000"))
+    coalesce_max_ms = os.getenv("WEBHOOK_COALESCE_MAX_MS")
+    dispatcher = ThreadDispatcher(
+        handler,
+        workers=workers or int(os.getenv("WEBHOOK_WORKERS", "8")),
+        max_pending=max_pending or int(os.getenv("WEBHOOK_MAX_PENDING", "256")),
+        coalesce_window=coalesce_ms / 1000,
+        coalesce_max_wait=int(coalesce_max_ms) / 1000 if coalesce_max_ms else None,
+    )
+
+    # Envios em andamento: referência forte (a task não é coletada) e erro logado
+    reply_tasks: set[asyncio.Task] = set()
+
+    def _reply_done(thread_id: str, task: asyncio.Task) -> None:
+        reply_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("falha enviando resposta para %s", thread_id, exc_info=task.exception())
+
+    def _deliver(thread_id: str, future: asyncio.Future) -> None:
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            logger.error("turno de %s falhou", thread_id, exc_info=future.exception())
+            return
+        if future.result() is None:
+            return
+        task = asyncio.ensure_future(send_reply(thread_id, future.result()))
+        reply_tasks.add(task)
+        task.add_done_callback(lambda t: _reply_done(thread_id, t))
+
+    async def webhook(request: Request) -> JSONResponse:
+        try:
+            body = await request.json()
+        except ValueError:
+            return JSONResponse({"error": "invalid_json"}, status_code=400)
+        if not isinstance(body, dict):
+            return JSONResponse({"error": "invalid_body"}, status_code=400)
+        thread_id = str(body.get("from") or body.get("thread_id") or "").strip()
+        text = str(body.get("text") or "").strip()
+        if not thread_id or not text:
+            return JSONResponse({"error": "missing_from_or_text"}, status_code=400)
+
+        try:
+            future = dispatcher.submit(thread_id, text)
+        except QueueFullError:
+            return JSONResponse(
+                {"error": "queue_full"},
+                status_code=429,
+                headers={"Retry-After": str(_RETRY_AFTER_SECONDS)},
+            )
+
+        if request.query_params.get("wait") in ("1", "true"):
+            try:
+                reply = await future
+            except Exception:
+                return JSONResponse({"error": "turn_failed"}, status_code=500)
+            if reply is None:
+                return JSONResponse({"thread_id": thread_id, "reply": None, "coalesced": True})
+            return JSONResponse({"thread_id": thread_id, "reply": reply})
+
+        future.add_done_callback(lambda f: _deliver(thread_id, f))
+        return JSONResponse({"status": "queued", "pending": dispatcher.pending}, status_code=202)
+
+    async def health(request: Request) -> JSONResponse:
+        return JSONResponse(dispatcher.snapshot())
+
+    async def metrics(request: Request) -> PlainTextResponse:
+        return PlainTextResponse(METRICS.prometheus() + FASTPATH_STATS.prometheus(),
+                                 media_type="text/plain; version=0.0.4")
+
+    async def metrics_json(request: Request) -> JSONResponse:
+        return JSONResponse({**METRICS.snapshot(), "triage_fastpath": FASTPATH_STATS.snapshot()})
+
+    @asynccontextmanager
+    async def lifespan(app: Starlette):
+        await dispatcher.start()
+        try:
+            yield
+        finally:
+            await dispatcher.stop()
+            if reply_tasks:   # respostas já em envio terminam antes de desligar
+                await asyncio.gather(*reply_tasks, return_exceptions=True)
+            await asyncio.to_thread(BOOKING_WRITER.close)   # grava reservas pendentes (write-behind)
+
+    app = Starlette(
+        routes=[
+            Route("/webhook", webhook, methods=["POST"]),
+            Route("/health", health, methods=["GET"]),
+            Route("/metrics", metrics, methods=["GET"]),
+            Route("/metrics.json", metrics_json, methods=["GET"]),
+        ],
+        lifespan=lifespan,
+    )
+    app.state.dispatcher = dispatcher
+    app.state.reply_tasks = reply_tasks
+    return app
+
+
+app = create_app()
@@ -0,0 +1,494 @@
+"""
+checkpointer.py — Checkpointer persistente do LangGraph (SQLite ou engine do app).
+
+Com o grafo compilado com este checkpointer, o caller não precisa mais
+reenviar o GlobalState inteiro a cada turno: basta mandar a nova mensagem com
+config["configurable"]["thread_id"] e o estado é retomado do banco.
+
+Formato compacto:
+- Serialização binária via serde do LangGraph (msgpack), com zlib acima de
+  _COMPRESS_MIN_BYTES.
+- Deltas por canal: a linha do checkpoint guarda só as versões dos canais;
+  o valor de cada canal só é gravado (tabela checkpoint_blob) quando a versão
+  muda. Um turno que só altera "trial" não regrava "messages".
+- Metadata com o tipo do serde gravado ao lado (metadata_type), como os blobs.
+
+Retenção (CHECKPOINT_KEEP_LAST, default 20; 0 guarda tudo): cada thread
+guarda só os últimos N checkpoints. Quando passa de N + _PRUNE_SLACK, o put
+apaga os mais antigos, os writes deles e os blobs que nenhum checkpoint
+restante referencia. prune() faz o mesmo para todas as threads.
+
+Backends (CHECKPOINT_URL):
+- não definida: SQLite local em ./checkpoints.sqlite
+- "database": reutiliza a engine de app/tools/database.py (DATABASE_URL)
+- qualquer URL SQLAlchemy (ex: sqlite:////data/ckpt.sqlite, postgresql+psycopg://...)
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import zlib
+from collections.abc import AsyncIterator, Iterator, Sequence
+from typing import Any, Optional
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from sqlalchemy import (
+    Column,
+    Integer,
+    LargeBinary,
+    MetaData,
+    String,
+    Table,
+    and_,
+    create_engine,
+    delete,
+    event,
+    func,
+    inspect,
+    or_,
+    select,
+    text,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Engine
+
+from app.tools.database import get_engine
+
+_DEFAULT_SQLITE_URL = "sqlite:///checkpoints.sqlite"
+_COMPRESS_MIN_BYTES = 512
+_DEFAULT_KEEP_LAST = 20
+# Só poda quando a thread passa de keep_last + _PRUNE_SLACK (uma poda a cada ~N puts)
+_PRUNE_SLACK = 10
+_DELETE_CHUNK = 200
+
+metadata = MetaData()
+
+checkpoints_table = Table(
+    "checkpoint",
+    metadata,
+    Column("thread_id", String, primary_key=True),
+    Column("checkpoint_ns", String, primary_key=True, default=""),
+    Column("checkpoint_id", String, primary_key=True),
+    Column("parent_checkpoint_id", String, nullable=True),
+    Column("type", String, nullable=False),
+    Column("checkpoint", LargeBinary, nullable=False),      # sem channel_values
+    Column("metadata", LargeBinary, nullable=False),
+    Column("metadata_type", String, nullable=True),         # NULL = linha antiga (msgpack)
+)
+
+blobs_table = Table(
+    "checkpoint_blob",
+    metadata,
+    Column("thread_id", String, primary_key=True),
+    Column("checkpoint_ns", String, primary_key=True, default=""),
+    Column("channel", String, primary_key=True),
+    Column("version", String, primary_key=True),
+    Column("type", String, nullable=False),
+    Column("blob", LargeBinary, nullable=True),
+)
+
+writes_table = Table(
+    "checkpoint_write",
+    metadata,
+    Column("thread_id", String, primary_key=True),
+    Column("checkpoint_ns", String, primary_key=True, default=""),
+    Column("checkpoint_id", String, primary_key=True),
+    Column("task_id", String, primary_key=True),
+    Column("idx", Integer, primary_key=True),
+    Column("channel", String, nullable=False),
+    Column("type", String, nullable=False),
+    Column("blob", LargeBinary, nullable=False),
+    Column("task_path", String, nullable=False, default=""),
+)
+
+
+def _in_thread(table: Table, thread_id: str, checkpoint_ns: str):
+    return and_(table.c.thread_id == thread_id, table.c.checkpoint_ns == checkpoint_ns)
+
+
+class SQLCheckpointSaver(BaseCheckpointSaver[str]):
+    """Checkpointer SQLAlchemy (SQLite/PostgreSQL) com deltas por canal."""
+
+    def __init__(self, engine: Engine, keep_last: Optional[int] = None, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.engine = engine
+        self.keep_last = (
+            keep_last if keep_last is not None else int(os.getenv("CHECKPOINT_KEEP_LAST", _DEFAULT_KEEP_LAST))
+        )
+        self._insert = pg_insert if engine.dialect.name == "postgresql" else sqlite_insert
+        metadata.create_all(engine)
+        self._add_missing_columns()
+
+    def _add_missing_columns(self) -> None:
+        """Bancos criados antes da coluna metadata_type (create_all não altera tabela existente)."""
+        columns = {c["name"] for c in inspect(self.engine).get_columns(checkpoints_table.name)}
+        if "metadata_type" not in columns:
+            with self.engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {checkpoints_table.name} ADD COLUMN metadata_type VARCHAR"))
+
+    # --- serialização compacta ---
+    def _dumps(self, value: Any) -> tuple[str, bytes]:
+        type_, data = self.serde.dumps_typed(value)
+        if data and len(data) >= _COMPRESS_MIN_BYTES:
+            return f"z:{type_}", zlib.compress(data)
+        return type_, data
+
+    def _loads(self, type_: str, data: bytes) -> Any:
+        if type_.startswith("z:"):
+            type_, data = type_[2:], zlib.decompress(data)
+        return self.serde.loads_typed((type_, data))
+
+    # --- leitura ---
+    def _load_blobs(self, conn, thread_id: str, checkpoint_ns: str, versions: ChannelVersions) -> dict[str, Any]:
+        if not versions:
+            return {}
+        wanted = [
+            and_(blobs_table.c.channel == ch, blobs_table.c.version == str(ver))
+            for ch, ver in versions.items()
+        ]
+        rows = conn.execute(
+            select(blobs_table.c.channel, blobs_table.c.type, blobs_table.c.blob).where(
+                blobs_table.c.thread_id == thread_id,
+                blobs_table.c.checkpoint_ns == checkpoint_ns,
+                or_(*wanted),
+            )
+        )
+        return {ch: self._loads(type_, blob) for ch, type_, blob in rows if type_ != "empty"}
+
+    def _load_writes(self, conn, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> list:
+        rows = conn.execute(
+            select(writes_table.c.task_id, writes_table.c.channel, writes_table.c.type, writes_table.c.blob)
+            .where(
+                writes_table.c.thread_id == thread_id,
+                writes_table.c.checkpoint_ns == checkpoint_ns,
+                writes_table.c.checkpoint_id == checkpoint_id,
+            )
+            .order_by(writes_table.c.task_path, writes_table.c.task_id, writes_table.c.idx)
+        )
+        return [(task_id, channel, self._loads(type_, blob)) for task_id, channel, type_, blob in rows]
+
+    def _to_tuple(self, conn, row) -> CheckpointTuple:
+        thread_id, checkpoint_ns, checkpoint_id, parent_id, type_, checkpoint_b, metadata_b, metadata_type = row
+        checkpoint = self._loads(type_, checkpoint_b)
+        return CheckpointTuple(
+            config={"configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint_id,
+            }},
+            checkpoint={
+                **checkpoint,
+                "channel_values": self._load_blobs(conn, thread_id, checkpoint_ns, checkpoint["channel_versions"]),
+            },
+            metadata=self._loads(metadata_type or "msgpack", metadata_b),
+            parent_config=(
+                {"configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": parent_id,
+                }}
+                if parent_id else None
+            ),
+            pending_writes=self._load_writes(conn, thread_id, checkpoint_ns, checkpoint_id),
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        """Último checkpoint da thread (ou o checkpoint_id pedido) — leitura pela PK."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        query = select(checkpoints_table).where(
+            checkpoints_table.c.thread_id == thread_id,
+            checkpoints_table.c.checkpoint_ns == checkpoint_ns,
+        )
+        if checkpoint_id := get_checkpoint_id(config):
+            query = query.where(checkpoints_table.c.checkpoint_id == checkpoint_id)
+        else:
+            query = query.order_by(checkpoints_table.c.checkpoint_id.desc()).limit(1)
+
+        with self.engine.connect() as conn:
+            row = conn.execute(query).first()
+            return self._to_tuple(conn, row) if row else None
+
+    def list(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> Iterator[CheckpointTuple]:
+        query = select(checkpoints_table).order_by(checkpoints_table.c.checkpoint_id.desc())
+        if config:
+            query = query.where(checkpoints_table.c.thread_id == config["configurable"]["thread_id"])
+            if (ns := config["configurable"].get("checkpoint_ns")) is not None:
+                query = query.where(checkpoints_table.c.checkpoint_ns == ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                query = query.where(checkpoints_table.c.checkpoint_id == checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            query = query.where(checkpoints_table.c.checkpoint_id < before_id)
+
+        with self.engine.connect() as conn:
+            rows = conn.execute(query).all()
+            for row in rows:
+                if limit is not None and limit <= 0:
+                    break
+                item = self._to_tuple(conn, row)
+                if filter and not all(item.metadata.get(k) == v for k, v in filter.items()):
+                    continue
+                if limit is not None:
+                    limit -= 1
+                yield item
+
+    # --- escrita ---
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """Grava o checkpoint (só versões) + blobs apenas dos canais que mudaram."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        c = checkpoint.copy()
+        values: dict[str, Any] = c.pop("channel_values")  # type: ignore[misc]
+
+        blob_rows = []
+        for channel, version in new_versions.items():
+            if channel in values:
+                type_, blob = self._dumps(values[channel])
+            else:
+                type_, blob = "empty", None
+            blob_rows.append({
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "channel": channel,
+                "version": str(version),
+                "type": type_,
+                "blob": blob,
+            })
+
+        type_, checkpoint_b = self._dumps(c)
+        metadata_type, metadata_b = self._dumps(get_checkpoint_metadata(config, metadata))
+        with self.engine.begin() as conn:
+            if blob_rows:
+                conn.execute(self._insert(blobs_table).on_conflict_do_nothing(), blob_rows)
+            stmt = self._insert(checkpoints_table).values(
+                thread_id=thread_id,
+                checkpoint_ns=checkpoint_ns,
+                checkpoint_id=checkpoint["id"],
+                parent_checkpoint_id=config["configurable"].get("checkpoint_id"),
+                type=type_,
+                checkpoint=checkpoint_b,
+                metadata=metadata_b,
+                metadata_type=metadata_type,
+            )
+            conn.execute(stmt.on_conflict_do_update(
+                index_elements=["thread_id", "checkpoint_ns", "checkpoint_id"],
+                set_={
+                    "checkpoint": stmt.excluded.checkpoint,
+                    "metadata": stmt.excluded.metadata,
+                    "metadata_type": stmt.excluded.metadata_type,
+                    "type": stmt.excluded.type,
+                },
+            ))
+            if self.keep_last and self._count(conn, thread_id, checkpoint_ns) > self.keep_last + _PRUNE_SLACK:
+                self._prune_thread(conn, thread_id, checkpoint_ns, self.keep_last)
+
+        return {"configurable": {
+            "thread_id": thread_id,
+            "checkpoint_ns": checkpoint_ns,
+            "checkpoint_id": checkpoint["id"],
+        }}
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            type_, blob = self._dumps(value)
+            rows.append({
+                "thread_id": config["configurable"]["thread_id"],
+                "checkpoint_ns": config["configurable"].get("checkpoint_ns", ""),
+                "checkpoint_id": config["configurable"]["checkpoint_id"],
+                "task_id": task_id,
+                "idx": WRITES_IDX_MAP.get(channel, idx),
+                "channel": channel,
+                "type": type_,
+                "blob": blob,
+                "task_path": task_path,
+            })
+        if not rows:
+            return
+        # Writes especiais (erro, interrupt...) sobrescrevem; os normais são idempotentes
+        stmt = self._insert(writes_table)
+        if all(channel in WRITES_IDX_MAP for channel, _ in writes):
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["thread_id", "checkpoint_ns", "checkpoint_id", "task_id", "idx"],
+                set_={"channel": stmt.excluded.channel, "type": stmt.excluded.type, "blob": stmt.excluded.blob},
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing()
+        with self.engine.begin() as conn:
+            conn.execute(stmt, rows)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self.engine.begin() as conn:
+            for table in (writes_table, blobs_table, checkpoints_table):
+                conn.execute(delete(table).where(table.c.thread_id == thread_id))
+
+    # --- retenção ---
+    @staticmethod
+    def _count(conn, thread_id: str, checkpoint_ns: str) -> int:
+        return conn.execute(
+            select(func.count()).select_from(checkpoints_table).where(
+                checkpoints_table.c.thread_id == thread_id,
+                checkpoints_table.c.checkpoint_ns == checkpoint_ns,
+            )
+        ).scalar_one()
+
+    def _prune_thread(self, conn, thread_id: str, checkpoint_ns: str, keep_last: int) -> int:
+        """Apaga os checkpoints além dos keep_last mais novos, seus writes e os blobs órfãos."""
+        rows = conn.execute(
+            select(checkpoints_table.c.checkpoint_id, checkpoints_table.c.type, checkpoints_table.c.checkpoint)
+            .where(_in_thread(checkpoints_table, thread_id, checkpoint_ns))
+            .order_by(checkpoints_table.c.checkpoint_id.desc())
+        ).all()
+        old_ids = [checkpoint_id for checkpoint_id, _, _ in rows[keep_last:]]
+        if not old_ids:
+            return 0
+        for table in (writes_table, checkpoints_table):
+            for i in range(0, len(old_ids), _DELETE_CHUNK):
+                conn.execute(delete(table).where(
+                    _in_thread(table, thread_id, checkpoint_ns),
+                    table.c.checkpoint_id.in_(old_ids[i:i + _DELETE_CHUNK]),
+                ))
+
+        referenced = {
+            (channel, str(version))
+            for _, type_, checkpoint_b in rows[:keep_last]
+            for channel, version in self._loads(type_, checkpoint_b)["channel_versions"].items()
+        }
+        orphans = [
+            and_(blobs_table.c.channel == channel, blobs_table.c.version == version)
+            for channel, version in conn.execute(
+                select(blobs_table.c.channel, blobs_table.c.version)
+                .where(_in_thread(blobs_table, thread_id, checkpoint_ns))
+            )
+            if (channel, version) not in referenced
+        ]
+        for i in range(0, len(orphans), _DELETE_CHUNK):
+            conn.execute(delete(blobs_table).where(
+                _in_thread(blobs_table, thread_id, checkpoint_ns), or_(*orphans[i:i + _DELETE_CHUNK]),
+            ))
+        return len(old_ids)
+
+    def prune(self, keep_last: Optional[int] = None) -> int:
+        """Poda todas as threads (ex: job noturno). Retorna quantos checkpoints apagou."""
+        keep_last = self.keep_last if keep_last is None else keep_last
+        if not keep_last:
+            return 0
+        with self.engine.begin() as conn:
+            threads = conn.execute(
+                select(checkpoints_table.c.thread_id, checkpoints_table.c.checkpoint_ns)
+                .group_by(checkpoints_table.c.thread_id, checkpoints_table.c.checkpoint_ns)
+                .having(func.count() > keep_last)
+            ).all()
+            return sum(self._prune_thread(conn, thread_id, ns, keep_last) for thread_id, ns in threads)
+
+    # --- async: mesma lógica numa thread (não bloqueia o event loop) ---
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        # Versões monotônicas em string (ordenáveis), igual aos savers oficiais
+        current_v = 0 if current is None else int(str(current).split(".")[0])
+        return f"{current_v + 1:032}"
+
+
+# -------------------------
+# Singleton
+# -------------------------
+
+_checkpointer: SQLCheckpointSaver | None = None
+_lock = threading.Lock()
+
+
+def _sqlite_engine(url: str) -> Engine:
+    engine = create_engine(url, future=True, connect_args={"check_same_thread": False})
+
+    @event.listens_for(engine, "connect")
+    def _pragmas(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        cur.execute("PRAGMA journal_mode=WAL")      # leitores não bloqueiam o writer
+        cur.execute("PRAGMA synchronous=NORMAL")
+        cur.close()
+
+    return engine
+
+
+def get_checkpointer() -> SQLCheckpointSaver:
+    """Retorna o checkpointer singleton conforme CHECKPOINT_URL."""
+    global _checkpointer
+    with _lock:
+        if _checkpointer is None:
+            url = os.getenv("CHECKPOINT_URL", _DEFAULT_SQLITE_URL)
+            if url == "database":
+                engine = get_engine()
+            elif url.startswith("sqlite"):
+                engine = _sqlite_engine(url)
+            else:
+                engine = create_engine(url, pool_pre_ping=True, future=True)
+            _checkpointer = SQLCheckpointSaver(engine)
+    return _checkpointer
@@ -0,0 +1,67 @@
+"""
+customer.py — Cliente (tabela customer) a partir do remetente do canal.
+
+O webhook recebe o remetente (telefone do WhatsApp), mas
+trial_class_booking.customer_id é um uuid que referencia customer(id).
+resolve_customer_id faz upsert em (channel, channel_user_id) e devolve o id;
+o id fica num LRU em memória, então só o primeiro turno de cada remetente
+vai ao banco.
+"""
+from __future__ import annotations
+
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from sqlalchemy import text
+
+from app.tools.database import get_session
+
+DEFAULT_CHANNEL = "whatsapp"
+
+# Conflito: update no-op (preenche phone se vazio) só pra RETURNING devolver o id existente
+_UPSERT_SQL = text("""
+    INSERT INTO customer (id, channel, channel_user_id, phone)
+    VALUES (:id, :channel, :channel_user_id, :phone)
+    ON CONFLICT (channel, channel_user_id) DO UPDATE SET phone = COALESCE(customer.phone, excluded.phone)
+    RETURNING id
+""")
+
+_MAX_CACHED = 10000
+_cache: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def cached_customer_id(channel_user_id: str, channel: str = DEFAULT_CHANNEL) -> Optional[str]:
+    """customer.id já resolvido neste processo (sem banco) ou None."""
+    with _lock:
+        customer_id = _cache.get((channel, channel_user_id))
+        if customer_id is not None:
+            _cache.move_to_end((channel, channel_user_id))
+        return customer_id
+
+
+def resolve_customer_id(channel_user_id: str, channel: str = DEFAULT_CHANNEL) -> str:
+    """customer.id (uuid, string) do remetente; cria a linha no primeiro contato."""
+    cached = cached_customer_id(channel_user_id, channel)
+    if cached is not None:
+        return cached
+    params = {
+        "id": str(uuid.uuid4()),
+        "channel": channel,
+        "channel_user_id": channel_user_id,
+        "phone": channel_user_id if channel == DEFAULT_CHANNEL else None,
+    }
+    with get_session() as session:
+        customer_id = str(session.execute(_UPSERT_SQL, params).scalar_one())
+    with _lock:
+        _cache[(channel, channel_user_id)] = customer_id
+        while len(_cache) > _MAX_CACHED:
+            _cache.popitem(last=False)
+    return customer_id
+
+
+def clear_customer_cache() -> None:
+    with _lock:
+        _cache.clear()
@@ -1,9 +1,20 @@
-"""Helpers de banco de dados (SQLAlchemy)."""
+"""
+Helpers de banco de dados (SQLAlchemy).
+
+- get_engine / get_session: engine e fábrica de sessões singleton (pool de
+  conexões compartilhado pelo processo)
+- get_async_engine / get_async_session: mesma base via driver async
+  (postgresql+psycopg async, sqlite+aiosqlite) — requer sqlalchemy[asyncio]
+
+Pool configurável por env (ignorado no SQLite):
+DB_POOL_SIZE (5), DB_MAX_OVERFLOW (10), DB_POOL_TIMEOUT (30s), DB_POOL_RECYCLE (1800s).
+"""
 from __future__ import annotations
 
 import os
-from contextlib import contextmanager
-from typing import Iterator
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Iterator, Optional
 
 from sqlalchemy import create_engine
 from sqlalchemy.orm import Session, declarative_base, sessionmaker
@@ -11,6 +22,38 @@ from sqlalchemy.orm import Session, declarative_base, sessionmaker
 Base = declarative_base()
 
 _ENGINE = None
+_SESSION_FACTORY: Optional[sessionmaker] = None
+_ASYNC_ENGINE = None
+_ASYNC_SESSION_FACTORY = None
+_lock = threading.Lock()
+
+
+def _database_url() -> str:
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        raise RuntimeError("DATABASE_URL não definida.")
+    return database_url
+
+
+def _pool_options(url: str) -> dict:
+    """Opções de pool por env (SQLite usa o pool padrão do dialeto)."""
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    }
+
+
+def _async_url(url: str) -> str:
+    """URL equivalente com driver async (psycopg 3 já é async; SQLite via aiosqlite)."""
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    if url.startswith("postgresql://") or url.startswith("postgres://"):
+        return "postgresql+psycopg://" + url.split("://", 1)[1]
+    return url
 
 
 def get_engine():
@@ -18,26 +61,28 @@ def get_engine():
     global _ENGINE
     if _ENGINE is not None:
         return _ENGINE
+    with _lock:
+        if _ENGINE is None:
+            url = _database_url()
+            _ENGINE = create_engine(url, pool_pre_ping=True, future=True, **_pool_options(url))
+    return _ENGINE
 
-    database_url = os.getenv("DATABASE_URL")
-    if not database_url:
-        raise RuntimeError("DATABASE_URL não definida.")
 
-    _ENGINE = create_engine(database_url, pool_pre_ping=True, future=True)
-    return _ENGINE
+def get_session_factory() -> sessionmaker:
+    """sessionmaker singleton (criado uma vez, não a cada sessão)."""
+    global _SESSION_FACTORY
+    if _SESSION_FACTORY is None:
+        engine = get_engine()
+        with _lock:
+            if _SESSION_FACTORY is None:
+                _SESSION_FACTORY = sessionmaker(bind=engine, autocommit=False, autoflush=False, future=True)
+    return _SESSION_FACTORY
 
 
 @contextmanager
 def get_session() -> Iterator[Session]:
-    """Context manager para sessão do banco. Criação lazy do SessionLocal."""
-    engine = get_engine()
-    SessionLocal = sessionmaker(
-        bind=engine,
-        autocommit=False,
-        autoflush=False,
-        future=True,
-    )
-    session = SessionLocal()
+    """Context manager para sessão do banco (commit no fim, rollback em erro)."""
+    session = get_session_factory()()
     try:
         yield session
         session.commit()
@@ -46,3 +91,44 @@ def get_session() -> Iterator[Session]:
         raise
     finally:
         session.close()
+
+
+def get_async_engine():
+    """AsyncEngine singleton (mesmo DATABASE_URL, driver async)."""
+    global _ASYNC_ENGINE, _ASYNC_SESSION_FACTORY
+    if _ASYNC_ENGINE is not None:
+        return _ASYNC_ENGINE
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    with _lock:
+        if _ASYNC_ENGINE is None:
+            url = _database_url()
+            _ASYNC_ENGINE = create_async_engine(_async_url(url), pool_pre_ping=True, **_pool_options(url))
+            _ASYNC_SESSION_FACTORY = async_sessionmaker(_ASYNC_ENGINE, autoflush=False, expire_on_commit=False)
+    return _ASYNC_ENGINE
+
+
+@asynccontextmanager
+async def get_async_session() -> AsyncIterator:
+    """Versão async de get_session."""
+    get_async_engine()
+    session = _ASYNC_SESSION_FACTORY()
+    try:
+        yield session
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        raise
+    finally:
+        await session.close()
+
+
+def reset_engines() -> None:
+    """Descarta engines e fábricas (ex: troca de DATABASE_URL em scripts/benchmarks)."""
+    global _ENGINE, _SESSION_FACTORY, _ASYNC_ENGINE, _ASYNC_SESSION_FACTORY
+    with _lock:
+        if _ENGINE is not None:
+            _ENGINE.dispose()
+        if _ASYNC_ENGINE is not None:
+            _ASYNC_ENGINE.sync_engine.dispose()
+        _ENGINE = _SESSION_FACTORY = _ASYNC_ENGINE = _ASYNC_SESSION_FACTORY = None
@@ -0,0 +1,79 @@
+"""
+bench_extract_prompts.py — Tokens de entrada do extractor do trial por etapa:
+prompt + schema completos (TrialExtraction) vs prompt + schema da etapa
+(STAGE_SCHEMAS).
+
+Não chama LLM: monta as mensagens como o extractor e conta tokens com o
+tiktoken (se o encoding estiver disponível) ou com a estimativa de memory.py.
+O schema entra na conta como a tool que o structured output manda pro provedor.
+
+Uso:
+    python scripts/bench_extract_prompts.py
+    python scripts/bench_extract_prompts.py --text "pode ser terça às 9h"
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+
+# Garante que o projeto está no path (para rodar de qualquer diretório)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from app.agents.aula_experimental.utils_trial.extractor import _extract_messages, build_extract_user_prompt
+from app.agents.aula_experimental.utils_trial.prompts import TRIAL_EXTRACT_SYSTEM
+from app.agents.aula_experimental.utils_trial.schemas import STAGE_FIELDS, TrialExtraction, schema_for_stage
+from app.core.datetime_utils import get_current_context
+from app.core.memory import estimate_tokens
+
+_SNAPSHOT = {"nome": "Ana", "idade": 28, "nivel": "iniciante", "desired_date": None,
+             "desired_time": None, "confirmed": None, "stage": None, "output": "Qual dia fica bom?"}
+
+
+def _counter():
+    try:
+        import tiktoken
+        enc = tiktoken.get_encoding("o200k_base")
+        return lambda text: len(enc.encode(text)), "tiktoken"
+    except Exception:
+        return estimate_tokens, "estimativa len/4"
+
+
+def _tokens(count, messages: list[dict], schema) -> int:
+    tool = json.dumps(convert_to_openai_tool(schema), ensure_ascii=False)
+    return sum(count(m["content"]) for m in messages) + count(tool)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tokens do prompt do extractor por etapa")
+    parser.add_argument("--text", default="Pode ser na terça às 9h", help="Mensagem do cliente")
+    args = parser.parse_args()
+
+    count, method = _counter()
+    print(f"Tokens de entrada do extractor ({method})")
+    total_full = total_stage = 0
+    for stage in STAGE_FIELDS:
+        snapshot = {**_SNAPSHOT, "stage": stage}
+        stage_msgs = _extract_messages(client_text=args.text, stage=stage, trial_snapshot=snapshot)
+        # prompt antigo: system completo, snapshot inteiro do trial e datas sempre
+        ctx = get_current_context()
+        full_user = build_extract_user_prompt(
+            client_text=args.text, stage=stage, trial_snapshot=snapshot, now_iso=ctx["now_iso"],
+            weekday=ctx["weekday"], next_tuesdays=ctx["next_tuesdays"],
+        )
+        full_msgs = [{"role": "system", "content": TRIAL_EXTRACT_SYSTEM},
+                     {"role": "user", "content": full_user}]
+        full = _tokens(count, full_msgs, TrialExtraction)
+        scoped = _tokens(count, stage_msgs, schema_for_stage(stage))
+        total_full += full
+        total_stage += scoped
+        print(f"  {stage:<22} completo={full:5d}  etapa={scoped:5d}  economia={1 - scoped / full:6.1%}")
+    print(f"  {'total':<22} completo={total_full:5d}  etapa={total_stage:5d}  "
+          f"economia={1 - total_stage / total_full:6.1%}")
+
+
+if __name__ == "__main__":
+    main()
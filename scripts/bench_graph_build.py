@@ -0,0 +1,63 @@
+"""
+bench_graph_build.py — Compara build "frio" (compila core + subgrafo trial) vs
+"quente" (grafo compilado vindo do cache por config).
+
+Não chama LLM: só mede a factory build_core_graph.
+
+Uso:
+    python scripts/bench_graph_build.py
+    python scripts/bench_graph_build.py --runs 200 --async-graph
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+# Garante que o projeto está no path (para rodar de qualquer diretório)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.core.graph import build_core_graph, clear_graph_cache
+
+
+def _measure(runs: int, config: dict, cold: bool) -> list[float]:
+    timings = []
+    for _ in range(runs):
+        if cold:
+            clear_graph_cache()
+        start = time.perf_counter()
+        build_core_graph(config)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _print(name: str, timings: list[float]) -> None:
+    ordered = sorted(timings)
+    p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+    print(
+        f"  {name:<5} avg={statistics.mean(timings) * 1000:9.3f}ms  "
+        f"p50={statistics.median(timings) * 1000:9.3f}ms  p95={p95 * 1000:9.3f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do cache de grafos compilados")
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--async-graph", action="store_true", help="Compila a variante async")
+    args = parser.parse_args()
+
+    config = {"configurable": {"async_graph": args.async_graph}}
+
+    print(f"build_core_graph x{args.runs} (async_graph={args.async_graph})")
+    cold = _measure(args.runs, config, cold=True)
+    build_core_graph(config)  # garante cache populado
+    warm = _measure(args.runs, config, cold=False)
+    _print("cold", cold)
+    _print("warm", warm)
+    print(f"  speedup ~{statistics.mean(cold) / max(statistics.mean(warm), 1e-9):.0f}x")
+
+
+if __name__ == "__main__":
+    main()
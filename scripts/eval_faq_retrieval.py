@@ -0,0 +1,123 @@
+"""
+eval_faq_retrieval.py — Recall e latência do retrieval do FAQ por backend de embeddings.
+
+Perguntas rotuladas (estilo WhatsApp, com e sem acento) -> seção(ões) do
+ct_smash.md que respondem. Para cada backend (FAQ_EMBEDDINGS):
+
+- hit@1:  a 1a seção recuperada responde a pergunta
+- recall@4: alguma das top-4 (o que vai pro prompt do FAQ) responde
+- MRR e latência por pergunta (embedding da query + busca FAISS)
+
+Com os dois backends, mostra também a concordância do top-4 local com o da
+OpenAI. Os índices são montados em memória (não grava vectorstore/). O backend
+openai só roda com OPENAI_API_KEY.
+
+Uso:
+    python scripts/eval_faq_retrieval.py
+    python scripts/eval_faq_retrieval.py --backends hashing
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+# Garante que o projeto está no path (para rodar de qualquer diretório)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.agents.faq.retriever import FAQ_EMBEDDING_BACKENDS, _TOP_K, build_vectorstore
+
+# pergunta -> seções aceitas (último header do chunk)
+_QUERIES = [
+    ("onde fica o ct?", ["Endereço do CT"]),
+    ("qual o endereco de vcs", ["Endereço do CT"]),
+    ("fica no recreio?", ["Endereço do CT"]),
+    ("quanto custa o plano da noite?", ["Plano da noite (18:00 as 22:00)"]),
+    ("valor mensal 3x na semana a noite", ["Plano da noite (18:00 as 22:00)"]),
+    ("preço do plano de manhã", ["Plano da manha (06:00 as 17:00)"]),
+    ("quanto fica o trimestral 2x de manha", ["Plano da manha (06:00 as 17:00)"]),
+    ("quais os planos?", ["Plano da manha (06:00 as 17:00)", "Plano da noite (18:00 as 22:00)", "FAQ - Planos e matricula"]),
+    ("vcs abrem no sabado?", ["Horários disponíveis pra aulas de Beach Tennis"]),
+    ("que horas funciona", ["Horários disponíveis pra aulas de Beach Tennis", "Horários das aulas de Beach Tennis"]),
+    ("tem aula as 19h?", ["Horários das aulas de Beach Tennis", "Horários disponíveis pra aulas de Beach Tennis"]),
+    ("quanto tempo dura a aula?", ["Duração das aulas de Beach Tennis", "FAQ - Aula experimental"]),
+    ("a aula experimental é gratis?", ["Aula experimental", "FAQ - Aula experimental"]),
+    ("preciso levar raquete?", ["FAQ - Aula experimental"]),
+    ("a experimental é em grupo ou individual", ["FAQ - Aula experimental"]),
+    ("qual horario da aula experimental", ["Aula experimental", "FAQ - Aula experimental"]),
+    ("tem area kids?", ["Estrutura do Smash Beach Tennis", "FAQ - Estrutura e servicos", "FAQ - Publico e niveis"]),
+    ("meu filho pode fazer aula?", ["FAQ - Publico e niveis"]),
+    ("nunca joguei, posso começar?", ["FAQ - Publico e niveis"]),
+    ("tem nutricionista e fisioterapeuta?", ["Estrutura do Smash Beach Tennis", "FAQ - Estrutura e servicos"]),
+    ("quantas quadras tem?", ["Estrutura do Smash Beach Tennis"]),
+    ("quero alugar a churrasqueira", ["FAQ - Estrutura e servicos", "Regras de acesso aos serviços", "Serviços atendidos automaticamente pelo WhatsApp"]),
+    ("posso alugar quadra sem ser aluno?", ["Regras de acesso aos serviços", "FAQ - Regras de acesso"]),
+    ("o que é exclusivo pra aluno matriculado", ["FAQ - Regras de acesso", "Regras de acesso aos serviços"]),
+    ("tem aula avulsa?", ["FAQ - Planos e matricula", "Regras de acesso aos serviços", "FAQ - Regras de acesso"]),
+    ("como faço a matricula", ["FAQ - Planos e matricula"]),
+    ("da pra resolver tudo pelo whatsapp?", ["FAQ - Atendimento", "Serviços atendidos automaticamente pelo WhatsApp"]),
+    ("quero marcar massagem", ["Serviços atendidos automaticamente pelo WhatsApp", "FAQ - Atendimento"]),
+    ("tem bar ou loja?", ["Estrutura do Smash Beach Tennis", "FAQ - Estrutura e servicos"]),
+    ("falar com atendente humano", ["FAQ - Atendimento", "Serviços atendidos automaticamente pelo WhatsApp"]),
+]
+
+
+def _section(doc) -> str:
+    return doc.metadata.get("h3") or doc.metadata.get("h2") or doc.metadata.get("h1", "")
+
+
+def _evaluate(backend: str) -> tuple[dict, list[list[str]]]:
+    store = build_vectorstore(backend)
+    store.similarity_search(_QUERIES[0][0], k=_TOP_K)   # aquece (cliente HTTP / caches)
+    hits1 = hits_k = 0
+    rr, latencies, rankings = [], [], []
+    for query, expected in _QUERIES:
+        start = time.perf_counter()
+        docs = store.similarity_search(query, k=_TOP_K)
+        latencies.append(time.perf_counter() - start)
+        ranked = [_section(d) for d in docs]
+        rankings.append(ranked)
+        hits1 += ranked[0] in expected
+        first = next((i for i, s in enumerate(ranked) if s in expected), None)
+        hits_k += first is not None
+        rr.append(1 / (first + 1) if first is not None else 0.0)
+    latencies.sort()
+    n = len(_QUERIES)
+    return {
+        "hit@1": hits1 / n,
+        f"recall@{_TOP_K}": hits_k / n,
+        "mrr": statistics.mean(rr),
+        "p50_ms": latencies[n // 2] * 1000,
+        "p95_ms": latencies[min(int(n * 0.95), n - 1)] * 1000,
+    }, rankings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall/latencia do retrieval do FAQ por backend")
+    parser.add_argument("--backends", nargs="+", default=list(FAQ_EMBEDDING_BACKENDS), choices=FAQ_EMBEDDING_BACKENDS)
+    args = parser.parse_args()
+
+    print(f"{len(_QUERIES)} perguntas rotuladas, top-{_TOP_K}")
+    rankings = {}
+    for backend in args.backends:
+        if backend == "openai" and not os.getenv("OPENAI_API_KEY"):
+            print(f"  {backend:<8} pulado (sem OPENAI_API_KEY)")
+            continue
+        metrics, rankings[backend] = _evaluate(backend)
+        print(f"  {backend:<8} " + "  ".join(
+            f"{name}={value:.2f}" if not name.endswith("_ms") else f"{name}={value:.3f}"
+            for name, value in metrics.items()
+        ))
+
+    if "openai" in rankings and "hashing" in rankings:
+        overlap = statistics.mean(
+            len(set(a) & set(b)) / _TOP_K for a, b in zip(rankings["openai"], rankings["hashing"])
+        )
+        same_top1 = statistics.mean(a[0] == b[0] for a, b in zip(rankings["openai"], rankings["hashing"]))
+        print(f"  concordancia hashing x openai: top-1 {same_top1:.0%}, top-{_TOP_K} {overlap:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""
+load_test.py — Gerador de carga do grafo core com LLM fake (sem OpenAI).
+
+Roda muitas conversas sintéticas concorrentes, montadas a partir dos SCENARIOS
+de tests/eval_trial.py, contra build_core_graph. O get_llm() (todos os papéis) é trocado por um
+FakeChatModel determinístico: latência sorteada de uma distribuição e structured
+output heurístico (regex sobre a mensagem do cliente), o suficiente pra
+conversa andar pelas etapas do trial como com o GPT.
+
+Reporta throughput, latência por turno (p50/p95/p99), chamadas de LLM por
+turno, tempo por nó e acerto da etapa final esperada de cada cenário.
+Com --metrics, imprime também o dump JSON de app/core/metrics.py (chamadas de
+LLM e tokens por nó/turno, o mesmo de GET /metrics.json do webhook).
+
+Uso:
+    python scripts/load_test.py
+    python scripts/load_test.py --conversations 500 --concurrency 100 --latency lognormal:400,0.5
+    python scripts/load_test.py --sync --concurrency 8          # grafo sync em threads
+    python scripts/load_test.py --persist                       # checkpointer SQLite temporário
+    python scripts/load_test.py --latency 3000 --budget-ms 1500  # LLM lento: degradação por orçamento
+    python scripts/load_test.py --nlg-cached                    # NLG do trial por templates em cache
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import statistics
+import sys
+import tempfile
+import time
+import unicodedata
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Any
+
+# Garante que o projeto está no path (para rodar de qualquer diretório)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import HumanMessage
+
+import app.agents.aula_experimental.utils_trial.get_llm as get_llm_module
+from app.agents.aula_experimental.utils_trial.fake_llm import FakeChatModel, parse_latency
+from app.agents.aula_experimental.utils_trial.nlg_cache import NLG_CACHE
+from app.agents.aula_experimental.utils_trial.rule_extractor import RULE_EXTRACT_STATS
+from app.core.metrics import METRICS, track_turn
+from app.core.triage_rules import FASTPATH_STATS, classify_by_rules
+from tests.eval_trial import SCENARIOS
+
+_WEEKDAYS = {"segunda": 0, "terca": 1, "quarta": 2, "quinta": 3, "sexta": 4, "sabado": 5, "domingo": 6}
+
+
+# ---------------------------------------------------------------------------
+# Structured output heurístico (substitui o GPT nos schemas do sistema)
+# ---------------------------------------------------------------------------
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def _last_user_text(prompt: Any) -> str:
+    """Mensagem do cliente dentro do prompt (dicts role/content ou BaseMessage)."""
+    last = prompt[-1] if isinstance(prompt, list) and prompt else prompt
+    content = last.get("content", "") if isinstance(last, dict) else getattr(last, "content", str(last))
+    for marker in ("Mensagem do cliente:", "mensagem do cliente:"):
+        if marker in content:
+            content = content.split(marker)[-1].split("\n\n")[0]
+    return content.strip()
+
+
+def _next_weekday(weekday: int) -> str:
+    today = date.today()
+    days = (weekday - today.weekday()) % 7 or 7
+    return (today + timedelta(days=days)).strftime("%d-%m")
+
+
+def _extract(text: str) -> dict:
+    norm = _normalize(text)
+    out: dict = {}
+    if m := re.search(r"(?i:me chamo|meu nome é|sou o|sou a|sou)\s+([A-ZÁ-Ú][a-zá-ú]+)", text):
+        out["nome"] = m.group(1)
+    if m := re.search(r"(?:^|[\s,])(\d{1,2})(?:\s*anos)?(?=\s*(?:,|$|e\b|anos))", norm):
+        out["idade"] = int(m.group(1))
+    if "inician" in norm or "nunca joguei" in norm:
+        out["nivel"] = "iniciante"
+    elif "intermedi" in norm:
+        out["nivel"] = "intermediario"
+    elif "avanc" in norm:
+        out["nivel"] = "avancado"
+    for name, weekday in _WEEKDAYS.items():
+        if name in norm:
+            out["desired_date"] = _next_weekday(weekday)
+            break
+    if m := re.search(r"\b(\d{1,2})\s*h(?:(\d{2}))?\b", norm):
+        out["desired_time"] = f"{int(m.group(1)):02d}:{m.group(2) or '00'}"
+    if re.search(r"\b(sim|confirmo|pode marcar)\b", norm):
+        out["confirmed"] = True
+    elif re.match(r"\s*nao\b", norm) and "nao quero mais" not in norm:
+        out["confirmed"] = False
+    if re.search(r"nao quero mais|deixa pra la|desisto|cancela", norm):
+        out["wants_to_cancel"] = True
+    return out
+
+
+def heuristic_responder(schema_name: str, prompt: Any) -> dict:
+    text = _last_user_text(prompt)
+    if schema_name == "TriageResult":
+        rule = classify_by_rules(text, None)
+        return {"intents": rule.intents if rule else ["trial"], "general_response": rule.general_response if rule else None}
+    if schema_name.endswith("Extraction"):   # TrialExtraction ou schema da etapa
+        return _extract(text)
+    return {}
+
+
+# ---------------------------------------------------------------------------
+# Tempo por nó (callbacks do LangGraph: run com name == langgraph_node)
+# ---------------------------------------------------------------------------
+
+class NodeTimer(BaseCallbackHandler):
+    def __init__(self):
+        self.started: dict = {}
+        self.timings: dict[str, list[float]] = defaultdict(list)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        if node and kwargs.get("name") == node:
+            self.started[run_id] = (node, time.perf_counter())
+
+    def _finish(self, run_id):
+        entry = self.started.pop(run_id, None)
+        if entry:
+            self.timings[entry[0]].append(time.perf_counter() - entry[1])
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._finish(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id)
+
+
+# ---------------------------------------------------------------------------
+# Execução
+# ---------------------------------------------------------------------------
+
+def _percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+async def _run_conversation(idx: int, graph, args, timer: NodeTimer, turn_latencies: list, results: list):
+    scenario = SCENARIOS[idx % len(SCENARIOS)]
+    configurable = {"thread_id": f"load-{idx}"}
+    if args.budget_ms is not None:
+        configurable["turn_budget_ms"] = args.budget_ms
+    if args.nlg_cached:
+        configurable["trial_nlg_mode"] = "cached"
+    thread_cfg = {"configurable": configurable, "callbacks": [timer]}
+    state: dict = {"messages": []}
+    for text in scenario["inputs"]["turns"]:
+        if args.persist:
+            payload = {"messages": [HumanMessage(content=text)]}
+        else:
+            payload = {**state, "messages": list(state.get("messages", [])) + [HumanMessage(content=text)]}
+        start = time.perf_counter()
+        with track_turn():
+            if args.sync:
+                state = await asyncio.to_thread(graph.invoke, payload, thread_cfg)
+            else:
+                state = await graph.ainvoke(payload, thread_cfg)
+        turn_latencies.append(time.perf_counter() - start)
+    final_stage = (state.get("trial") or {}).get("stage")
+    results.append(final_stage == scenario["outputs"]["expected_final_stage"])
+
+
+async def run(args) -> None:
+    llm = FakeChatModel(latency_fn=parse_latency(args.latency, seed=args.seed), responder=heuristic_responder)
+    get_llm_module._llm = llm   # get_llm() de todos os papeis passa a ser o fake
+
+    if args.persist:
+        os.environ.setdefault("CHECKPOINT_URL", f"sqlite:///{tempfile.mkdtemp()}/load_test.sqlite")
+    from app.core.graph import build_core_graph
+
+    graph = build_core_graph({"configurable": {"async_graph": not args.sync, "persist_state": args.persist}})
+    timer = NodeTimer()
+    turn_latencies: list[float] = []
+    results: list[bool] = []
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def _bounded(i):
+        async with semaphore:
+            await _run_conversation(i, graph, args, timer, turn_latencies, results)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[_bounded(i) for i in range(args.conversations)])
+    wall = time.perf_counter() - start
+
+    turns = len(turn_latencies)
+    print(f"\nConversas: {args.conversations}  turnos: {turns}  concorrencia: {args.concurrency}  "
+          f"latencia LLM: {args.latency}  modo: {'sync' if args.sync else 'async'}")
+    print(f"Tempo total: {wall:.2f}s  throughput: {turns / wall:.1f} turnos/s ({args.conversations / wall:.1f} conversas/s)")
+    print(f"Latencia por turno: p50={_percentile(turn_latencies, 0.5) * 1000:.1f}ms  "
+          f"p95={_percentile(turn_latencies, 0.95) * 1000:.1f}ms  p99={_percentile(turn_latencies, 0.99) * 1000:.1f}ms")
+    print(f"Chamadas de LLM: {llm.calls} ({llm.calls / max(turns, 1):.2f}/turno)")
+    print(f"Etapa final esperada: {sum(results)}/{len(results)} conversas")
+    snapshot = METRICS.snapshot()
+    prompt_tokens = snapshot["turns"]["prompt_tokens"]["sum"]
+    cached_tokens = snapshot["turns"]["cached_tokens"]["sum"]
+    print(f"Tokens de prompt: {prompt_tokens:.0f} ({prompt_tokens / max(turns, 1):.0f}/turno), "
+          f"do cache de prefixo: {cached_tokens:.0f} ({cached_tokens / max(prompt_tokens, 1):.0%})")
+    print("  por no: " + "  ".join(
+        f"{node} {counters['cached_tokens'] / counters['prompt_tokens']:.0%}"
+        for node, counters in snapshot["nodes"].items() if counters["prompt_tokens"]
+    ))
+    fastpath = FASTPATH_STATS.snapshot()
+    print(f"Triage sem LLM: fast-path {fastpath['hits']}/{fastpath['calls']} ({fastpath['hit_rate']:.0%}, "
+          f"{fastpath['rules_avg_ms']:.2f}ms), modelo local {fastpath['model_hits']}/{fastpath['model_calls']}; "
+          f"LLM {fastpath['llm_calls']} ({fastpath['llm_avg_ms']:.0f}ms)")
+    rules = RULE_EXTRACT_STATS.snapshot()
+    print(f"Extractor do trial por regras (sem LLM): {rules['llm_skipped']}/{rules['calls']} "
+          f"({rules['skip_rate']:.0%}) nas etapas de data/confirmacao")
+    if args.nlg_cached:
+        nlg = NLG_CACHE.snapshot()
+        print(f"NLG do trial por template (sem LLM): {nlg['hits']}/{nlg['hits'] + nlg['misses']} "
+              f"({nlg['hit_rate']:.0%}), {nlg['size']} templates")
+    degradations = snapshot["degradations"]
+    if degradations:
+        print(f"Degradacoes por orcamento: {degradations}")
+
+    print(f"\n  {'no':<32}{'n':>7}{'media':>10}{'p50':>10}{'p95':>10}{'p99':>10}   (ms)")
+    for node, values in sorted(timer.timings.items(), key=lambda kv: -sum(kv[1])):
+        print(f"  {node:<32}{len(values):>7}{statistics.mean(values) * 1000:>10.1f}"
+              f"{_percentile(values, 0.5) * 1000:>10.1f}{_percentile(values, 0.95) * 1000:>10.1f}"
+              f"{_percentile(values, 0.99) * 1000:>10.1f}")
+
+    if args.metrics:
+        print("\n" + json.dumps(METRICS.snapshot(), indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do grafo core com LLM fake")
+    parser.add_argument("--conversations", "-n", type=int, default=200)
+    parser.add_argument("--concurrency", "-c", type=int, default=50)
+    parser.add_argument("--latency", default="lognormal:300,0.5",
+                        help="Latencia por chamada do LLM fake em ms (300, uniform:a,b, normal:m,s, lognormal:mediana,sigma)")
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--sync", action="store_true", help="Grafo sync (invoke em threads) em vez de ainvoke")
+    parser.add_argument("--persist", action="store_true", help="Estado via checkpointer SQLite (so envia a nova mensagem)")
+    parser.add_argument("--budget-ms", type=int, default=None,
+                        help="Orcamento de latencia por turno (configurable.turn_budget_ms; 0 desliga)")
+    parser.add_argument("--nlg-cached", action="store_true",
+                        help="NLG do trial em modo cached (configurable.trial_nlg_mode)")
+    parser.add_argument("--metrics", action="store_true", help="Imprime o dump JSON de METRICS (LLM/tokens por no e turno)")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
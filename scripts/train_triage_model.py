@@ -0,0 +1,161 @@
+"""
+train_triage_model.py — Treina o modelo local de intencao do triage (TF-IDF + logistica).
+
+Le turnos rotulados (JSONL: {"text", "intents", "stage"?}), separa treino/teste,
+treina, salva o artefato compacto e compara acuracia/latencia contra o LLM.
+
+Para gerar o dataset, rode o sistema com TRIAGE_LOG_PATH=turnos.jsonl: cada
+classificacao feita pelo LLM e gravada como exemplo rotulado.
+
+Limitacao: os rotulos do dataset logado sao do proprio LLM. No teste separado
+desse dataset o numero e CONCORDANCIA com o LLM, nao acuracia (e rodar o LLM
+nele seria circular). A acuracia de verdade — do modelo e do LLM
+(--compare-llm) — e medida em rotulos manuais: _HAND_LABELLED abaixo ou um
+JSONL proprio em --eval.
+
+Uso:
+    python scripts/train_triage_model.py --data turnos.jsonl
+    python scripts/train_triage_model.py --data turnos.jsonl --compare-llm
+    python scripts/train_triage_model.py --data turnos.jsonl --eval rotulos_manuais.jsonl
+    python scripts/train_triage_model.py --data turnos.jsonl --output /tmp/modelo.json.gz
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+# Garante que o projeto está no path (para rodar de qualquer diretório)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.core.triage_model import DEFAULT_MODEL_PATH, TriageModel, load_examples, train
+
+# Rotulados a mao (nao pelo LLM): (texto, etapa do trial, intents)
+_HAND_LABELLED = [
+    ("oi", None, ["general"]),
+    ("bom dia!", None, ["general"]),
+    ("obrigado pela ajuda", None, ["general"]),
+    ("tchau, ate terça", "booked", ["general"]),
+    ("kkkk beleza", None, ["general"]),
+    ("vocês vendem camisa do flamengo?", None, ["general"]),
+    ("quero agendar uma aula experimental", None, ["trial"]),
+    ("queria experimentar o beach tennis", None, ["trial"]),
+    ("dá pra marcar uma aula teste pra mim?", None, ["trial"]),
+    ("quero fazer a primeira aula terça", None, ["trial"]),
+    ("sim", "awaiting_confirmation", ["trial"]),
+    ("não, prefiro outro horário", "awaiting_confirmation", ["trial"]),
+    ("18-02 às 15h", "ask_date", ["trial"]),
+    ("terça que vem de manhã", "ask_date", ["trial"]),
+    ("me chamo Carla, 34 anos, iniciante", "collect_client_info", ["trial"]),
+    ("nunca joguei", "collect_client_info", ["trial"]),
+    ("desisto, deixa pra lá", "ask_date", ["trial"]),
+    ("onde fica o CT?", None, ["faq"]),
+    ("quanto custa a mensalidade?", None, ["faq"]),
+    ("quais os planos da noite?", None, ["faq"]),
+    ("tem estacionamento?", None, ["faq"]),
+    ("preciso levar raquete na aula experimental?", None, ["faq"]),
+    ("a aula experimental é paga?", None, ["faq"]),
+    ("vocês abrem no sábado?", None, ["faq"]),
+    ("tem aula pra criança?", None, ["faq"]),
+    ("posso alugar quadra sem ser aluno?", None, ["faq"]),
+    ("qual o endereço?", "ask_date", ["faq"]),
+    ("quero agendar e onde fica?", None, ["trial", "faq"]),
+    ("quero marcar a aula teste, quanto custa depois o plano?", None, ["trial", "faq"]),
+    ("18-02 às 9h, e tem vestiário?", "ask_date", ["trial", "faq"]),
+    ("sim! precisa levar raquete?", "awaiting_confirmation", ["trial", "faq"]),
+    ("queria experimentar, qual horário da experimental?", None, ["trial", "faq"]),
+]
+
+
+def hand_labelled() -> list[dict]:
+    return [{"text": text, "stage": stage, "intents": intents} for text, stage, intents in _HAND_LABELLED]
+
+
+def _percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _report(name: str, hits: int, total: int, latencies: list[float]) -> None:
+    acc = hits / total if total else 0.0
+    print(
+        f"  {name:<6} acc={acc:.3f} ({hits}/{total})  "
+        f"lat_avg={statistics.mean(latencies) * 1000:.3f}ms  "
+        f"lat_p95={_percentile(latencies, 0.95) * 1000:.3f}ms"
+    )
+
+
+def evaluate_model(model: TriageModel, test: list[dict], name: str = "model") -> None:
+    hits, latencies = 0, []
+    for ex in test:
+        start = time.perf_counter()
+        intents, _ = model.predict(ex["text"], ex.get("stage"))
+        latencies.append(time.perf_counter() - start)
+        hits += set(intents) == set(ex["intents"])
+    _report(name, hits, len(test), latencies)
+
+
+def evaluate_llm(test: list[dict]) -> None:
+    """Roda o classificador LLM atual (chamadas reais) no mesmo conjunto de teste."""
+    from app.core.triage import _classify_intent
+
+    hits, latencies = 0, []
+    for ex in test:
+        stage = ex.get("stage")
+        context = None
+        if stage and stage not in ("booked", "cancelled"):
+            context = f"Cliente esta no meio de um agendamento de aula experimental (etapa: {stage})"
+        start = time.perf_counter()
+        result = _classify_intent(ex["text"], context)
+        latencies.append(time.perf_counter() - start)
+        hits += set(result.intents) == set(ex["intents"])
+    _report("llm", hits, len(test), latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Treina o modelo local de intencao do triage")
+    parser.add_argument("--data", required=True, help="Dataset JSONL de turnos rotulados")
+    parser.add_argument("--output", "-o", default=str(DEFAULT_MODEL_PATH),
+                        help="Caminho do artefato (.json.gz)")
+    parser.add_argument("--test-split", type=float, default=0.2,
+                        help="Fracao do dataset reservada pra avaliacao")
+    parser.add_argument("--epochs", type=int, default=40)
+    parser.add_argument("--min-df", type=int, default=1,
+                        help="Frequencia minima de documento pra entrar no vocabulario")
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--eval", default=None,
+                        help="JSONL rotulado a mao pra acuracia (default: _HAND_LABELLED deste script)")
+    parser.add_argument("--compare-llm", action="store_true",
+                        help="Tambem roda o LLM nos rotulos manuais (chamadas reais)")
+    args = parser.parse_args()
+
+    examples = load_examples(args.data)
+    random.Random(args.seed).shuffle(examples)
+    n_test = int(len(examples) * args.test_split)
+    test, train_set = examples[:n_test], examples[n_test:]
+    print(f"Exemplos: {len(examples)} (treino={len(train_set)}, teste={len(test)})")
+
+    start = time.perf_counter()
+    model = train(train_set, min_df=args.min_df, epochs=args.epochs, seed=args.seed)
+    print(f"Treino: {time.perf_counter() - start:.2f}s, vocabulario={len(model.vocab)}")
+
+    path = model.save(args.output)
+    print(f"Artefato salvo em: {path} ({path.stat().st_size / 1024:.1f} KiB)")
+
+    model = TriageModel.load(path)
+    if test:
+        print("\nConcordancia com o LLM (teste separado do dataset logado; rotulos do proprio LLM):")
+        evaluate_model(model, test)
+
+    manual = load_examples(args.eval) if args.eval else hand_labelled()
+    print(f"\nAcuracia em rotulos manuais ({len(manual)} exemplos; conjunto de intents identico):")
+    evaluate_model(model, manual)
+    if args.compare_llm:
+        evaluate_llm(manual)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+warm_nlg_cache.py — Pré-aquece o cache de templates da NLG do trial (offline).
+
+Gera, com o LLM de NLG (get_llm("nlg")), uma mensagem para cada plano de
+resposta conhecido dos nós do trial (stage, action, error_code,
+missing_fields), com um snapshot sintético, converte em template e grava o
+JSON que o webhook carrega via TRIAL_NLG_CACHE_FILE (ver nlg_cache.py).
+
+Revise o arquivo antes de usar em produção: é o texto que o cliente recebe.
+
+Uso:
+    python scripts/warm_nlg_cache.py --out nlg_templates.json
+    TRIAL_NLG_CACHE_FILE=nlg_templates.json uvicorn app.server.webhook:app   # + trial_nlg_mode=cached
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from itertools import combinations
+
+# Garante que o projeto está no path (para rodar de qualquer diretório)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.agents.aula_experimental.nodes import REQUIRED_CLIENT_FIELDS
+from app.agents.aula_experimental.utils_trial.get_llm import get_llm
+from app.agents.aula_experimental.utils_trial.nlg import generate_trial_message
+from app.agents.aula_experimental.utils_trial.nlg_cache import NLGTemplateCache
+from app.core.datetime_utils import get_current_context
+
+# Erros do validate_date_time que os nós mandam pra NLG (missing_date não é cacheável)
+_DATE_ERRORS = ("invalid_date_format", "not_tuesday", "past_date", "missing_time",
+                "invalid_time_format", "time_out_of_range")
+
+
+def _plans() -> list[dict]:
+    plans = []
+    for n in range(1, len(REQUIRED_CLIENT_FIELDS) + 1):
+        for missing in combinations(REQUIRED_CLIENT_FIELDS, n):
+            plans.append({"stage": "collect_client_info", "action": "ask_missing_client_fields",
+                          "missing_fields": list(missing)})
+    for code in _DATE_ERRORS:
+        plans.append({"stage": "ask_date", "action": "ask_date_time", "error_code": code})
+    plans += [
+        {"stage": "ask_date", "action": "ask_date_time"},   # cliente disse "não" na confirmação
+        {"stage": "awaiting_confirmation", "action": "ask_confirmation"},
+        {"stage": "book", "action": "book_start"},
+        {"stage": "cancelled", "action": "cancel_confirmed"},
+    ]
+    return plans
+
+
+def _snapshot(plan: dict) -> dict:
+    """Snapshot sintético coerente com o plano (campos faltantes/inválidos ficam vazios)."""
+    snapshot = {"nome": "Ana", "idade": 28, "nivel": "iniciante",
+                "desired_date": get_current_context()["next_tuesdays"][1], "desired_time": "09:00"}
+    for field in plan.get("missing_fields") or []:
+        snapshot[field] = None
+    code = plan.get("error_code")
+    if code in ("invalid_date_format", "not_tuesday", "past_date"):
+        snapshot["desired_date"] = snapshot["desired_time"] = None
+    elif code in ("missing_time", "invalid_time_format", "time_out_of_range"):
+        snapshot["desired_time"] = None
+    return {**snapshot, "stage": plan["stage"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pré-aquece o cache de templates da NLG do trial")
+    parser.add_argument("--out", default="nlg_templates.json")
+    args = parser.parse_args()
+
+    llm = get_llm("nlg")
+    cache = NLGTemplateCache(ttl_seconds=None)
+    plans = _plans()
+    for plan in plans:
+        snapshot = _snapshot(plan)
+        text = generate_trial_message(llm, trial_snapshot=snapshot, **plan)
+        ok = cache.learn(text, trial_snapshot=snapshot, **plan)
+        print(f"  {'ok ' if ok else '-- '} {plan['stage']}/{plan['action']} {plan.get('error_code') or ''} "
+              f"{','.join(plan.get('missing_fields') or [])}")
+    n = cache.dump(args.out)
+    print(f"{n}/{len(plans)} templates gravados em {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -155,19 +155,18 @@ SCENARIOS = [
         "metadata": {"scenario": "rejection_then_rebook"},
     },
 
-    # ---- 7. Tudo em uma mensagem (nome+idade+nivel) → data/horário no próximo turno ----
-    # O grafo roda 1 nó por invocação: collect_client_info extrai dados pessoais e avança pra ask_date.
-    # A data/horário só é processada no turno seguinte por trial_ask_date.
+    # ---- 7. Tudo em uma mensagem (nome+idade+nivel+data/horário) ----
+    # collect_client_info avança pra ask_date e, como a mesma extração já trouxe
+    # data/horário, o step de ask_date roda no mesmo turno (avanço em cadeia).
     {
         "inputs": {
             "turns": [
                 "Sou Lucas, 22, iniciante, quero terça que vem às 14h",
-                "Terça que vem às 14h",
             ]
         },
         "outputs": {
             "expected_final_stage": "awaiting_confirmation",
-            "expected_stages": ["ask_date", "awaiting_confirmation"],
+            "expected_stages": ["awaiting_confirmation"],
             "expected_fields": {"nome": "Lucas", "desired_time": "14:00"},
             "expected_fields_absent": [],
         },
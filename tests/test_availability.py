@@ -0,0 +1,94 @@
+"""Testes do índice de ocupação dos horários (utils_trial/availability.py)."""
+from __future__ import annotations
+
+import asyncio
+import threading
+
+from app.agents.aula_experimental.utils_trial.availability import SlotIndex
+
+SLOT = ("17-02", "09:00")
+
+
+class StubIndex(SlotIndex):
+    """SlotIndex com a query do banco trocada por uma função."""
+
+    def __init__(self, load, **kwargs):
+        super().__init__(**kwargs)
+        self._stub_load = load
+        self.loads = 0
+
+    def _load(self):
+        self.loads += 1
+        return self._stub_load()
+
+
+def test_reserve_respects_capacity():
+    index = StubIndex(lambda: {SLOT: 2}, capacity=3)
+    assert index.reserve(*SLOT)
+    assert not index.reserve(*SLOT)               # 2 no banco + 1 em voo
+    assert index.is_full(*SLOT)
+    index.release(*SLOT)
+    assert not index.is_full(*SLOT)
+
+
+def test_concurrent_reservations_never_exceed_capacity():
+    index = StubIndex(dict, capacity=4)
+    results = []
+    barrier = threading.Barrier(20)
+
+    def worker():
+        barrier.wait()
+        results.append(index.reserve(*SLOT))
+
+    threads = [threading.Thread(target=worker) for _ in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results.count(True) == 4
+
+
+def test_inflight_survives_reload_after_write():
+    rows = {SLOT: 0}
+    index = StubIndex(lambda: dict(rows), capacity=2)
+    assert index.reserve(*SLOT)                   # A: INSERT em andamento
+    assert index.reserve(*SLOT)                   # B: INSERT em andamento
+    rows[SLOT] = 1                                # A gravou
+    index.record_booking(*SLOT)
+    index.release(*SLOT)
+    assert index.is_full(*SLOT)                   # recarregou: 1 no banco + B em voo
+
+
+def test_reload_crossing_a_write_is_discarded():
+    index = StubIndex(dict, capacity=4)
+
+    def load_with_concurrent_write():
+        index.record_booking(*SLOT)               # escrita enquanto a query roda
+        return {}
+
+    index._stub_load = load_with_concurrent_write
+    assert index.booked(*SLOT) == 1
+
+
+def test_database_error_is_not_full_and_logged(caplog):
+    def broken():
+        raise ConnectionError("banco fora")
+
+    index = StubIndex(broken, capacity=1)
+    with caplog.at_level("ERROR"):
+        assert not index.is_full(*SLOT)
+        assert index.reserve(*SLOT)
+    assert "falha recarregando" in caplog.text
+    assert index.loads == 1                       # não repete a query a cada leitura
+
+
+def test_aensure_fresh_loads_off_the_event_loop():
+    seen = []
+    index = StubIndex(lambda: seen.append(threading.current_thread()) or {})
+
+    async def main():
+        await index.aensure_fresh()
+        await index.aensure_fresh()               # já fresco: não recarrega
+
+    asyncio.run(main())
+    assert index.loads == 1 and seen[0] is not threading.main_thread()
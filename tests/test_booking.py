@@ -0,0 +1,81 @@
+"""Testes do upsert de reservas (utils_trial/booking.py) num SQLite temporário."""
+from __future__ import annotations
+
+import pytest
+from sqlalchemy import text
+
+from app.agents.aula_experimental.utils_trial.availability import SLOT_INDEX
+from app.agents.aula_experimental.utils_trial.booking import (
+    BOOKING_STATUS,
+    booking_key,
+    booking_row,
+    cancel_trial_booking,
+    create_trial_booking,
+    desired_datetime_for,
+    insert_bookings_batch,
+)
+from app.tools.database import get_session, reset_engines
+
+SLOT = {"desired_date": "17-02", "desired_time": "09:00"}
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'test.db'}")
+    reset_engines()
+    BOOKING_STATUS.clear()
+    SLOT_INDEX.invalidate()
+    with get_session() as session:
+        session.execute(text("""
+            CREATE TABLE trial_class_booking (
+                id text PRIMARY KEY, customer_id text NOT NULL, desired_datetime timestamp NOT NULL,
+                status text NOT NULL DEFAULT 'pending', UNIQUE (customer_id, desired_datetime)
+            )
+        """))
+    yield
+    BOOKING_STATUS.clear()
+    reset_engines()
+
+
+def _rows():
+    with get_session() as session:
+        return session.execute(text("SELECT id, status FROM trial_class_booking")).all()
+
+
+def test_retry_returns_same_booking(db):
+    first = create_trial_booking(customer_id="c1", **SLOT)
+    assert first == booking_key("c1", desired_datetime_for(**SLOT))
+    BOOKING_STATUS.clear()                        # força o upsert no banco
+    assert create_trial_booking(customer_id="c1", **SLOT) == first
+    assert [(r.id, r.status) for r in _rows()] == [(first, "pending")]
+
+
+def test_rebook_after_cancel_reactivates_row(db):
+    first = create_trial_booking(customer_id="c1", **SLOT)
+    assert cancel_trial_booking(customer_id="c1", **SLOT) == first
+    assert [r.status for r in _rows()] == ["cancelled"]
+    # cancelar tirou do cache: a remarcação vai ao banco e reativa a reserva
+    assert create_trial_booking(customer_id="c1", **SLOT) == first
+    assert [r.status for r in _rows()] == ["pending"]
+
+
+def test_cancel_without_active_booking(db):
+    assert cancel_trial_booking(customer_id="c1", **SLOT) is None
+
+
+def test_batch_insert_reactivates_cancelled_row(db):
+    first = create_trial_booking(customer_id="c1", **SLOT)
+    cancel_trial_booking(customer_id="c1", **SLOT)
+    row = booking_row("c1", **SLOT)
+    assert row["id"] == first                     # mesmo id em qualquer caminho
+    insert_bookings_batch([row])
+    insert_bookings_batch([row])                  # idempotente
+    assert [(r.id, r.status) for r in _rows()] == [(first, "pending")]
+
+
+def test_sync_after_batch_returns_batch_id(db):
+    row = booking_row("c1", **SLOT)
+    insert_bookings_batch([row])
+    assert create_trial_booking(customer_id="c1", **SLOT) == row["id"]
+    assert [(r.id, r.status) for r in _rows()] == [(row["id"], "pending")]
+
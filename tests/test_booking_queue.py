@@ -0,0 +1,151 @@
+"""Testes da fila write-behind de reservas (utils_trial/booking_queue.py)."""
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from app.agents.aula_experimental.utils_trial import booking_queue
+from app.agents.aula_experimental.utils_trial.booking import (
+    BOOKING_STATUS,
+    booking_key,
+    cancel_trial_booking,
+    create_trial_booking,
+    desired_datetime_for,
+)
+from app.agents.aula_experimental.utils_trial.booking_queue import BookingWriteBehind
+from tests.test_booking import _rows, db  # noqa: F401  (fixture: SQLite temporário)
+
+BAD_CUSTOMER = "cliente-sem-fk"
+
+
+class FakeTable:
+    """insert_bookings_batch fake: lote numa transação, falha se tiver linha ruim."""
+
+    def __init__(self, down: bool = False):
+        self.rows = {}
+        self.calls = []
+        self.down = down
+
+    def insert(self, rows):
+        self.calls.append(len(rows))
+        if self.down:
+            raise ConnectionError("banco fora")
+        if any(r["customer_id"] == BAD_CUSTOMER for r in rows):
+            raise ValueError("violates foreign key constraint")
+        for r in rows:
+            self.rows.setdefault(r["id"], r)
+
+
+@pytest.fixture
+def table(monkeypatch):
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    BOOKING_STATUS.clear()
+    fake = FakeTable()
+    monkeypatch.setattr(booking_queue, "insert_bookings_batch", fake.insert)
+    return fake
+
+
+def _submit(writer, customer_id, desired_date="17-02", desired_time="09:00"):
+    return writer.submit(customer_id=customer_id, desired_date=desired_date, desired_time=desired_time)
+
+
+def test_submit_is_idempotent(table):
+    writer = BookingWriteBehind(flush_ms=10_000)
+    first = _submit(writer, "c1")
+    assert _submit(writer, "c1") == first
+    assert first == booking_key("c1", desired_datetime_for("17-02", "09:00"))
+    assert writer.snapshot()["pending"] == 1
+    writer.close()
+    assert list(table.rows) == [first]
+
+
+def test_flush_in_batches(table):
+    writer = BookingWriteBehind(batch_size=2, flush_ms=10_000)
+    for i in range(5):
+        _submit(writer, f"c{i}")
+    assert writer.flush() == 5
+    assert table.calls == [2, 2, 1]
+    snap = writer.snapshot()
+    assert (snap["pending"], snap["written"], snap["batches"]) == (0, 5, 3)
+    writer.close()
+
+
+def test_bad_row_does_not_sink_the_batch(table):
+    writer = BookingWriteBehind(batch_size=10, flush_ms=10_000, max_attempts=3)
+    good = [_submit(writer, f"c{i}") for i in range(3)]
+    _submit(writer, BAD_CUSTOMER)
+    assert writer.flush() == 3
+    assert set(table.rows) == set(good)
+    assert writer.snapshot()["pending"] == 1      # só a linha ruim volta pra fila
+    writer.close()
+
+
+def test_failed_row_goes_to_dead_letter(table, tmp_path):
+    path = tmp_path / "dead.jsonl"
+    writer = BookingWriteBehind(flush_ms=10_000, max_attempts=2, dead_letter_path=str(path))
+    bad = _submit(writer, BAD_CUSTOMER)
+    writer.flush()
+    assert writer.snapshot()["pending"] == 1 and writer.snapshot()["dropped"] == 0
+    writer.flush()
+    snap = writer.snapshot()
+    assert (snap["pending"], snap["dropped"]) == (0, 1)
+    [entry] = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert entry["id"] == bad and entry["customer_id"] == BAD_CUSTOMER
+    assert "foreign key" in entry["error"]
+    assert list(writer.dead_letters) == [entry]
+    writer.close()
+
+
+def test_database_down_keeps_rows_until_max_attempts(table):
+    table.down = True
+    writer = BookingWriteBehind(flush_ms=10_000, max_attempts=3)
+    _submit(writer, "c1")
+    _submit(writer, "c2")
+    writer.flush()
+    writer.flush()
+    assert writer.snapshot()["pending"] == 2
+    table.down = False
+    assert writer.flush() == 2
+    assert writer.snapshot()["dropped"] == 0
+    writer.close()
+
+
+def test_reserved_slot_is_released_after_flush(table, monkeypatch):
+    released = []
+    monkeypatch.setattr(booking_queue.SLOT_INDEX, "release", lambda d, t: released.append((d, t)))
+    writer = BookingWriteBehind(flush_ms=10_000)
+    writer.submit(customer_id="c1", desired_date="17-02", desired_time="09:00", reserved=True)
+    writer.submit(customer_id="c1", desired_date="17-02", desired_time="09:00", reserved=True)   # duplicada: libera já
+    assert released == [("17-02", "09:00")]
+    writer.flush()
+    assert released == [("17-02", "09:00")] * 2
+    writer.close()
+
+
+def test_flushed_booking_is_cached(table):
+    writer = BookingWriteBehind(flush_ms=10_000)
+    booking_id = _submit(writer, "c1")
+    assert BOOKING_STATUS.get("c1", desired_datetime_for("17-02", "09:00")) is None
+    writer.flush()
+    assert BOOKING_STATUS.get("c1", desired_datetime_for("17-02", "09:00")) == booking_id
+    writer.close()
+
+
+def test_write_behind_after_sync_write_keeps_id(db):
+    first = create_trial_booking(customer_id="c1", desired_date="17-02", desired_time="09:00")
+    BOOKING_STATUS.clear()                        # outro processo: só o banco sabe
+    writer = BookingWriteBehind(flush_ms=10_000)
+    assert _submit(writer, "c1") == first
+    writer.close()
+    assert [(r.id, r.status) for r in _rows()] == [(first, "pending")]
+
+
+def test_write_behind_after_cancel_reactivates_same_id(db):
+    first = create_trial_booking(customer_id="c1", desired_date="17-02", desired_time="09:00")
+    cancel_trial_booking(customer_id="c1", desired_date="17-02", desired_time="09:00")
+    writer = BookingWriteBehind(flush_ms=10_000)
+    assert _submit(writer, "c1") == first
+    writer.close()
+    assert [(r.id, r.status) for r in _rows()] == [(first, "pending")]
+    assert BOOKING_STATUS.get("c1", desired_datetime_for("17-02", "09:00")) == first
@@ -0,0 +1,106 @@
+"""Testes do orçamento de latência por turno (app/core/budget.py) e do corte no merge."""
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+
+from langchain_core.messages import AIMessageChunk
+
+from app.core import budget, merge
+from app.core.budget import CommitPoint, acall_with_budget, call_with_budget
+
+
+def _state(seconds: float) -> dict:
+    return {"turn_deadline": time.time() + seconds}
+
+
+def test_commit_point_first_wins():
+    point = CommitPoint()
+    assert point.commit() and point.commit()
+    assert not point.abandon()
+    late = CommitPoint()
+    assert late.abandon() and not late.commit()
+
+
+def test_sync_call_after_commit_is_not_cut():
+    commit = CommitPoint()
+
+    def stream():
+        commit.commit()
+        time.sleep(0.5)
+        return "texto completo"
+
+    assert call_with_budget(_state(0.35), "merge", stream, fallback=None, commit=commit) == "texto completo"
+
+
+def test_async_call_after_commit_is_not_cut():
+    commit = CommitPoint()
+
+    async def stream():
+        commit.commit()
+        await asyncio.sleep(0.5)
+        return "texto completo"
+
+    assert asyncio.run(acall_with_budget(_state(0.35), "merge", stream, commit=commit)) == "texto completo"
+
+
+def test_saturated_pool_degrades_without_queueing(monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(budget, "_MAX_ABANDONED", 2)
+    for _ in range(2):
+        assert call_with_budget(_state(0.35), "faq", release.wait, fallback="fb") == "fb"
+    calls = []
+    assert call_with_budget(_state(5), "faq", calls.append, 1, fallback="fb") == "fb"
+    assert calls == []
+    release.set()
+    deadline = time.monotonic() + 2
+    while budget._pool_saturated() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert call_with_budget(_state(5), "faq", calls.append, 1, fallback="fb") is None and calls == [1]
+
+
+class SlowLLM:
+    """LLM fake: primeiro chunk depois de `first_delay`, depois um chunk a cada `gap`."""
+
+    def __init__(self, first_delay: float, gap: float = 0.0):
+        self.first_delay = first_delay
+        self.gap = gap
+
+    def stream(self, _messages):
+        time.sleep(self.first_delay)
+        for word in ("Olá, ", "tudo ", "certo!"):
+            yield AIMessageChunk(content=word)
+            time.sleep(self.gap)
+
+    async def astream(self, _messages):
+        await asyncio.sleep(self.first_delay)
+        for word in ("Olá, ", "tudo ", "certo!"):
+            yield AIMessageChunk(content=word)
+            await asyncio.sleep(self.gap)
+
+
+def _run_merge(monkeypatch, llm, run_async: bool):
+    sent = []
+    monkeypatch.setattr(merge, "get_llm", lambda role, config: llm)
+    monkeypatch.setattr(merge, "get_delta_writer", lambda: sent.append)
+    state = {"specialists_outputs": {"faq": "resposta faq", "trial": "resposta trial"}, "messages": [],
+             **_state(0.4)}
+    if run_async:
+        result = asyncio.run(merge.amerge(state, {}))
+    else:
+        result = merge.merge(state, {})
+    return result["final_answer"], sent
+
+
+def test_merge_deadline_before_first_delta_uses_template(monkeypatch):
+    for run_async in (False, True):
+        final, sent = _run_merge(monkeypatch, SlowLLM(first_delay=0.8), run_async)
+        assert final == "resposta faq\n\nresposta trial"
+        assert sent == [final]
+
+
+def test_merge_deadline_mid_stream_keeps_streamed_text(monkeypatch):
+    for run_async in (False, True):
+        final, sent = _run_merge(monkeypatch, SlowLLM(first_delay=0.0, gap=0.3), run_async)
+        assert final == "Olá, tudo certo!" == "".join(sent)
@@ -0,0 +1,96 @@
+"""Testes do checkpointer SQLAlchemy (app/tools/checkpointer.py) num SQLite temporário."""
+from __future__ import annotations
+
+import operator
+from typing import Annotated
+
+from langgraph.graph import END, START, StateGraph
+from sqlalchemy import create_engine, func, select, text
+from typing_extensions import TypedDict
+
+from app.tools import checkpointer as ckpt
+from app.tools.checkpointer import SQLCheckpointSaver, blobs_table, checkpoints_table, writes_table
+
+
+class Counter(TypedDict):
+    total: int
+    seen: Annotated[list, operator.add]
+
+
+def _graph(saver):
+    g = StateGraph(Counter)
+    g.add_node("step", lambda s: {"total": s.get("total", 0) + 1, "seen": [s.get("total", 0)]})
+    g.add_edge(START, "step")
+    g.add_edge("step", END)
+    return g.compile(checkpointer=saver)
+
+
+def _count(engine, table, thread_id="t1"):
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(table).where(table.c.thread_id == thread_id)).scalar_one()
+
+
+def _engine(tmp_path):
+    return create_engine(f"sqlite:///{tmp_path / 'ckpt.sqlite'}")
+
+
+def test_metadata_roundtrip_with_type(tmp_path):
+    engine = _engine(tmp_path)
+    graph = _graph(SQLCheckpointSaver(engine, keep_last=0))
+    cfg = {"configurable": {"thread_id": "t1"}}
+    graph.invoke({"total": 0}, cfg)
+    state = graph.get_state(cfg)
+    assert state.values["total"] == 1 and state.metadata["source"] == "loop"
+    with engine.connect() as conn:
+        types = set(conn.execute(select(checkpoints_table.c.metadata_type)).scalars())
+    assert types == {"msgpack"}
+
+
+def test_old_table_without_metadata_type_is_migrated(tmp_path):
+    engine = _engine(tmp_path)
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE checkpoint (
+                thread_id VARCHAR, checkpoint_ns VARCHAR, checkpoint_id VARCHAR, parent_checkpoint_id VARCHAR,
+                type VARCHAR NOT NULL, checkpoint BLOB NOT NULL, metadata BLOB NOT NULL,
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+            )
+        """))
+    graph = _graph(SQLCheckpointSaver(engine, keep_last=0))
+    cfg = {"configurable": {"thread_id": "t1"}}
+    graph.invoke({"total": 0}, cfg)
+    with engine.begin() as conn:   # linha antiga: metadata_type NULL = msgpack
+        conn.execute(text("UPDATE checkpoint SET metadata_type = NULL"))
+    assert graph.get_state(cfg).metadata["source"] == "loop"
+
+
+def test_put_prunes_old_checkpoints(tmp_path, monkeypatch):
+    monkeypatch.setattr(ckpt, "_PRUNE_SLACK", 2)
+    engine = _engine(tmp_path)
+    graph = _graph(SQLCheckpointSaver(engine, keep_last=4))
+    cfg = {"configurable": {"thread_id": "t1"}}
+    for _ in range(10):
+        graph.invoke({}, cfg)
+    assert _count(engine, checkpoints_table) <= 4 + 2
+    state = graph.get_state(cfg)
+    assert state.values["total"] == 10 and state.values["seen"] == list(range(10))
+    # só os blobs que os checkpoints restantes usam (+ writes só deles)
+    assert _count(engine, blobs_table) <= 3 * (4 + 2)
+    with engine.connect() as conn:
+        kept = set(conn.execute(select(checkpoints_table.c.checkpoint_id)).scalars())
+        written = set(conn.execute(select(writes_table.c.checkpoint_id)).scalars())
+    assert written <= kept
+
+
+def test_prune_all_threads(tmp_path):
+    engine = _engine(tmp_path)
+    saver = SQLCheckpointSaver(engine, keep_last=0)
+    graph = _graph(saver)
+    for thread_id in ("t1", "t2"):
+        for _ in range(5):
+            graph.invoke({}, {"configurable": {"thread_id": thread_id}})
+    deleted = saver.prune(keep_last=3)
+    assert deleted > 0
+    for thread_id in ("t1", "t2"):
+        assert _count(engine, checkpoints_table, thread_id) == 3
+        assert graph.get_state({"configurable": {"thread_id": thread_id}}).values["total"] == 5
@@ -0,0 +1,98 @@
+"""Testes do ThreadDispatcher (app/server/dispatcher.py)."""
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from app.server.dispatcher import QueueFullError, ThreadDispatcher
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_fifo_per_thread_and_parallel_threads():
+    running: dict = {}
+    order: list = []
+    overlap = []
+
+    async def handler(thread_id, payloads):
+        running[thread_id] = running.get(thread_id, 0) + 1
+        overlap.append(running[thread_id])
+        await asyncio.sleep(0.01)
+        order.append((thread_id, payloads))
+        running[thread_id] -= 1
+        return payloads[-1].upper()
+
+    async def main():
+        dispatcher = ThreadDispatcher(handler, workers=4)
+        await dispatcher.start()
+        futures = [dispatcher.submit(t, f"{t}{i}") for i in range(3) for t in ("a", "b")]
+        results = await asyncio.gather(*futures)
+        await dispatcher.stop()
+        return results, dispatcher.snapshot()
+
+    results, snap = _run(main())
+    assert results == ["A0", "B0", "A1", "B1", "A2", "B2"]
+    assert [p for t, p in order if t == "a"] == [["a0"], ["a1"], ["a2"]]
+    assert max(overlap) == 1                      # nunca dois turnos da mesma conversa juntos
+    assert snap["processed"] == 6 and snap["pending"] == 0
+
+
+def test_backpressure_rejects_above_max_pending():
+    async def handler(thread_id, payloads):
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    async def main():
+        dispatcher = ThreadDispatcher(handler, workers=1, max_pending=2)
+        await dispatcher.start()
+        dispatcher.submit("a", 1)
+        dispatcher.submit("b", 2)
+        with pytest.raises(QueueFullError):
+            dispatcher.submit("c", 3)
+        snap = dispatcher.snapshot()
+        await dispatcher.stop()
+        return snap
+
+    assert _run(main())["rejected"] == 1
+
+
+def test_coalesces_burst_into_one_turn():
+    calls = []
+
+    async def handler(thread_id, payloads):
+        calls.append(payloads)
+        return " / ".join(payloads)
+
+    async def main():
+        dispatcher = ThreadDispatcher(handler, workers=2, coalesce_window=0.05)
+        await dispatcher.start()
+        futures = [dispatcher.submit("a", text) for text in ("oi", "quero marcar", "sou o João")]
+        results = await asyncio.gather(*futures)
+        await dispatcher.stop()
+        return results
+
+    assert _run(main()) == [None, None, "oi / quero marcar / sou o João"]
+    assert calls == [["oi", "quero marcar", "sou o João"]]
+
+
+def test_failed_turn_does_not_stop_the_worker():
+    async def handler(thread_id, payloads):
+        if payloads == ["boom"]:
+            raise RuntimeError("falhou")
+        return "ok"
+
+    async def main():
+        dispatcher = ThreadDispatcher(handler, workers=1)
+        await dispatcher.start()
+        bad = dispatcher.submit("a", "boom")
+        good = dispatcher.submit("a", "oi")
+        results = await asyncio.gather(bad, good, return_exceptions=True)
+        await dispatcher.stop()
+        return results, dispatcher.snapshot()
+
+    (bad, good), snap = _run(main())
+    assert isinstance(bad, RuntimeError) and good == "ok"
+    assert (snap["failed"], snap["processed"]) == (1, 1)
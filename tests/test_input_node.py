@@ -0,0 +1,37 @@
+"""Testes do input_node (app/core/graph.py): coalescência e mensagens já lidas."""
+from __future__ import annotations
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.core.graph import input_node
+
+
+def _human(text, id_):
+    return HumanMessage(content=text, id=id_)
+
+
+def test_coalesces_burst_after_last_reply():
+    state = {"messages": [_human("oi", "h1"), AIMessage(content="olá", id="a1"),
+                          _human("quero marcar", "h2"), _human("sou o João", "h3")]}
+    out = input_node(state, {})
+    assert out["client_input"] == "quero marcar\nsou o João"
+    assert out["consumed_input_id"] == "h3"
+
+
+def test_message_from_failed_turn_is_not_read_again():
+    # turno anterior leu h1 e falhou antes de responder
+    state = {"messages": [_human("quero marcar", "h1"), _human("onde fica?", "h2")], "consumed_input_id": "h1"}
+    out = input_node(state, {})
+    assert out["client_input"] == "onde fica?"
+    assert out["consumed_input_id"] == "h2"
+
+
+def test_nothing_new_keeps_previous_input():
+    state = {"messages": [_human("oi", "h1")], "consumed_input_id": "h1", "client_input": "oi"}
+    assert "client_input" not in input_node(state, {})
+
+
+def test_consumed_message_removed_from_history():
+    # consumed_input_id foi compactado pelo memory: volta a parar na última resposta
+    state = {"messages": [AIMessage(content="olá", id="a1"), _human("sim", "h9")], "consumed_input_id": "h1"}
+    assert input_node(state, {})["client_input"] == "sim"
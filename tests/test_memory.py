@@ -0,0 +1,33 @@
+"""Testes do render do histórico com teto de tokens (app/core/memory.py)."""
+from __future__ import annotations
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.core.memory import cap_summary, estimate_tokens, format_history, history_max_tokens, history_window
+
+MESSAGES = [HumanMessage(content="oi " * 200), AIMessage(content="olá " * 200), HumanMessage(content="quero aula")]
+
+
+def test_cap_summary_cuts_on_word_boundary():
+    summary = "cliente João quer aula " * 100
+    capped = cap_summary(summary, 20)
+    assert capped.endswith("…") and len(capped) <= 20 * 4 + 1
+    assert capped[:-1].split()[-1] in summary.split()
+    assert cap_summary("curto", 20) == "curto"
+
+
+def test_history_window_fits_summary_and_window_in_budget():
+    summary, window = history_window(MESSAGES, "resumo " * 500, max_tokens=200)
+    assert estimate_tokens(summary) <= 101
+    assert window == [MESSAGES[-1]]
+    used = estimate_tokens(summary) + sum(estimate_tokens(m.content) for m in window)
+    assert used <= 200
+
+
+def test_configured_max_tokens_reaches_the_render():
+    small = {"configurable": {"memory_max_tokens": 80}}
+    large = {"configurable": {"memory_max_tokens": 5000}}
+    assert history_max_tokens(None) == 1200
+    short = format_history(MESSAGES, "", max_tokens=history_max_tokens(small), exclude_last=False)
+    full = format_history(MESSAGES, "", max_tokens=history_max_tokens(large), exclude_last=False)
+    assert "olá" not in short and "olá" in full
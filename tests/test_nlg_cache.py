@@ -0,0 +1,132 @@
+"""Testes do cache de templates da NLG do trial (utils_trial/nlg_cache.py)."""
+from __future__ import annotations
+
+import pytest
+
+from app.agents.aula_experimental.utils_trial import nlg_cache
+from app.agents.aula_experimental.utils_trial.nlg_cache import (
+    NLGTemplateCache,
+    fill,
+    nlg_key,
+    slot_values,
+    to_template,
+)
+
+ANA = {"nome": "Ana", "idade": 22, "nivel": "iniciante", "desired_date": "17-02", "desired_time": "09:00"}
+CARLOS = {"nome": "Carlos", "idade": 55, "nivel": "avancado", "desired_date": "24-02", "desired_time": "14:00"}
+PLAN = {"stage": "awaiting_confirmation", "action": "ask_confirmation"}
+
+
+# -------------------------
+# to_template / fill
+# -------------------------
+
+def test_to_template_replaces_client_values():
+    text = "Prazer, Ana! Com 22 anos e sendo iniciante, confirma terça 17-02 às 09:00?"
+    template = to_template(text, slot_values(ANA), ANA)
+    assert template == "Prazer, {nome}! Com {idade} anos e sendo {nivel}, confirma terça {date} às {time}?"
+    assert fill(template, slot_values(CARLOS)) == (
+        "Prazer, Carlos! Com 55 anos e sendo avancado, confirma terça 24-02 às 14:00?"
+    )
+
+
+def test_to_template_rejects_leftover_client_data():
+    # "Iniciante" com outra caixa/acento não vira placeholder: não pode ir pra outro cliente
+    text = "Oi Ana! Nível Iniciante anotado. Confirma 17-02 às 09:00?"
+    assert to_template(text, slot_values(ANA), ANA) is None
+
+
+def test_to_template_rejects_today():
+    assert to_template("Sua aula é hoje às 09:00!", slot_values(ANA), ANA) is None
+
+
+def test_to_template_escapes_braces():
+    template = to_template("Oi {Ana}", slot_values(ANA), ANA)
+    assert fill(template, slot_values(ANA)) == "Oi {Ana}"
+
+
+def test_fill_missing_slot_is_miss():
+    assert fill("Oi {nome}, confirma {date}?", {"nome": "Ana", "date": None}) is None
+    assert fill("Oi {desconhecido}", {"nome": "Ana"}) is None
+
+
+def test_nlg_key_uncacheable_errors():
+    assert nlg_key(stage="ask_date", action="ask_date_time", error_code="missing_date") is None
+    assert nlg_key(stage="ask_date", action="ask_date_time", error_code="slot_full") is None
+    assert nlg_key(stage="collect_client_info", action="ask", missing_fields=["nome", "idade"]) == (
+        "collect_client_info|ask||nome,idade"
+    )
+
+
+# -------------------------
+# learn / render
+# -------------------------
+
+def test_learn_refuses_text_generated_with_client_text():
+    cache = NLGTemplateCache()
+    text = "Prazer, Ana! Você comentou que trabalha até as 18h. Confirma 17-02 às 09:00?"
+    assert not cache.learn(text, trial_snapshot=ANA, client_text="trabalho ate as 18h", **PLAN)
+    assert cache.render(trial_snapshot=CARLOS, **PLAN) is None
+
+
+def test_learn_and_render_for_another_client():
+    cache = NLGTemplateCache()
+    assert cache.learn("Prazer, Ana! Confirma 17-02 às 09:00?", trial_snapshot=ANA, **PLAN)
+    assert cache.render(trial_snapshot=CARLOS, **PLAN) == "Prazer, Carlos! Confirma 24-02 às 14:00?"
+    assert cache.snapshot()["hits"] == 1
+
+
+def test_render_counts_miss_when_slot_absent():
+    cache = NLGTemplateCache()
+    cache.learn("Prazer, Ana! Confirma 17-02 às 09:00?", trial_snapshot=ANA, **PLAN)
+    assert cache.render(trial_snapshot={**CARLOS, "nome": None}, **PLAN) is None
+    snap = cache.snapshot()
+    assert (snap["hits"], snap["misses"]) == (0, 1)
+
+
+# -------------------------
+# TTL / LRU
+# -------------------------
+
+def test_ttl_expires_entries(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(nlg_cache.time, "time", lambda: clock[0])
+    cache = NLGTemplateCache(ttl_seconds=60)
+    cache.put("k", "template")
+    clock[0] += 59
+    assert cache.get("k") == "template"
+    clock[0] += 2
+    assert cache.get("k") is None
+    assert cache.snapshot()["expired"] == 1
+
+
+def test_put_without_ttl_never_expires(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(nlg_cache.time, "time", lambda: clock[0])
+    cache = NLGTemplateCache(ttl_seconds=60)
+    cache.put("k", "template", ttl_seconds=None)
+    clock[0] += 10 ** 6
+    assert cache.get("k") == "template"
+
+
+def test_lru_evicts_least_recently_used():
+    cache = NLGTemplateCache(max_size=2)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    assert cache.get("a") == "A"      # "a" passa a ser o mais recente
+    cache.put("c", "C")
+    assert cache.get("b") is None
+    assert cache.get("a") == "A" and cache.get("c") == "C"
+    assert cache.snapshot()["evictions"] == 1
+
+
+@pytest.mark.parametrize("ttl", [None, 3600])
+def test_dump_and_load_roundtrip(tmp_path, ttl):
+    cache = NLGTemplateCache()
+    cache.put("k1", "Oi {nome}")
+    cache.put("k2", "Confirma {date}?")
+    path = tmp_path / "templates.json"
+    assert cache.dump(str(path)) == 2
+    other = NLGTemplateCache()
+    assert other.load(str(path), ttl_seconds=ttl) == 2
+    assert other.get("k1") == "Oi {nome}"
@@ -0,0 +1,89 @@
+"""Testes do pré-extrator por regras do trial (utils_trial/rule_extractor.py)."""
+from __future__ import annotations
+
+import pytest
+
+from app.agents.aula_experimental.utils_trial.rule_extractor import rule_extract
+from app.core.datetime_utils import turn_clock
+
+MONDAY = "2026-02-09T10:00:00"      # segunda; próxima terça 10-02
+WEDNESDAY = "2026-02-11T10:00:00"   # quarta; próxima terça 17-02
+
+
+def _extract(text: str, stage: str, now: str = MONDAY):
+    with turn_clock({"turn_now": now}):
+        result = rule_extract(text, stage)
+    return None if result is None else result.model_dump(exclude_none=True)
+
+
+@pytest.mark.parametrize("text, expected", [
+    # datas explícitas
+    ("18-02 às 15h", {"desired_date": "18-02", "desired_time": "15:00"}),
+    ("17/02 15:30", {"desired_date": "17-02", "desired_time": "15:30"}),
+    ("dia 17 as 9h", {"desired_date": "17-02", "desired_time": "09:00"}),
+    ("dia 3 às 10h", {"desired_date": "03-03", "desired_time": "10:00"}),   # dia já passou no mês
+    ("amanhã às 8h", {"desired_date": "10-02", "desired_time": "08:00"}),
+    # terça relativa
+    ("terça às 9h", {"desired_date": "10-02", "desired_time": "09:00"}),
+    ("próxima terça 9h", {"desired_date": "10-02", "desired_time": "09:00"}),
+    ("terça que vem às 10", {"desired_date": "10-02", "desired_time": "10:00"}),
+    ("terça da semana que vem às 10h", {"desired_date": "17-02", "desired_time": "10:00"}),
+    # horários
+    ("3 da tarde", {"desired_time": "15:00"}),
+    ("às 9", {"desired_time": "09:00"}),
+    ("meio dia", {"desired_time": "12:00"}),
+    ("12 da noite", {"desired_time": "00:00"}),
+    ("meia noite", {"desired_time": "00:00"}),
+    ("8 da noite", {"desired_time": "20:00"}),
+    ("a partir das 18h", {"desired_time": "18:00"}),
+    ("a partir das 16", {"desired_time": "16:00"}),
+    # desistência
+    ("não quero mais", {"wants_to_cancel": True}),
+    ("cancela tudo", {"wants_to_cancel": True}),
+])
+def test_ask_date(text, expected):
+    assert _extract(text, "ask_date") == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("terça às 9h", {"desired_date": "17-02", "desired_time": "09:00"}),
+    ("terça da semana que vem às 9h", {"desired_date": "17-02", "desired_time": "09:00"}),
+])
+def test_relative_tuesday_midweek(text, expected):
+    assert _extract(text, "ask_date", WEDNESDAY) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "às 3",                                      # hora 1-6 sem período
+    "pode ser depois do trabalho?",              # resto ambíguo
+    "esquece o horario, pode ser 10h",           # "esquece" não é desistência
+    "cancela, pode ser 10h",                     # desistência + horário: composta
+    "32-02 às 10h",
+    "oi",
+])
+def test_ask_date_falls_back_to_llm(text):
+    assert _extract(text, "ask_date") is None
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("sim", {"confirmed": True}),
+    ("pode sim, confirmado", {"confirmed": True}),
+    ("não", {"confirmed": False}),
+    ("não, prefiro às 10h", {"confirmed": False, "desired_time": "10:00"}),
+    ("nao quero mais", {"wants_to_cancel": True}),
+])
+def test_awaiting_confirmation(text, expected):
+    assert _extract(text, "awaiting_confirmation") == expected
+
+
+@pytest.mark.parametrize("text", [
+    "sim, pode ser dia 25 as 10h",               # confirmação + nova data: revalida (LLM)
+    "sim às 10h",
+    "talvez",
+])
+def test_awaiting_confirmation_falls_back_to_llm(text):
+    assert _extract(text, "awaiting_confirmation") is None
+
+
+def test_other_stages_skip_rules():
+    assert _extract("18-02 às 15h", "collect_client_info") is None
@@ -0,0 +1,19 @@
+"""Testes dos contadores de streaming (app/core/streaming.py)."""
+from __future__ import annotations
+
+from app.core.streaming import StreamStats
+
+
+def test_ttft_average_ignores_turns_without_chunks():
+    stats = StreamStats()
+    stats.record(0.2, 1.0)
+    stats.record(None, 0.5)   # turno sem nenhum chunk (erro / resposta vazia)
+    stats.record(0.4, 1.5)
+    snap = stats.snapshot()
+    assert (snap["turns"], snap["ttft_turns"]) == (3, 2)
+    assert round(snap["ttft_avg_ms"]) == 300 and round(snap["ttft_max_ms"]) == 400
+    assert round(snap["duration_avg_ms"]) == 1000
+
+
+def test_empty_snapshot():
+    assert StreamStats().snapshot()["ttft_avg_ms"] == 0.0
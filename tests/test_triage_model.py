@@ -0,0 +1,51 @@
+"""Testes do backend de modelo local do triage (app/core/triage_model.py + triage._classify_model)."""
+from __future__ import annotations
+
+import pytest
+
+from app.core import triage
+from app.core.triage_model import train
+
+CONFIG = {"configurable": {"triage_backend": "model"}}
+
+
+class StubModel:
+    def __init__(self, intents, confidence=0.99):
+        self.intents = intents
+        self.confidence = confidence
+
+    def predict(self, text, stage=None):
+        return self.intents, self.confidence
+
+
+@pytest.mark.parametrize("text, response", [
+    ("obrigado!", "Por nada! Se precisar de algo mais, e so chamar."),
+    ("oi, tudo bem?", "Ola! Sou o assistente da CT Smash. Como posso te ajudar?"),
+])
+def test_model_general_with_canned_response(monkeypatch, text, response):
+    monkeypatch.setattr(triage, "get_triage_model", lambda: StubModel(["general"]))
+    result = triage._classify_model(text, None, CONFIG)
+    assert (result.intents, result.general_response) == (["general"], response)
+
+
+@pytest.mark.parametrize("text", ["oi, vocês vendem camisa?", "kkkk e o jogo ontem"])
+def test_model_general_without_canned_response_goes_to_llm(monkeypatch, text):
+    monkeypatch.setattr(triage, "get_triage_model", lambda: StubModel(["general"]))
+    assert triage._classify_model(text, None, CONFIG) is None
+
+
+def test_model_other_intents_do_not_need_text(monkeypatch):
+    monkeypatch.setattr(triage, "get_triage_model", lambda: StubModel(["faq"]))
+    assert triage._classify_model("tem estacionamento?", None, CONFIG).intents == ["faq"]
+
+
+def test_train_roundtrip(tmp_path):
+    examples = [
+        {"text": "quero agendar aula experimental", "intents": ["trial"]},
+        {"text": "onde fica o ct", "intents": ["faq"]},
+        {"text": "obrigado", "intents": ["general"]},
+    ] * 5
+    model = train(examples, seed=1)
+    assert model.predict("quero agendar uma aula")[0] == ["trial"]
+    path = model.save(tmp_path / "m.json.gz")
+    assert type(model).load(path).predict("onde fica")[0] == ["faq"]
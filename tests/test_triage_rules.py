@@ -0,0 +1,52 @@
+"""Testes do fast-path de regras do triage (app/core/triage_rules.py)."""
+from __future__ import annotations
+
+import pytest
+
+from app.agents.aula_experimental.utils_trial.fake_llm import FakeChatModel
+from app.core import triage
+from app.core.triage import _FASTPATH_THRESHOLD
+from app.core.triage_rules import FASTPATH_STATS, classify_by_rules
+
+
+@pytest.mark.parametrize("text, stage, intents, rule", [
+    ("oi", None, ["general"], "greeting"),
+    ("obrigado!", None, ["general"], "thanks"),
+    ("quero agendar uma aula experimental", None, ["trial"], "booking_request"),
+    ("sim", "awaiting_confirmation", ["trial"], "booking_short_reply"),
+    ("18-02 às 15h", "ask_date", ["trial"], "booking_date_time"),
+    ("onde fica o CT?", None, ["faq"], "faq_question"),
+    ("oi, quanto custa a mensalidade?", None, ["faq"], "faq_question"),
+    ("quais os valores dos planos?", None, ["faq"], "faq_question"),
+])
+def test_rule_passes_threshold(text, stage, intents, rule):
+    match = classify_by_rules(text, stage)
+    assert (match.intents, match.rule) == (intents, rule)
+    assert match.confidence >= _FASTPATH_THRESHOLD
+
+
+@pytest.mark.parametrize("text", [
+    "quanto custa a aula experimental?",   # pode ser trial + faq
+    "tem estacionamento terça às 9h?",
+    "me fala o endereco",                  # sem pergunta
+])
+def test_faq_keyword_stays_below_threshold(text):
+    match = classify_by_rules(text)
+    assert (match.intents, match.rule) == (["faq"], "faq_keyword")
+    assert match.confidence < _FASTPATH_THRESHOLD
+
+
+@pytest.mark.parametrize("text", ["isso me valoriza muito?", "qual o seu nome?"])
+def test_no_rule_for_partial_words(text):
+    assert classify_by_rules(text) is None
+
+
+def test_fastpath_hit_and_llm_fallback_move_stats(monkeypatch):
+    monkeypatch.setattr(triage, "get_llm", lambda role, config: FakeChatModel())
+    FASTPATH_STATS.reset()
+    triage.triage({"client_input": "oi", "messages": []}, {})                        # fast-path
+    triage.triage({"client_input": "vocês abrem domingo?", "messages": []}, {})      # cai pro LLM
+    snap = FASTPATH_STATS.snapshot()
+    assert (snap["calls"], snap["hits"], snap["llm_calls"]) == (2, 1, 1)
+    assert snap["rule_hits"] == {"greeting": 1}
+    FASTPATH_STATS.reset()
@@ -0,0 +1,49 @@
+"""Testes da etapa de confirmação do trial (troca de horário na confirmação)."""
+from __future__ import annotations
+
+from app.agents.aula_experimental.nodes import _apply_extraction
+from app.agents.aula_experimental.utils_trial.extractor import _extract_messages
+from app.agents.aula_experimental.utils_trial.schemas import TrialExtraction, schema_for_stage
+from app.core.datetime_utils import turn_clock
+
+MONDAY = "2026-02-09T10:00:00"   # próximas terças: 10-02, 17-02
+
+
+def _trial():
+    return {"stage": "awaiting_confirmation", "nome": "Ana", "idade": 30, "nivel": "iniciante",
+            "desired_date": "10-02", "desired_time": "09:00", "confirmed": None}
+
+
+def _confirm(trial, **fields):
+    with turn_clock({"turn_now": MONDAY}):
+        return _apply_extraction(trial, TrialExtraction(**fields), "awaiting_confirmation", "texto")
+
+
+def test_confirmation_schema_keeps_date_and_time():
+    fields = schema_for_stage("awaiting_confirmation").model_fields
+    assert {"confirmed", "desired_date", "desired_time", "wants_to_cancel"} <= set(fields)
+
+
+def test_prompt_keeps_short_date_answer_rule():
+    with turn_clock({"turn_now": MONDAY}):
+        [system, _] = _extract_messages(client_text="10", stage="ask_date", trial_snapshot={})
+    assert 'respondeu só "10", interprete como dia 10' in system["content"]
+
+
+def test_plain_yes_books():
+    trial = _trial()
+    _confirm(trial, confirmed=True)
+    assert trial["stage"] == "book"
+
+
+def test_new_slot_at_confirmation_is_validated_and_asked_again():
+    trial = _trial()
+    _confirm(trial, confirmed=True, desired_date="17-02", desired_time="14:00")
+    assert (trial["stage"], trial["confirmed"]) == ("awaiting_confirmation", None)
+    assert (trial["desired_date"], trial["desired_time"]) == ("17-02", "14:00")
+
+
+def test_invalid_slot_at_confirmation_goes_back_to_ask_date():
+    trial = _trial()
+    _confirm(trial, confirmed=True, desired_date="18-02")   # quarta
+    assert trial["stage"] == "ask_date" and trial["confirmed"] is None
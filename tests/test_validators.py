@@ -0,0 +1,52 @@
+"""Testes da validação de data/horário na virada do ano (validators.py + booking.desired_datetime_for)."""
+from __future__ import annotations
+
+from datetime import date, datetime
+
+import pytest
+
+from app.agents.aula_experimental.utils_trial.booking import desired_datetime_for
+from app.agents.aula_experimental.utils_trial.slot_calendar import SlotCalendar
+from app.agents.aula_experimental.utils_trial.validators import parse_ddmm_date, validate_date_time
+from app.core.datetime_utils import turn_clock
+
+DECEMBER = "2026-12-20T10:00:00"   # domingo; terças seguintes: 22-12, 29-12, 05-01-2027
+
+
+def _validate(desired_date, desired_time, now=DECEMBER):
+    with turn_clock({"turn_now": now}):
+        cal = SlotCalendar(date.fromisoformat(now[:10]))
+        return validate_date_time(desired_date, desired_time, calendar=cal).error
+
+
+def test_calendar_offers_january_with_next_year():
+    with turn_clock({"turn_now": DECEMBER}):
+        cal = SlotCalendar(date(2026, 12, 20))
+        assert "05-01" in cal.open_dates(3)
+        assert cal.start_of("05-01", "07:00") == datetime(2027, 1, 5, 7, 0)
+
+
+@pytest.mark.parametrize("desired_date, desired_time, error", [
+    ("05-01", "07:00", None),                       # terça de janeiro, dentro do horizonte
+    ("05-01", "19:00", "time_out_of_range"),        # mesma data, horário fora da grade
+    ("04-01", "07:00", "not_tuesday"),
+    ("23-03", "07:00", None),                       # terça além do horizonte (próxima ocorrência)
+    ("15-12", "07:00", "past_date"),                # passou há poucos dias: continua no passado
+])
+def test_validate_across_year_boundary(desired_date, desired_time, error):
+    assert _validate(desired_date, desired_time) == error
+
+
+def test_booking_datetime_uses_the_validated_year():
+    with turn_clock({"turn_now": DECEMBER}):
+        assert desired_datetime_for("05-01", "07:00") == datetime(2027, 1, 5, 7, 0)
+        assert desired_datetime_for("23-03", "09:00") == datetime(2027, 3, 23, 9, 0)
+
+
+def test_parse_ddmm_date_next_occurrence():
+    with turn_clock({"turn_now": DECEMBER}):
+        assert parse_ddmm_date("05-01") == date(2027, 1, 5)
+        assert parse_ddmm_date("22-12") == date(2026, 12, 22)
+        assert parse_ddmm_date("31-13") is None
+    with turn_clock({"turn_now": "2027-01-03T10:00:00"}):
+        assert parse_ddmm_date("30-12") == date(2026, 12, 30)   # virou o ano há 4 dias
@@ -0,0 +1,124 @@
+"""Testes do webhook (app/server/webhook.py) com handler/send_reply fakes."""
+from __future__ import annotations
+
+import asyncio
+import time
+
+import pytest
+from sqlalchemy import text
+from starlette.testclient import TestClient
+
+from app.core.triage_rules import FASTPATH_STATS
+from app.server import webhook
+from app.server.webhook import create_app, customer_id_for
+from app.tools.customer import clear_customer_cache
+from app.tools.database import get_session, reset_engines
+
+
+async def _echo(thread_id, texts):
+    return f"eco: {' '.join(texts)}"
+
+
+def _client(**kwargs):
+    kwargs.setdefault("handler", _echo)
+    kwargs.setdefault("coalesce_ms", 0)
+    return TestClient(create_app(**kwargs))
+
+
+def test_wait_returns_reply():
+    with _client() as client:
+        resp = client.post("/webhook?wait=true", json={"from": "5521999", "text": "oi"})
+    assert resp.status_code == 200
+    assert resp.json() == {"thread_id": "5521999", "reply": "eco: oi"}
+
+
+@pytest.mark.parametrize("body", ['["oi"]', '"oi"', "42", "null", "{nao e json"])
+def test_rejects_body_that_is_not_a_json_object(body):
+    with _client() as client:
+        resp = client.post("/webhook", content=body, headers={"content-type": "application/json"})
+    assert resp.status_code == 400
+
+
+def test_metrics_export_triage_fastpath():
+    FASTPATH_STATS.reset()
+    FASTPATH_STATS.record_rules(None, 0.001, used=False)
+    FASTPATH_STATS.record_llm(0.2)
+    with _client() as client:
+        snap = client.get("/metrics.json").json()["triage_fastpath"]
+        text_ = client.get("/metrics").text
+    assert (snap["calls"], snap["hits"], snap["llm_calls"]) == (1, 0, 1)
+    assert "smash_triage_llm_calls_total 1" in text_
+    FASTPATH_STATS.reset()
+
+
+def test_missing_fields():
+    with _client() as client:
+        resp = client.post("/webhook", json={"from": "5521999"})
+    assert resp.status_code == 400 and resp.json()["error"] == "missing_from_or_text"
+
+
+def test_queue_full_returns_429():
+    async def slow(thread_id, texts):
+        await asyncio.sleep(0.2)
+        return "ok"
+
+    with _client(handler=slow, workers=1, max_pending=1) as client:
+        assert client.post("/webhook", json={"from": "a", "text": "1"}).status_code == 202   # rodando
+        assert client.post("/webhook", json={"from": "b", "text": "2"}).status_code == 202   # pendente
+        resp = client.post("/webhook", json={"from": "c", "text": "3"})
+    assert resp.status_code == 429 and resp.headers["Retry-After"]
+
+
+def test_reply_send_failure_is_logged_and_released(caplog):
+    sent = []
+
+    async def send_reply(thread_id, reply):
+        sent.append(reply)
+        raise ConnectionError("whatsapp fora")
+
+    app = create_app(handler=_echo, send_reply=send_reply, coalesce_ms=0)
+    with TestClient(app) as client, caplog.at_level("ERROR", logger=webhook.__name__):
+        assert client.post("/webhook", json={"from": "a", "text": "oi"}).status_code == 202
+        deadline = time.monotonic() + 2
+        while (not sent or app.state.reply_tasks) and time.monotonic() < deadline:
+            time.sleep(0.01)
+    assert sent == ["eco: oi"]
+    assert not app.state.reply_tasks
+    assert "falha enviando resposta para a" in caplog.text
+
+
+# -------------------------
+# Remetente -> customer.id
+# -------------------------
+
+@pytest.fixture
+def sqlite_db(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'test.db'}")
+    reset_engines()
+    clear_customer_cache()
+    with get_session() as session:
+        session.execute(text("""
+            CREATE TABLE customer (
+                id text PRIMARY KEY, channel text NOT NULL, channel_user_id text NOT NULL,
+                name text, phone text, UNIQUE (channel, channel_user_id)
+            )
+        """))
+    yield
+    clear_customer_cache()
+    reset_engines()
+
+
+def test_customer_id_without_database_is_thread_id(monkeypatch):
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    assert asyncio.run(customer_id_for("5521999")) == "5521999"
+
+
+def test_customer_id_upserts_customer(sqlite_db):
+    first = asyncio.run(customer_id_for("5521999"))
+    clear_customer_cache()                        # força ir ao banco de novo
+    assert asyncio.run(customer_id_for("5521999")) == first
+    assert asyncio.run(customer_id_for("5521888")) != first
+    with get_session() as session:
+        rows = session.execute(text("SELECT id, channel, phone FROM customer ORDER BY phone")).all()
+    assert len(rows) == 2
+    assert (rows[1].id, rows[1].channel, rows[1].phone) == (first, "whatsapp", "5521999")